@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - MÉTRICAS DE ADQUISICIÓN
+# Histogramas de latencia por PID, contadores de reintentos/NO DATA y jitter
+# del intervalo de muestreo por tier
+# =============================================================================
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
+
+
+class LatencyHistogram:
+    """
+    Histograma de buckets fijos (ms) con contador, suma, mínimo y máximo
+
+    Registrar un valor es O(log buckets) sin reservar memoria, así que
+    puede quedarse activo en producción.
+    """
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value_ms: float):
+        self.counts[bisect_left(self.BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Percentil aproximado (interpolación lineal dentro del bucket)
+
+        Args:
+            q: Percentil entre 0 y 100
+
+        Returns:
+            Valor en ms o None si no hay muestras
+        """
+        if not self.count:
+            return None
+
+        target = self.count * q / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= target:
+                low = self.BUCKETS_MS[i - 1] if i > 0 else 0.0
+                high = self.BUCKETS_MS[i] if i < len(self.BUCKETS_MS) else self.max
+                low, high = max(low, self.min), min(high, self.max)
+                return round(low + (high - low) * (target - seen) / n, 2)
+            seen += n
+        return self.max
+
+    def to_dict(self) -> Dict:
+        buckets = {}
+        for i, n in enumerate(self.counts):
+            if n:
+                label = f"<={self.BUCKETS_MS[i]}" if i < len(self.BUCKETS_MS) else f">{self.BUCKETS_MS[-1]}"
+                buckets[label] = n
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count, 2) if self.count else None,
+            'min_ms': round(self.min, 2) if self.min is not None else None,
+            'max_ms': round(self.max, 2) if self.max is not None else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': buckets
+        }
+
+
+class IntervalJitter:
+    """
+    Desviación del intervalo real entre muestras respecto al periodo objetivo
+
+    Media y desviación típica del error (Welford) más un histograma del
+    error absoluto para los percentiles.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._interval_total = 0.0
+        self._target_total = 0.0
+        self.abs_error = LatencyHistogram()
+
+    def add(self, interval_ms: float, target_ms: float):
+        error = interval_ms - target_ms
+        self.count += 1
+        delta = error - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (error - self._mean)
+        self._interval_total += interval_ms
+        self._target_total += target_ms
+        self.abs_error.add(abs(error))
+
+    def to_dict(self) -> Dict:
+        if not self.count:
+            return {'samples': 0}
+        return {
+            'samples': self.count,
+            'avg_target_ms': round(self._target_total / self.count, 1),
+            'avg_interval_ms': round(self._interval_total / self.count, 1),
+            'mean_error_ms': round(self._mean, 2),
+            'stddev_ms': round(math.sqrt(self._m2 / self.count), 2),
+            'p95_abs_error_ms': self.abs_error.percentile(95),
+            'max_abs_error_ms': round(self.abs_error.max, 2)
+        }
+
+
+class AcquisitionMetrics:
+    """
+    Instrumentación del camino de lectura OBD
+
+    - Latencia de cada consulta al adaptador por PID (individual o agrupada)
+    - Consultas, reintentos, NO DATA y excepciones por PID
+    - Jitter del intervalo de muestreo por PID agregado por tier
+    - Jitter del ciclo de adquisición respecto a su periodo objetivo
+    """
+
+    def __init__(self, cycle_interval: float = 0.2):
+        """
+        Args:
+            cycle_interval: Periodo objetivo del ciclo de adquisición en segundos
+        """
+        self.cycle_interval = cycle_interval
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Pone a cero todas las métricas"""
+        with self._lock:
+            self._pids = {}
+            self._tiers = {}
+            self._last_sample = {}
+            self._batches = LatencyHistogram()
+            self._cycle_jitter = IntervalJitter()
+            self._last_cycle = None
+            self._started_at = time.time()
+
+    def _pid(self, name: str) -> Dict:
+        entry = self._pids.get(name)
+        if entry is None:
+            entry = self._pids[name] = {
+                'latency': LatencyHistogram(),
+                'queries': 0,
+                'ok': 0,
+                'no_data': 0,
+                'errors': 0,
+                'retries': 0,
+                'batched': 0
+            }
+        return entry
+
+    # =========================================================================
+    # REGISTRO
+    # =========================================================================
+
+    def record_query(self, name: str, latency: float, outcome: str, attempt: int = 0):
+        """
+        Registra una consulta individual al adaptador
+
+        Args:
+            name: Nombre del PID
+            latency: Segundos de la consulta
+            outcome: 'ok', 'no_data' o 'error'
+            attempt: Número de intento (0 = primero; >0 cuenta como reintento)
+        """
+        with self._lock:
+            entry = self._pid(name)
+            entry['queries'] += 1
+            entry[outcome] += 1
+            if attempt:
+                entry['retries'] += 1
+            entry['latency'].add(latency * 1000)
+
+    def record_batch(self, names, latency: float):
+        """
+        Registra una lectura agrupada (multi-PID) que devolvió varios PIDs
+
+        Cada PID recibe como latencia su parte proporcional del round-trip.
+        """
+        if not names:
+            return
+        share_ms = latency * 1000 / len(names)
+        with self._lock:
+            self._batches.add(latency * 1000)
+            for name in names:
+                entry = self._pid(name)
+                entry['queries'] += 1
+                entry['ok'] += 1
+                entry['batched'] += 1
+                entry['latency'].add(share_ms)
+
+    def record_sample(self, name: str, tier: str, target_period: float, now: float = None):
+        """
+        Registra que un PID obtuvo valor y mide el intervalo desde su muestra anterior
+
+        Args:
+            name: Nombre del PID
+            tier: Tier del PID (fast/medium/slow/extra)
+            target_period: Periodo objetivo en segundos
+            now: Instante de la muestra
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._last_sample.get(name)
+            self._last_sample[name] = now
+            if last is None:
+                return
+            jitter = self._tiers.get(tier)
+            if jitter is None:
+                jitter = self._tiers[tier] = IntervalJitter()
+            jitter.add((now - last) * 1000, target_period * 1000)
+
+    def record_cycle(self, now: float = None):
+        """Registra el inicio de un ciclo de adquisición"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._last_cycle is not None:
+                self._cycle_jitter.add((now - self._last_cycle) * 1000, self.cycle_interval * 1000)
+            self._last_cycle = now
+
+    # =========================================================================
+    # CONSULTA
+    # =========================================================================
+
+    def get_report(self, pid_name: str = None) -> Dict:
+        """
+        Informe JSON de las métricas
+
+        Args:
+            pid_name: Si se indica, solo ese PID
+
+        Returns:
+            Dict con resumen global, ciclo, tiers y detalle por PID
+        """
+        with self._lock:
+            pids = {}
+            totals = {'queries': 0, 'ok': 0, 'no_data': 0, 'errors': 0, 'retries': 0, 'batched': 0}
+            for name, entry in sorted(self._pids.items()):
+                for key in totals:
+                    totals[key] += entry[key]
+                if pid_name and name != pid_name:
+                    continue
+                pids[name] = {
+                    **{key: entry[key] for key in totals},
+                    'no_data_rate': round(entry['no_data'] / entry['queries'], 3) if entry['queries'] else None,
+                    'latency': entry['latency'].to_dict()
+                }
+
+            return {
+                'since': self._started_at,
+                'uptime_s': round(time.time() - self._started_at, 1),
+                'totals': totals,
+                'cycle': self._cycle_jitter.to_dict(),
+                'batches': self._batches.to_dict(),
+                'tiers': {tier: jitter.to_dict() for tier, jitter in sorted(self._tiers.items())},
+                'pids': pids
+            }
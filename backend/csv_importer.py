@@ -293,8 +293,7 @@ class CSVImporter:
 
                     if success:
                         # Calcular estadísticas del viaje
-                        stats = self._calculate_trip_stats(trip_data)
-                        self.db.end_trip(trip_id, stats)
+                        self.db.end_trip(trip_id, self._calculate_trip_stats(trip_id, trip_data))
 
                         trips_created += 1
                         rows_imported += len(trip_data)
@@ -304,8 +303,7 @@ class CSVImporter:
                 success = self.db.save_obd_data_batch(trip_id, cleaned_data)
 
                 if success:
-                    stats = self._calculate_trip_stats(cleaned_data)
-                    self.db.end_trip(trip_id, stats)
+                    self.db.end_trip(trip_id, self._calculate_trip_stats(trip_id, cleaned_data))
 
                     trips_created = 1
                     rows_imported = len(cleaned_data)
@@ -487,28 +485,26 @@ class CSVImporter:
         print(f"[CSV-IMPORTER] {len(sorted_data)} filas divididas en {len(trips)} viajes")
         return trips
 
-    def _calculate_trip_stats(self, trip_data: List[Dict]) -> Dict:
+    def _calculate_trip_stats(self, trip_id: int, trip_data: List[Dict]) -> Dict:
         """
-        Calcula estadísticas de un viaje
+        Calcula estadísticas de un viaje ya guardado en obd_data
+
+        Las calcula la BD en una pasada SQL (mismas reglas que los viajes en
+        vivo); si el CSV no trae velocidad, la distancia sale del GPS.
 
         Args:
+            trip_id: ID del viaje
             trip_data: Datos del viaje
 
         Returns:
             Dict con estadísticas
         """
-        if not trip_data:
-            return {}
-
-        # Calcular distancia total (si hay coordenadas GPS)
-        distance_km = 0.0
-        speeds = []
-
-        for i in range(len(trip_data)):
-            if trip_data[i].get('speed'):
-                speeds.append(trip_data[i]['speed'])
+        stats = self.db.compute_trip_stats(trip_id) or {}
 
-            if i > 0:
+        if not stats.get('distance'):
+            # Calcular distancia total (si hay coordenadas GPS)
+            distance_km = 0.0
+            for i in range(1, len(trip_data)):
                 lat1 = trip_data[i-1].get('latitude')
                 lon1 = trip_data[i-1].get('longitude')
                 lat2 = trip_data[i].get('latitude')
@@ -517,17 +513,10 @@ class CSVImporter:
                 if all([lat1, lon1, lat2, lon2]):
                     distance_km += self._haversine_distance(lat1, lon1, lat2, lon2)
 
-        # Calcular duración
-        start_time = datetime.fromisoformat(trip_data[0]['timestamp'])
-        end_time = datetime.fromisoformat(trip_data[-1]['timestamp'])
-        duration_seconds = (end_time - start_time).total_seconds()
+            if distance_km:
+                stats['distance'] = round(distance_km, 3)
 
-        return {
-            'distance_km': round(distance_km, 2),
-            'duration_seconds': int(duration_seconds),
-            'avg_speed': round(sum(speeds) / len(speeds), 1) if speeds else 0,
-            'max_speed': round(max(speeds), 1) if speeds else 0
-        }
+        return stats
 
     # === FUNCIONES AUXILIARES ===
 
@@ -641,8 +630,7 @@ class CSVImporter:
         if not self.db:
             return None
 
-        try:
-            cursor = self.db._get_connection().cursor()
+        def write(cursor):
             cursor.execute('''
                 INSERT INTO imports (
                     vehicle_id, source_type, filename, file_hash,
@@ -654,9 +642,10 @@ class CSVImporter:
                 total_rows, rows_imported, rows_skipped, trips_created,
                 datetime.now().isoformat(), 1
             ))
+            return cursor.lastrowid
 
-            import_id = cursor.lastrowid
-            self.db._get_connection().commit()
+        try:
+            import_id = self.db.submit_write(write).result()
 
             print(f"[CSV-IMPORTER] ✓ Importación registrada (ID: {import_id})")
             return import_id
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - REGISTRO CSV CON BUFFER Y ROTACIÓN
+# Las muestras se acumulan en memoria, un hilo las escribe en el segmento
+# abierto y los segmentos cerrados se comprimen en segundo plano
+# =============================================================================
+
+import csv
+import gzip
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+SEGMENT_PATTERN = re.compile(r'^[\w\-.]+\.csv(\.gz|\.zst)?$')
+
+
+class RotatingCSVLogger:
+    """
+    Sumidero CSV persistente
+
+    - log() solo añade (timestamp, valores) a una lista en memoria
+    - Un hilo escritor formatea y escribe el buffer cada flush_interval
+      segundos en el segmento abierto (el fichero no se reabre por muestra)
+    - rotate() cierra el segmento actual (inicio/fin de viaje) y también se
+      rota automáticamente al superar max_bytes
+    - Los segmentos cerrados se comprimen en otro hilo (zstd si está
+      instalado, si no gzip) y se borra el CSV original
+    """
+
+    def __init__(self, folder: str, columns: Sequence[Tuple[str, str]],
+                 flush_interval: float = 2.0, max_bytes: int = 20 * 1024 * 1024,
+                 compression: str = 'auto', prefix: str = 'obd'):
+        """
+        Args:
+            folder: Carpeta de los segmentos
+            columns: Pares (cabecera, clave del dict de datos) tras timestamp/date/time
+            flush_interval: Segundos entre escrituras a disco
+            max_bytes: Tamaño a partir del cual se rota el segmento
+            compression: 'auto', 'zstd', 'gzip' o None (sin comprimir)
+            prefix: Prefijo del nombre de los segmentos
+        """
+        self.folder = folder
+        self.columns = list(columns)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        if compression == 'auto':
+            compression = 'zstd' if ZSTD_AVAILABLE else 'gzip'
+        if compression == 'zstd' and not ZSTD_AVAILABLE:
+            compression = 'gzip'
+        self.compression = compression
+
+        os.makedirs(folder, exist_ok=True)
+
+        self._buffer = []
+        self._lock = threading.Lock()        # Protege _buffer
+        self._file_lock = threading.RLock()  # Protege el segmento abierto
+        self._file = None
+        self._writer = None
+        self._path = None
+        self._label = None
+        self._bytes = 0
+
+        self._compress_queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._compressor = None
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.segments_compressed = 0
+        self.last_error = None
+
+    # =========================================================================
+    # CICLO DE VIDA
+    # =========================================================================
+
+    def start(self):
+        """Arranca los hilos escritor y compresor"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="csv-logger", daemon=True)
+        self._thread.start()
+        self._compressor = threading.Thread(target=self._compress_loop, name="csv-compressor", daemon=True)
+        self._compressor.start()
+
+        # Segmentos que quedaron abiertos en la ejecución anterior
+        if self.compression:
+            for name in os.listdir(self.folder):
+                if name.startswith(f"{self.prefix}_") and name.endswith('.csv'):
+                    self._compress_queue.put(os.path.join(self.folder, name))
+        print(f"[CSV] ✓ Registro CSV con buffer ({self.flush_interval}s, rotación {self.max_bytes // (1024 * 1024)} MB, "
+              f"compresión {self.compression or 'ninguna'})")
+
+    def close(self):
+        """Vuelca el buffer y cierra el segmento abierto (apagado del servidor)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.flush_interval + 1)
+        self.flush()
+        with self._file_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    # =========================================================================
+    # ESCRITURA
+    # =========================================================================
+
+    def log(self, data: Dict, timestamp: float = None):
+        """
+        Registra una muestra (solo un append en memoria)
+
+        Args:
+            data: Dict con los PIDs (claves de columns)
+            timestamp: Instante unix (None = ahora)
+        """
+        values = tuple(data.get(key, '') for _, key in self.columns)
+        with self._lock:
+            self._buffer.append((timestamp or time.time(), values))
+
+    def flush(self) -> int:
+        """
+        Escribe en disco las muestras pendientes
+
+        Returns:
+            Filas escritas
+        """
+        # _file_lock primero: dos volcados simultáneos no pueden desordenar filas
+        with self._file_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+
+            try:
+                if self._file is None:
+                    self._open_segment()
+                for timestamp, values in rows:
+                    iso = datetime.fromtimestamp(timestamp).isoformat()
+                    self._writer.writerow((iso, iso[:10], iso[11:19]) + tuple(
+                        '' if v is None else v for v in values))
+                self._file.flush()
+                self._bytes = self._file.tell()
+                self.rows_written += len(rows)
+                self.flushes += 1
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[CSV] Error guardando: {e}")
+                return 0
+
+            if self._bytes >= self.max_bytes:
+                self._close_segment()
+        return len(rows)
+
+    def rotate(self, label: str = None):
+        """
+        Cierra el segmento actual y empieza otro en la siguiente escritura
+
+        Args:
+            label: Etiqueta para el nombre del siguiente segmento (ej: 'trip_12')
+        """
+        self.flush()
+        with self._file_lock:
+            self._close_segment()
+            self._label = label
+
+    def _close_segment(self):
+        """Cierra el segmento abierto y lo encola para comprimir (con _file_lock)"""
+        if self._file:
+            self._file.close()
+            if self.compression:
+                self._compress_queue.put(self._path)
+            print(f"[CSV] ✓ Segmento cerrado: {os.path.basename(self._path)} ({self._bytes // 1024} KB)")
+        self._file = None
+        self._writer = None
+        self._path = None
+        self._bytes = 0
+
+    def _open_segment(self):
+        name = f"{self.prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if self._label:
+            name += f"_{self._label}"
+        path = os.path.join(self.folder, f"{name}.csv")
+        suffix = 1
+        while os.path.exists(path) or os.path.exists(path + '.gz') or os.path.exists(path + '.zst'):
+            suffix += 1
+            path = os.path.join(self.folder, f"{name}_{suffix}.csv")
+
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['timestamp', 'date', 'time'] + [header for header, _ in self.columns])
+        self._path = path
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    # =========================================================================
+    # COMPRESIÓN
+    # =========================================================================
+
+    def _compress_loop(self):
+        while True:
+            path = self._compress_queue.get()
+            try:
+                self._compress(path)
+                self.segments_compressed += 1
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[CSV] Error comprimiendo {os.path.basename(path)}: {e}")
+
+    def _compress(self, path: str):
+        target = path + ('.zst' if self.compression == 'zstd' else '.gz')
+        tmp = target + '.tmp'
+        with open(path, 'rb') as src:
+            if self.compression == 'zstd':
+                with open(tmp, 'wb') as dst:
+                    zstandard.ZstdCompressor(level=6).copy_stream(src, dst)
+            else:
+                with gzip.open(tmp, 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp, target)
+        os.remove(path)
+
+    # =========================================================================
+    # LECTURA DE SEGMENTOS
+    # =========================================================================
+
+    @property
+    def current_segment(self) -> Optional[str]:
+        """Nombre del segmento abierto (None si no hay)"""
+        return os.path.basename(self._path) if self._path else None
+
+    def list_segments(self) -> List[Dict]:
+        """
+        Segmentos disponibles, el más reciente primero
+
+        Returns:
+            Lista de dicts con name, size, compressed, current y modified
+        """
+        segments = []
+        for name in os.listdir(self.folder):
+            if not SEGMENT_PATTERN.match(name):
+                continue
+            path = os.path.join(self.folder, name)
+            stat = os.stat(path)
+            segments.append({
+                'name': name,
+                'size': stat.st_size,
+                'compressed': not name.endswith('.csv'),
+                'current': name == self.current_segment,
+                'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
+            })
+        segments.sort(key=lambda s: s['modified'], reverse=True)
+        return segments
+
+    def segment_path(self, name: str) -> Optional[str]:
+        """Ruta de un segmento por nombre (None si no existe o el nombre no es válido)"""
+        if not name or not SEGMENT_PATTERN.match(name):
+            return None
+        path = os.path.join(self.folder, name)
+        if os.path.exists(path):
+            return path
+        # Un segmento pedido por su nombre .csv puede haberse comprimido ya
+        for ext in ('.zst', '.gz'):
+            if name.endswith('.csv') and os.path.exists(path + ext):
+                return path + ext
+        return None
+
+    def iter_segment(self, name: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Contenido CSV de un segmento en bloques (descomprimiendo si hace falta)
+
+        Args:
+            name: Nombre del segmento
+            chunk_size: Bytes por bloque
+        """
+        path = self.segment_path(name)
+        if path is None:
+            return
+        if name == self.current_segment:
+            self.flush()
+
+        if path.endswith('.zst'):
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("zstandard no instalado: no se puede leer el segmento")
+            with open(path, 'rb') as f:
+                reader = zstandard.ZstdDecompressor().stream_reader(f)
+                while True:
+                    chunk = reader.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+            return
+
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def get_status(self) -> Dict:
+        """Estado del registro (buffer, segmento actual y contadores)"""
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            'pending_rows': pending,
+            'current_segment': self.current_segment,
+            'current_bytes': self._bytes,
+            'rows_written': self.rows_written,
+            'flushes': self.flushes,
+            'segments_compressed': self.segments_compressed,
+            'compression': self.compression,
+            'last_error': self.last_error
+        }
@@ -6,22 +6,40 @@
 
 import sqlite3
 import json
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import os
 
+from db_pool import ConnectionPool, WALCheckpointer, apply_connection_pragmas, resolve_profile
+from db_writer import DBWriter
+from obd_chunks import (CHUNK_SIGNALS, DEFAULT_CHUNK_SIZE, TIMESTAMP_SIGNAL, build_chunks,
+                        decode_series, rows_to_series, series_to_rows)
+from obd_rollups import (DEFAULT_MAX_POINTS, RESOLUTIONS, ROLLUP_SIGNALS, ROLLUP_UPSERT,
+                         aggregate_samples, aligned_resolution, bucket_epoch, choose_resolution,
+                         format_bucket)
+from trip_stats import TRIP_STATS_SQL, stats_from_sql_row
+
 class DatabaseManager:
     """Gestor de base de datos para SENTINEL PRO Fleet Management"""
 
-    def __init__(self, db_path: str = '../db/sentinel.db'):
+    def __init__(self, db_path: str = '../db/sentinel.db', profile=None):
         """
         Inicializa el gestor de base de datos
 
         Args:
             db_path: Ruta al archivo de base de datos SQLite
+            profile: Perfil de almacenamiento (nombre de STORAGE_PROFILES o dict
+                de PRAGMAs); None = 'wal'
         """
         self.db_path = db_path
+        self.profile = resolve_profile(profile)
         self._ensure_db_directory()
+        self._pool = ConnectionPool(db_path, configure=self._configure_connection)
+        self._checkpointer = None
+        self._writer = None
+        self.journal_mode = self._set_journal_mode()
         self._initialize_database()
 
     def _ensure_db_directory(self):
@@ -30,17 +48,175 @@ class DatabaseManager:
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir, exist_ok=True)
 
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """Configuración de cada conexión nueva del pool (row_factory y PRAGMAs del perfil)"""
+        conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
+        apply_connection_pragmas(conn, self.profile)
+
+    def _set_journal_mode(self) -> str:
+        """
+        Fija el modo de journal del fichero (persistente en la BD)
+
+        Returns:
+            Modo efectivo devuelto por SQLite
+        """
+        wanted = self.profile.get('journal_mode')
+        conn = self._get_connection()
+        try:
+            if wanted:
+                mode = conn.execute(f"PRAGMA journal_mode = {wanted}").fetchone()[0]
+                if mode.upper() != wanted.upper():
+                    print(f"[DB] ⚠️  journal_mode {wanted} no disponible, usando {mode}")
+            else:
+                mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            return mode.lower()
+        finally:
+            conn.close()
+
     def _get_connection(self) -> sqlite3.Connection:
         """
         Obtiene una conexión a la base de datos
 
+        La conexión sale del pool (persistente, sin abrir el fichero en cada
+        llamada). close() la devuelve al pool deshaciendo lo no confirmado,
+        así que los métodos mantienen su commit()/rollback() explícito.
+
         Returns:
             Conexión SQLite configurada
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
+        return self._pool.acquire()
+
+    @contextmanager
+    def connection(self):
+        """
+        Conexión del pool como context manager: commit al salir sin errores,
+        rollback si hay excepción y devolución al pool siempre
+
+        Uso:
+            with db.connection() as conn:
+                conn.execute(...)
+        """
+        conn = self._get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # =========================================================================
+    # ESCRITOR ÚNICO (GROUP COMMIT)
+    # =========================================================================
+
+    def start_writer(self, max_batch: int = 256, max_latency: float = 0.0, max_queue: int = 10000):
+        """
+        Arranca el hilo escritor: desde aquí las escrituras frecuentes
+        (muestras, viajes, alertas, historial) se agrupan en transacciones
+
+        Args:
+            max_batch: Escrituras máximas por transacción
+            max_latency: Segundos que una escritura espera a otras (0 = agrupar
+                solo lo que ya está en cola)
+            max_queue: Escrituras máximas en cola
+        """
+        if self._writer:
+            return
+        self._writer = DBWriter(self._writer_connection, max_batch, max_latency, max_queue)
+        self._writer.start()
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        """Conexión dedicada del hilo escritor (fuera del pool)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._configure_connection(conn)
         return conn
 
+    def submit_write(self, fn) -> Future:
+        """
+        Encola una escritura fn(cursor) y devuelve un Future con su resultado
+
+        Sin escritor activo (o si se está deteniendo) se ejecuta en el
+        momento (conexión del pool) y el Future se devuelve ya resuelto.
+
+        Args:
+            fn: Función que recibe un cursor; no debe hacer commit/rollback
+        """
+        if self._writer and self._writer.running and not self._writer.in_writer_thread():
+            try:
+                return self._writer.submit(fn)
+            except RuntimeError:
+                pass  # Parada en curso: no se pierde la escritura
+
+        future = Future()
+        conn = self._get_connection()
+        try:
+            result = fn(conn.cursor())
+            conn.commit()
+            future.set_result(result)
+        except Exception as e:
+            conn.rollback()
+            future.set_exception(e)
+        finally:
+            conn.close()
+        return future
+
+    def _write(self, fn):
+        """Escritura síncrona: espera al commit de su grupo y devuelve el resultado"""
+        return self.submit_write(fn).result()
+
+    def get_pool_stats(self) -> Dict:
+        """Contadores del pool de conexiones"""
+        return self._pool.get_stats()
+
+    def start_checkpointer(self, interval: float = 30.0, truncate_bytes: int = 64 * 1024 * 1024):
+        """
+        Arranca el checkpoint periódico del WAL (solo en modo WAL)
+
+        Args:
+            interval: Segundos entre checkpoints PASSIVE
+            truncate_bytes: Tamaño del -wal que fuerza un checkpoint TRUNCATE
+        """
+        if self.journal_mode != 'wal' or self._checkpointer:
+            return
+        self._checkpointer = WALCheckpointer(self.db_path, interval, truncate_bytes,
+                                             busy_timeout=self.profile.get('busy_timeout', 5000))
+        self._checkpointer.start()
+
+    def get_storage_status(self) -> Dict:
+        """
+        Perfil de almacenamiento efectivo, pool de conexiones y estado del WAL
+
+        Returns:
+            Dict con profile, journal_mode, pragmas leídos, pool y checkpoint
+        """
+        conn = self._get_connection()
+        try:
+            pragmas = {name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                       for name in self.profile if name != 'journal_mode'}
+        finally:
+            conn.close()
+
+        return {
+            'profile': self.profile,
+            'journal_mode': self.journal_mode,
+            'pragmas': pragmas,
+            'db_bytes': os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            'pool': self._pool.get_stats(),
+            'writer': self._writer.get_status() if self._writer else None,
+            'checkpoint': self._checkpointer.get_status() if self._checkpointer else None
+        }
+
+    def close(self):
+        """Vaciado del escritor, último checkpoint del WAL y cierre de conexiones (apagado)"""
+        if self._writer:
+            self._writer.stop()
+            self._writer = None
+        if self._checkpointer:
+            self._checkpointer.stop()
+            self._checkpointer = None
+        self._pool.close_all()
+
     def _initialize_database(self):
         """Crea las tablas si no existen"""
         conn = self._get_connection()
@@ -84,6 +260,11 @@ class DatabaseManager:
                     gps_data TEXT,
                     csv_file TEXT,
                     active BOOLEAN DEFAULT 1,
+                    samples INTEGER DEFAULT 0,
+                    max_load REAL DEFAULT 0,
+                    speed_bands TEXT,
+                    rpm_bands TEXT,
+                    stats_source TEXT,
                     FOREIGN KEY (vehicle_id) REFERENCES vehicles(id)
                 )
             ''')
@@ -125,6 +306,64 @@ class DatabaseManager:
                 )
             ''')
 
+            # Series OBD en bloques columnares comprimidos (alternativa a obd_data
+            # para viajes cerrados; ver obd_chunks.py y migrate_obd_chunks.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS obd_chunks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    trip_id INTEGER NOT NULL,
+                    signal TEXT NOT NULL,
+                    chunk INTEGER NOT NULL,
+                    start_ts REAL NOT NULL,
+                    end_ts REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    null_count INTEGER NOT NULL DEFAULT 0,
+                    min_value REAL,
+                    max_value REAL,
+                    sum_value REAL,
+                    encoding TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    UNIQUE (trip_id, signal, chunk),
+                    FOREIGN KEY (trip_id) REFERENCES trips(id)
+                )
+            ''')
+
+            # Totales por vehículo de los viajes cerrados (se actualizan al cerrar
+            # o recalcular un viaje; get_vehicle_stats() sin rango los lee directamente)
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vehicle_summary'")
+            summary_created = cursor.fetchone() is None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS vehicle_summary (
+                    vehicle_id INTEGER PRIMARY KEY,
+                    total_trips INTEGER NOT NULL DEFAULT 0,
+                    total_distance REAL NOT NULL DEFAULT 0,
+                    total_duration INTEGER NOT NULL DEFAULT 0,
+                    sum_avg_speed REAL NOT NULL DEFAULT 0,
+                    sum_health_score REAL NOT NULL DEFAULT 0,
+                    max_speed REAL NOT NULL DEFAULT 0,
+                    first_trip TIMESTAMP,
+                    last_trip TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Agregados por vehículo, señal y cubo de 1 s / 1 min / 1 h (ver obd_rollups.py)
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'obd_rollups'")
+            rollups_created = cursor.fetchone() is None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS obd_rollups (
+                    vehicle_id INTEGER NOT NULL,
+                    signal TEXT NOT NULL,
+                    resolution INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    sum_value REAL NOT NULL,
+                    min_value REAL NOT NULL,
+                    max_value REAL NOT NULL,
+                    PRIMARY KEY (vehicle_id, signal, resolution, bucket)
+                ) WITHOUT ROWID
+            ''')
+
             # Tabla de alertas
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS alerts (
@@ -183,6 +422,33 @@ class DatabaseManager:
                 )
             ''')
 
+            # Historial de salud (append-only, consultas por vehículo y tiempo)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS health_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    vehicle_id INTEGER,
+                    trip_id INTEGER,
+                    timestamp TIMESTAMP NOT NULL,
+                    overall_score INTEGER,
+                    engine_health INTEGER,
+                    thermal_health INTEGER,
+                    efficiency_health INTEGER,
+                    warnings TEXT,
+                    predictions TEXT
+                )
+            ''')
+
+            # Resúmenes de viaje (sustituye a historial_viajes.json)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS trip_summaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    vehicle_id INTEGER,
+                    timestamp TIMESTAMP NOT NULL,
+                    distance_km REAL DEFAULT 0,
+                    summary TEXT
+                )
+            ''')
+
             # Tabla de perfiles de PIDs por vehículo
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS vehicle_pids_profiles (
@@ -192,6 +458,7 @@ class DatabaseManager:
                     total_pids INTEGER NOT NULL,
                     pids_data TEXT NOT NULL,
                     protocol TEXT,
+                    pid_stats TEXT,
                     FOREIGN KEY (vehicle_id) REFERENCES vehicles(id)
                 )
             ''')
@@ -252,11 +519,28 @@ class DatabaseManager:
                 )
             ''')
 
+            # Columnas añadidas a tablas existentes en bases de datos antiguas
+            self._ensure_column(cursor, 'vehicle_pids_profiles', 'pid_stats', 'TEXT')
+            self._ensure_column(cursor, 'trips', 'samples', 'INTEGER DEFAULT 0')
+            self._ensure_column(cursor, 'trips', 'max_load', 'REAL DEFAULT 0')
+            self._ensure_column(cursor, 'trips', 'speed_bands', 'TEXT')
+            self._ensure_column(cursor, 'trips', 'rpm_bands', 'TEXT')
+            self._ensure_column(cursor, 'trips', 'stats_source', 'TEXT')
+
             # Índices para mejorar performance
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_trips_vehicle ON trips(vehicle_id)')
+            # Índice cubriente de get_vehicle_stats(): las estadísticas por rango se
+            # calculan sin leer la tabla (sustituye al antiguo idx_trips_vehicle)
+            cursor.execute('DROP INDEX IF EXISTS idx_trips_vehicle')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_trips_vehicle_stats ON trips(
+                    vehicle_id, active, start_time, distance, duration, avg_speed, max_speed, health_score
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_trips_open ON trips(vehicle_id) WHERE active = 1')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_trips_start ON trips(start_time)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_obd_trip ON obd_data(trip_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_obd_timestamp ON obd_data(timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_obd_chunks_trip_time ON obd_chunks(trip_id, signal, start_ts)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_maintenance_vehicle ON maintenance(vehicle_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_vehicle ON alerts(vehicle_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_acknowledged ON alerts(acknowledged)')
@@ -268,6 +552,9 @@ class DatabaseManager:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_pids_profiles_date ON vehicle_pids_profiles(scan_date)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_obd_extended_trip ON obd_extended(trip_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_obd_extended_timestamp ON obd_extended(timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_health_history_vehicle_time ON health_history(vehicle_id, timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_health_history_time ON health_history(timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_trip_summaries_vehicle_time ON trip_summaries(vehicle_id, timestamp)')
 
             conn.commit()
             print("[DB] ✓ Base de datos inicializada correctamente")
@@ -279,6 +566,27 @@ class DatabaseManager:
         finally:
             conn.close()
 
+        if summary_created:
+            self.refresh_vehicle_summary()
+        if rollups_created:
+            # Primera vez con rollups: agregar los datos que ya existían
+            self.backfill_rollups()
+
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        """
+        Añade una columna a una tabla existente si todavía no la tiene
+
+        Args:
+            cursor: Cursor de la conexión en curso
+            table: Nombre de la tabla
+            column: Nombre de la columna
+            definition: Tipo/definición SQL de la columna
+        """
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            print(f"[DB] ✓ Columna {table}.{column} añadida")
+
     # =========================================================================
     # GESTIÓN DE VEHÍCULOS
     # =========================================================================
@@ -351,6 +659,30 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def get_vehicle_by_vin(self, vin: str) -> Optional[Dict]:
+        """
+        Obtiene un vehículo activo por su VIN
+
+        Args:
+            vin: VIN del vehículo
+
+        Returns:
+            Diccionario con datos del vehículo o None
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('SELECT * FROM vehicles WHERE vin = ? AND active = 1', (vin,))
+            row = cursor.fetchone()
+
+            if row:
+                return dict(row)
+            return None
+
+        finally:
+            conn.close()
+
     def get_all_vehicles(self, active_only: bool = True) -> List[Dict]:
         """
         Obtiene todos los vehículos
@@ -440,6 +772,7 @@ class DatabaseManager:
         try:
             if hard_delete:
                 cursor.execute('DELETE FROM vehicles WHERE id = ?', (vehicle_id,))
+                cursor.execute('DELETE FROM obd_rollups WHERE vehicle_id = ?', (vehicle_id,))
             else:
                 cursor.execute('UPDATE vehicles SET active = 0 WHERE id = ?', (vehicle_id,))
 
@@ -468,26 +801,21 @@ class DatabaseManager:
         Returns:
             ID del viaje creado
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        try:
+        def write(cursor):
             cursor.execute('''
                 INSERT INTO trips (vehicle_id, start_time, active)
                 VALUES (?, CURRENT_TIMESTAMP, 1)
             ''', (vehicle_id,))
+            return cursor.lastrowid
 
-            trip_id = cursor.lastrowid
-            conn.commit()
+        try:
+            trip_id = self._write(write)
             print(f"[DB] ✓ Viaje iniciado: ID {trip_id} para vehículo {vehicle_id}")
             return trip_id
 
         except Exception as e:
-            conn.rollback()
             print(f"[DB] ✗ Error iniciando viaje: {e}")
             raise
-        finally:
-            conn.close()
 
     def end_trip(self, trip_id: int, stats: Dict = None) -> bool:
         """
@@ -495,60 +823,154 @@ class DatabaseManager:
 
         Args:
             trip_id: ID del viaje
-            stats: Estadísticas del viaje
+            stats: Estadísticas del viaje calculadas en el servidor
+                (TripAggregator.get_stats() o compute_trip_stats())
 
         Returns:
             True si se finalizó correctamente
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        try:
+        def write(cursor):
             if stats:
-                cursor.execute('''
-                    UPDATE trips
-                    SET end_time = CURRENT_TIMESTAMP,
-                        distance = ?,
-                        duration = ?,
-                        avg_speed = ?,
-                        max_speed = ?,
-                        avg_rpm = ?,
-                        max_rpm = ?,
-                        avg_load = ?,
-                        fuel_consumed = ?,
-                        health_score = ?,
-                        active = 0
-                    WHERE id = ?
-                ''', (
-                    stats.get('distance', 0),
-                    stats.get('duration', 0),
-                    stats.get('avg_speed', 0),
-                    stats.get('max_speed', 0),
-                    stats.get('avg_rpm', 0),
-                    stats.get('max_rpm', 0),
-                    stats.get('avg_load', 0),
-                    stats.get('fuel_consumed', 0),
-                    stats.get('health_score', 100),
-                    trip_id
-                ))
-            else:
-                cursor.execute('''
-                    UPDATE trips
-                    SET end_time = CURRENT_TIMESTAMP, active = 0
-                    WHERE id = ?
-                ''', (trip_id,))
+                self._update_trip_stats(cursor, trip_id, stats)
 
-            conn.commit()
+            cursor.execute('''
+                UPDATE trips
+                SET end_time = CURRENT_TIMESTAMP, active = 0
+                WHERE id = ?
+            ''', (trip_id,))
+            self._refresh_trip_vehicle_summary(cursor, trip_id)
+
+        try:
+            self._write(write)
             print(f"[DB] ✓ Viaje {trip_id} finalizado")
             return True
 
         except Exception as e:
-            conn.rollback()
             print(f"[DB] ✗ Error finalizando viaje: {e}")
             raise
+
+    def _update_trip_stats(self, cursor, trip_id: int, stats: Dict):
+        """Escribe las columnas de estadísticas de un viaje"""
+        cursor.execute('''
+            UPDATE trips
+            SET distance = ?,
+                duration = ?,
+                avg_speed = ?,
+                max_speed = ?,
+                avg_rpm = ?,
+                max_rpm = ?,
+                avg_load = ?,
+                max_load = ?,
+                fuel_consumed = ?,
+                health_score = COALESCE(?, health_score),
+                samples = ?,
+                speed_bands = ?,
+                rpm_bands = ?,
+                stats_source = ?
+            WHERE id = ?
+        ''', (
+            stats.get('distance', 0),
+            stats.get('duration', 0),
+            stats.get('avg_speed', 0),
+            stats.get('max_speed', 0),
+            stats.get('avg_rpm', 0),
+            stats.get('max_rpm', 0),
+            stats.get('avg_load', 0),
+            stats.get('max_load', 0),
+            stats.get('fuel_consumed', 0),
+            stats.get('health_score'),
+            stats.get('samples', 0),
+            stats.get('speed_bands'),
+            stats.get('rpm_bands'),
+            stats.get('stats_source'),
+            trip_id
+        ))
+
+    def compute_trip_stats(self, trip_id: int) -> Optional[Dict]:
+        """
+        Calcula las estadísticas de un viaje en una sola pasada SQL sobre obd_data
+
+        Usa las mismas reglas que el agregador en vivo (trip_stats.py), así
+        que sirve para viajes importados y para recalcular viajes antiguos.
+
+        Args:
+            trip_id: ID del viaje
+
+        Returns:
+            Dict en el formato de end_trip() o None si el viaje no tiene datos
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(TRIP_STATS_SQL, (trip_id,))
+            row = dict(cursor.fetchone())
+            if not row['samples']:
+                return None
+
+            cursor.execute('''
+                SELECT v.fuel_type FROM trips t
+                JOIN vehicles v ON v.id = t.vehicle_id
+                WHERE t.id = ?
+            ''', (trip_id,))
+            vehicle = cursor.fetchone()
+            return stats_from_sql_row(row, vehicle['fuel_type'] if vehicle else None)
+
         finally:
             conn.close()
 
+    def recompute_trip_stats(self, trip_id: int) -> Optional[Dict]:
+        """
+        Recalcula y guarda las estadísticas de un viaje desde obd_data
+
+        Args:
+            trip_id: ID del viaje
+
+        Returns:
+            Estadísticas guardadas o None si el viaje no tiene datos
+        """
+        stats = self.compute_trip_stats(trip_id)
+        if not stats:
+            return None
+
+        def write(cursor):
+            self._update_trip_stats(cursor, trip_id, stats)
+            self._refresh_trip_vehicle_summary(cursor, trip_id)
+
+        try:
+            self._write(write)
+            print(f"[DB] ✓ Estadísticas del viaje {trip_id} recalculadas ({stats['samples']} muestras)")
+            return stats
+
+        except Exception as e:
+            print(f"[DB] ✗ Error recalculando viaje {trip_id}: {e}")
+            raise
+
+    OBD_DATA_INSERT = '''
+        INSERT INTO obd_data (
+            trip_id, timestamp, rpm, speed, coolant_temp, intake_temp,
+            maf, engine_load, throttle_pos, fuel_pressure, latitude, longitude
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    @staticmethod
+    def _obd_data_row(trip_id: int, point: Dict) -> Tuple:
+        """Fila de obd_data a partir de un punto con claves en minúsculas"""
+        return (
+            trip_id,
+            point.get('timestamp', datetime.now().isoformat()),
+            point.get('rpm'),
+            point.get('speed'),
+            point.get('coolant_temp'),
+            point.get('intake_temp'),
+            point.get('maf'),
+            point.get('engine_load'),
+            point.get('throttle_pos'),
+            point.get('fuel_pressure'),
+            point.get('latitude'),
+            point.get('longitude')
+        )
+
     def save_obd_data_batch(self, trip_id: int, data_points: List[Dict]) -> bool:
         """
         Guarda múltiples puntos de datos OBD (batch insert)
@@ -560,43 +982,152 @@ class DatabaseManager:
         Returns:
             True si se guardó correctamente
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        rows = [self._obd_data_row(trip_id, point) for point in data_points]
+        rollups = aggregate_samples((trip_id, point) for point in data_points)
 
-        try:
-            cursor.executemany('''
-                INSERT INTO obd_data (
-                    trip_id, timestamp, rpm, speed, coolant_temp, intake_temp,
-                    maf, engine_load, throttle_pos, fuel_pressure, latitude, longitude
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', [
-                (
-                    trip_id,
-                    point.get('timestamp', datetime.now().isoformat()),
-                    point.get('rpm'),
-                    point.get('speed'),
-                    point.get('coolant_temp'),
-                    point.get('intake_temp'),
-                    point.get('maf'),
-                    point.get('engine_load'),
-                    point.get('throttle_pos'),
-                    point.get('fuel_pressure'),
-                    point.get('latitude'),
-                    point.get('longitude')
-                ) for point in data_points
-            ])
+        def write(cursor):
+            cursor.executemany(self.OBD_DATA_INSERT, rows)
+            self._save_rollups(cursor, rollups)
 
-            conn.commit()
+        try:
+            self._write(write)
             print(f"[DB] ✓ {len(data_points)} puntos OBD guardados para viaje {trip_id}")
             return True
 
         except Exception as e:
-            conn.rollback()
             print(f"[DB] ✗ Error guardando datos OBD: {e}")
             raise
+
+    def save_obd_samples(self, samples: List[Tuple[int, Dict]]) -> int:
+        """
+        Guarda muestras de uno o varios viajes en una sola transacción
+        (volcado de la cola write-behind del hilo de adquisición)
+
+        Args:
+            samples: Lista de (trip_id, punto) en orden de llegada
+
+        Returns:
+            Número de filas insertadas
+        """
+        rows = [self._obd_data_row(trip_id, point) for trip_id, point in samples]
+        rollups = aggregate_samples(samples)
+
+        def write(cursor):
+            cursor.executemany(self.OBD_DATA_INSERT, rows)
+            self._save_rollups(cursor, rollups)
+
+        self._write(write)
+        return len(rows)
+
+    @staticmethod
+    def _save_rollups(cursor, rollups: List[Tuple]):
+        """
+        Suma a obd_rollups los agregados de un lote (misma transacción que las muestras)
+
+        Args:
+            cursor: Cursor de la transacción
+            rollups: Filas de aggregate_samples() con trip_id como clave
+        """
+        if not rollups:
+            return
+        trip_ids = sorted({row[0] for row in rollups})
+        cursor.execute(f'''
+            SELECT id, vehicle_id FROM trips WHERE id IN ({', '.join('?' * len(trip_ids))})
+        ''', trip_ids)
+        vehicles = {row[0]: row[1] for row in cursor.fetchall()}
+        cursor.executemany(ROLLUP_UPSERT, [
+            (vehicles[row[0]],) + row[1:] for row in rollups if vehicles.get(row[0]) is not None
+        ])
+
+    def replay_obd_samples(self, samples: List[Tuple[int, Dict]]) -> int:
+        """
+        Reproduce en obd_data las muestras recuperadas del diario de adquisición
+
+        Se descartan las de viajes inexistentes y las que ya están guardadas
+        (mismo viaje y timestamp), porque el último lote confirmado antes de
+        la caída puede no haber llegado al checkpoint del diario.
+
+        Args:
+            samples: Lista de (trip_id, punto) en orden de adquisición
+
+        Returns:
+            Número de filas insertadas
+        """
+        def write(cursor):
+            # Las comprobaciones van en la misma transacción que los INSERT
+            existing = {}
+            rows = []
+            replayed = []
+            for trip_id, point in samples:
+                if trip_id not in existing:
+                    cursor.execute('SELECT id FROM trips WHERE id = ?', (trip_id,))
+                    if cursor.fetchone() is None:
+                        existing[trip_id] = None
+                    else:
+                        cursor.execute('SELECT timestamp FROM obd_data WHERE trip_id = ?', (trip_id,))
+                        existing[trip_id] = {row[0] for row in cursor.fetchall()}
+                saved = existing[trip_id]
+                if saved is None or point.get('timestamp') in saved:
+                    continue
+                saved.add(point.get('timestamp'))
+                rows.append(self._obd_data_row(trip_id, point))
+                replayed.append((trip_id, point))
+
+            cursor.executemany(self.OBD_DATA_INSERT, rows)
+            self._save_rollups(cursor, aggregate_samples(replayed))
+            return len(rows)
+
+        try:
+            inserted = self._write(write)
+            if inserted:
+                print(f"[DB] ✓ {inserted} muestras recuperadas del diario de adquisición")
+            return inserted
+
+        except Exception as e:
+            print(f"[DB] ✗ Error reproduciendo el diario: {e}")
+            raise
+
+    def close_orphaned_trips(self) -> List[int]:
+        """
+        Cierra los viajes que quedaron activos por una caída del servidor
+
+        Las estadísticas se calculan desde obd_data y el fin del viaje se
+        sitúa en su última muestra (o en el inicio si no tiene datos).
+
+        Returns:
+            IDs de los viajes cerrados
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('SELECT id FROM trips WHERE active = 1')
+            trip_ids = [row['id'] for row in cursor.fetchall()]
         finally:
             conn.close()
 
+        for trip_id in trip_ids:
+            stats = self.compute_trip_stats(trip_id)
+
+            def write(cursor, trip_id=trip_id, stats=stats):
+                if stats:
+                    stats['stats_source'] = 'recovered'
+                    self._update_trip_stats(cursor, trip_id, stats)
+                cursor.execute('''
+                    UPDATE trips
+                    SET end_time = datetime(start_time, '+' || ? || ' seconds'), active = 0
+                    WHERE id = ?
+                ''', (stats['duration'] if stats else 0, trip_id))
+                self._refresh_trip_vehicle_summary(cursor, trip_id)
+
+            try:
+                self._write(write)
+                print(f"[DB] ✓ Viaje huérfano {trip_id} cerrado ({stats['samples'] if stats else 0} muestras)")
+            except Exception as e:
+                print(f"[DB] ✗ Error cerrando viaje huérfano {trip_id}: {e}")
+
+        return trip_ids
+
     def save_extended_signals(self, trip_id: int, extended_signals: Dict) -> bool:
         """
         Guarda señales OBDb extendidas en la tabla obd_extended.
@@ -608,9 +1139,6 @@ class DatabaseManager:
         Returns:
             True si se guardó correctamente
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
         try:
             # Extraer valores específicos de cada categoría
             fuel_system = extended_signals.get('fuel_system', {})
@@ -621,22 +1149,7 @@ class DatabaseManager:
             battery = extended_signals.get('battery', {})
             diagnostics = extended_signals.get('diagnostics', {})
 
-            cursor.execute('''
-                INSERT INTO obd_extended (
-                    trip_id,
-                    fuel_trim_short_1, fuel_trim_long_1,
-                    fuel_trim_short_2, fuel_trim_long_2,
-                    fuel_system_status, fuel_level,
-                    o2_b1s1, o2_b1s2, o2_b2s1, o2_b2s2,
-                    lambda_b1s1, lambda_b1s2,
-                    egr_commanded, egr_error, evap_purge, evap_vapor_pressure,
-                    exhaust_temp_b1s1, exhaust_temp_b1s2,
-                    catalyst_temp_b1s1,
-                    dpf_temperature, dpf_pressure, dpf_soot_load,
-                    battery_voltage, battery_current, battery_soc,
-                    mil_status, dtc_count, monitor_status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            row = (
                 trip_id,
                 # Fuel system
                 self._extract_signal_value(fuel_system, 'SHORT_FUEL_TRIM_1'),
@@ -673,18 +1186,30 @@ class DatabaseManager:
                 self._extract_signal_value(diagnostics, 'MIL_STATUS'),
                 self._extract_signal_value(diagnostics, 'DTC_COUNT'),
                 self._extract_signal_value(diagnostics, 'MONITOR_STATUS')
-            ))
+            )
 
-            conn.commit()
+            self._write(lambda cursor: cursor.execute('''
+                INSERT INTO obd_extended (
+                    trip_id,
+                    fuel_trim_short_1, fuel_trim_long_1,
+                    fuel_trim_short_2, fuel_trim_long_2,
+                    fuel_system_status, fuel_level,
+                    o2_b1s1, o2_b1s2, o2_b2s1, o2_b2s2,
+                    lambda_b1s1, lambda_b1s2,
+                    egr_commanded, egr_error, evap_purge, evap_vapor_pressure,
+                    exhaust_temp_b1s1, exhaust_temp_b1s2,
+                    catalyst_temp_b1s1,
+                    dpf_temperature, dpf_pressure, dpf_soot_load,
+                    battery_voltage, battery_current, battery_soc,
+                    mil_status, dtc_count, monitor_status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', row))
             print(f"[DB] ✓ Señales extendidas guardadas para viaje {trip_id}")
             return True
 
         except Exception as e:
-            conn.rollback()
             print(f"[DB] ✗ Error guardando señales extendidas: {e}")
             return False
-        finally:
-            conn.close()
 
     def _extract_signal_value(self, signal_dict: Dict, signal_id: str):
         """
@@ -760,6 +1285,9 @@ class DatabaseManager:
         """
         Obtiene datos OBD de un viaje
 
+        Si el viaje se compactó a obd_chunks sin conservar las filas, los
+        puntos se reconstruyen desde los bloques (con id = None).
+
         Args:
             trip_id: ID del viaje
 
@@ -777,10 +1305,157 @@ class DatabaseManager:
             ''', (trip_id,))
 
             rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            if rows:
+                return [dict(row) for row in rows]
+
+        finally:
+            conn.close()
+
+        if not self.trip_has_chunks(trip_id):
+            return []
+        return series_to_rows(self._read_chunks(trip_id, CHUNK_SIGNALS), trip_id)
+
+    # =========================================================================
+    # SERIES OBD COLUMNARES (obd_chunks)
+    # =========================================================================
+
+    def trip_has_chunks(self, trip_id: int) -> bool:
+        """True si el viaje tiene bloques en obd_chunks"""
+        conn = self._get_connection()
+        try:
+            return conn.execute('SELECT 1 FROM obd_chunks WHERE trip_id = ? LIMIT 1',
+                                (trip_id,)).fetchone() is not None
+        finally:
+            conn.close()
+
+    def compact_trip_to_chunks(self, trip_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                               delete_rows: bool = False) -> Dict:
+        """
+        Convierte las filas de obd_data de un viaje en bloques de obd_chunks
+
+        Idempotente: los bloques anteriores del viaje se sustituyen.
+
+        Args:
+            trip_id: ID del viaje (debe estar cerrado)
+            chunk_size: Muestras por bloque
+            delete_rows: Borrar después las filas de obd_data del viaje
+
+        Returns:
+            Dict con samples, chunks y bytes comprimidos
+        """
+        conn = self._get_connection()
+        try:
+            trip = conn.execute('SELECT active FROM trips WHERE id = ?', (trip_id,)).fetchone()
+            if trip is None:
+                raise ValueError(f"Viaje {trip_id} no encontrado")
+            if trip['active']:
+                raise ValueError(f"Viaje {trip_id} activo: solo se compactan viajes cerrados")
+            rows = conn.execute(f'''
+                SELECT timestamp, {', '.join(CHUNK_SIGNALS)} FROM obd_data
+                WHERE trip_id = ?
+                ORDER BY timestamp ASC, id ASC
+            ''', (trip_id,)).fetchall()
+        finally:
+            conn.close()
+
+        rows = [dict(row) for row in rows]
+        if not rows:
+            return {'trip_id': trip_id, 'samples': 0, 'chunks': 0, 'bytes': 0}
+
+        chunks = build_chunks(trip_id, rows, chunk_size)
+
+        def write(cursor):
+            cursor.execute('DELETE FROM obd_chunks WHERE trip_id = ?', (trip_id,))
+            cursor.executemany('''
+                INSERT INTO obd_chunks (
+                    trip_id, signal, chunk, start_ts, end_ts, count, null_count,
+                    min_value, max_value, sum_value, encoding, data
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', chunks)
+            if delete_rows:
+                cursor.execute('DELETE FROM obd_data WHERE trip_id = ?', (trip_id,))
+
+        self._write(write)
+        return {
+            'trip_id': trip_id,
+            'samples': len(rows),
+            'chunks': len(chunks) // (len(CHUNK_SIGNALS) + 1),
+            'bytes': sum(len(chunk[-1]) for chunk in chunks)
+        }
+
+    def _read_chunks(self, trip_id: int, signals, start: float = None, end: float = None) -> Dict:
+        """Decodifica los bloques de un viaje que solapan [start, end]"""
+        conn = self._get_connection()
+        try:
+            names = [TIMESTAMP_SIGNAL] + list(signals)
+            query = f'''
+                SELECT chunk, signal, data FROM obd_chunks
+                WHERE trip_id = ? AND signal IN ({', '.join('?' * len(names))})
+            '''
+            params = [trip_id] + names
+            if start is not None:
+                query += ' AND end_ts >= ?'
+                params.append(start)
+            if end is not None:
+                query += ' AND start_ts <= ?'
+                params.append(end)
+            rows = conn.execute(query + ' ORDER BY chunk', params).fetchall()
+        finally:
+            conn.close()
+        return decode_series(rows, signals, start, end)
+
+    def get_trip_series(self, trip_id: int, signals=None, start: float = None,
+                        end: float = None) -> Dict:
+        """
+        Series de un viaje como arrays por señal (gráficos y análisis)
+
+        Lee de obd_chunks si el viaje está compactado; si no, de obd_data.
+
+        Args:
+            trip_id: ID del viaje
+            signals: Señales de CHUNK_SIGNALS (None = todas)
+            start: Instante unix mínimo
+            end: Instante unix máximo
+
+        Returns:
+            Dict con 'timestamp' (segundos unix) y un array('d') por señal
+            (NaN donde no hay dato)
+        """
+        signals = [s for s in (signals or CHUNK_SIGNALS) if s in CHUNK_SIGNALS]
+        if self.trip_has_chunks(trip_id):
+            return self._read_chunks(trip_id, signals, start, end)
 
+        return rows_to_series(self.get_trip_obd_data(trip_id), signals, start, end)
+
+    def get_chunk_stats(self, trip_id: int, signal: str) -> Optional[Dict]:
+        """
+        Agregados de una señal desde los metadatos de los bloques (sin decodificar)
+
+        Args:
+            trip_id: ID del viaje
+            signal: Señal de CHUNK_SIGNALS
+
+        Returns:
+            Dict con count, min, max y avg, o None si el viaje no tiene bloques
+        """
+        conn = self._get_connection()
+        try:
+            row = conn.execute('''
+                SELECT SUM(count - null_count) AS count, MIN(min_value) AS min,
+                       MAX(max_value) AS max, SUM(sum_value) AS total
+                FROM obd_chunks
+                WHERE trip_id = ? AND signal = ?
+            ''', (trip_id, signal)).fetchone()
         finally:
             conn.close()
+        if row is None or row['count'] is None:
+            return None
+        return {
+            'count': row['count'],
+            'min': row['min'],
+            'max': row['max'],
+            'avg': row['total'] / row['count'] if row['count'] else None
+        }
 
     # =========================================================================
     # GESTIÓN DE MANTENIMIENTO
@@ -895,16 +1570,60 @@ class DatabaseManager:
     # ESTADÍSTICAS Y ANALYTICS
     # =========================================================================
 
+    VEHICLE_SUMMARY_REFRESH = '''
+        INSERT OR REPLACE INTO vehicle_summary (
+            vehicle_id, total_trips, total_distance, total_duration, sum_avg_speed,
+            sum_health_score, max_speed, first_trip, last_trip, updated_at
+        )
+        SELECT vehicle_id, COUNT(*), COALESCE(SUM(distance), 0), COALESCE(SUM(duration), 0),
+               COALESCE(SUM(avg_speed), 0), SUM(COALESCE(health_score, 100)),
+               COALESCE(MAX(max_speed), 0), MIN(start_time), MAX(start_time), CURRENT_TIMESTAMP
+        FROM trips
+        WHERE active = 0 AND {where}
+        GROUP BY vehicle_id
+    '''
+
+    def _refresh_trip_vehicle_summary(self, cursor, trip_id: int):
+        """Recalcula la fila de vehicle_summary del vehículo de un viaje (misma transacción)"""
+        cursor.execute('SELECT vehicle_id FROM trips WHERE id = ?', (trip_id,))
+        row = cursor.fetchone()
+        if row is not None:
+            cursor.execute(self.VEHICLE_SUMMARY_REFRESH.format(where='vehicle_id = ?'), (row[0],))
+
+    def refresh_vehicle_summary(self, vehicle_id: int = None):
+        """
+        Recalcula vehicle_summary desde trips (todos los vehículos si vehicle_id es None)
+
+        Args:
+            vehicle_id: ID del vehículo (opcional)
+        """
+        def write(cursor):
+            if vehicle_id is None:
+                cursor.execute('DELETE FROM vehicle_summary')
+                cursor.execute(self.VEHICLE_SUMMARY_REFRESH.format(where='1'))
+            else:
+                cursor.execute('DELETE FROM vehicle_summary WHERE vehicle_id = ?', (vehicle_id,))
+                cursor.execute(self.VEHICLE_SUMMARY_REFRESH.format(where='vehicle_id = ?'), (vehicle_id,))
+
+        self._write(write)
+        print(f"[DB] ✓ Resumen de {'todos los vehículos' if vehicle_id is None else f'vehículo {vehicle_id}'} recalculado")
+
     def get_vehicle_stats(self, vehicle_id: int,
                          start_date: str = None,
-                         end_date: str = None) -> Dict:
+                         end_date: str = None,
+                         include_trips: bool = False) -> Dict:
         """
         Obtiene estadísticas de un vehículo
 
+        Sin rango de fechas se leen de vehicle_summary (coste constante); con
+        rango se agregan en SQL sobre el índice cubriente idx_trips_vehicle_stats.
+        avg_speed y avg_health_score son medias de los valores por viaje.
+
         Args:
             vehicle_id: ID del vehículo
             start_date: Fecha inicio (opcional)
             end_date: Fecha fin (opcional)
+            include_trips: Añadir la lista de viajes del rango ('trips')
 
         Returns:
             Diccionario con estadísticas
@@ -913,52 +1632,279 @@ class DatabaseManager:
         cursor = conn.cursor()
 
         try:
-            # Query base
-            base_query = 'SELECT * FROM trips WHERE vehicle_id = ? AND active = 0'
-            params = [vehicle_id]
-
-            if start_date:
-                base_query += ' AND start_time >= ?'
-                params.append(start_date)
-
-            if end_date:
-                base_query += ' AND start_time <= ?'
-                params.append(end_date)
+            if not start_date and not end_date:
+                cursor.execute('''
+                    SELECT total_trips, total_distance, total_duration, max_speed,
+                           sum_avg_speed / total_trips AS avg_speed,
+                           sum_health_score / total_trips AS avg_health_score
+                    FROM vehicle_summary
+                    WHERE vehicle_id = ? AND total_trips > 0
+                ''', (vehicle_id,))
+            else:
+                # Query base
+                query = '''
+                    SELECT COUNT(*) AS total_trips,
+                           SUM(distance) AS total_distance,
+                           SUM(duration) AS total_duration,
+                           MAX(max_speed) AS max_speed,
+                           AVG(avg_speed) AS avg_speed,
+                           AVG(COALESCE(health_score, 100)) AS avg_health_score
+                    FROM trips
+                    WHERE vehicle_id = ? AND active = 0
+                '''
+                params = [vehicle_id]
+
+                if start_date:
+                    query += ' AND start_time >= ?'
+                    params.append(start_date)
+
+                if end_date:
+                    query += ' AND start_time <= ?'
+                    params.append(end_date)
+
+                cursor.execute(query, params)
 
-            cursor.execute(base_query, params)
-            trips = [dict(row) for row in cursor.fetchall()]
+            row = cursor.fetchone()
 
-            if not trips:
-                return {
+            if row is None or not row['total_trips']:
+                stats = {
                     'total_trips': 0,
                     'total_distance': 0,
                     'total_duration': 0,
                     'avg_speed': 0,
                     'avg_health_score': 100
                 }
+            else:
+                stats = {
+                    'total_trips': row['total_trips'],
+                    'total_distance': round(row['total_distance'] or 0, 2),
+                    'total_duration': row['total_duration'] or 0,
+                    'avg_speed': round(row['avg_speed'] or 0, 2),
+                    'max_speed': row['max_speed'] or 0,
+                    'avg_health_score': round(row['avg_health_score'], 2)
+                }
 
-            total_distance = sum(t.get('distance', 0) for t in trips)
-            total_duration = sum(t.get('duration', 0) for t in trips)
-            avg_speed = sum(t.get('avg_speed', 0) for t in trips) / len(trips)
-            avg_health = sum(t.get('health_score', 100) for t in trips) / len(trips)
+            if include_trips:
+                query = 'SELECT * FROM trips WHERE vehicle_id = ? AND active = 0'
+                params = [vehicle_id]
+                if start_date:
+                    query += ' AND start_time >= ?'
+                    params.append(start_date)
+                if end_date:
+                    query += ' AND start_time <= ?'
+                    params.append(end_date)
+                cursor.execute(query + ' ORDER BY start_time', params)
+                stats['trips'] = [dict(r) for r in cursor.fetchall()]
 
-            return {
-                'total_trips': len(trips),
-                'total_distance': round(total_distance, 2),
-                'total_duration': total_duration,
-                'avg_speed': round(avg_speed, 2),
-                'max_speed': max(t.get('max_speed', 0) for t in trips),
-                'avg_health_score': round(avg_health, 2),
-                'trips': trips
-            }
+            return stats
+
+        finally:
+            conn.close()
+
+    def backfill_rollups(self, vehicle_id: int = None) -> int:
+        """
+        Recalcula obd_rollups desde los datos guardados
+
+        Los cubos de 1 s se agregan en SQL desde obd_data (y en Python desde
+        obd_chunks para viajes compactados sin filas); los de 1 min y 1 h
+        se derivan de los de 1 s.
+
+        Args:
+            vehicle_id: Solo este vehículo (None = todos)
+
+        Returns:
+            Número de cubos de 1 s
+        """
+        vehicle_filter = ' AND t.vehicle_id = ?' if vehicle_id is not None else ''
+        vehicle_params = [vehicle_id] if vehicle_id is not None else []
+
+        conn = self._get_connection()
+        try:
+            chunk_trips = conn.execute(f'''
+                SELECT DISTINCT c.trip_id, t.vehicle_id FROM obd_chunks c
+                JOIN trips t ON t.id = c.trip_id
+                WHERE NOT EXISTS (SELECT 1 FROM obd_data o WHERE o.trip_id = c.trip_id){vehicle_filter}
+            ''', vehicle_params).fetchall()
+        finally:
+            conn.close()
+
+        chunk_rollups = []
+        for row in chunk_trips:
+            points = self.get_trip_obd_data(row['trip_id'])
+            chunk_rollups.extend(aggregate_samples([(row['vehicle_id'], p) for p in points], (1,)))
+
+        def write(cursor):
+            cursor.execute(
+                'DELETE FROM obd_rollups' + (' WHERE vehicle_id = ?' if vehicle_id is not None else ''),
+                vehicle_params
+            )
+            for signal in ROLLUP_SIGNALS:
+                cursor.execute(f'''
+                    INSERT INTO obd_rollups (
+                        vehicle_id, signal, resolution, bucket, count, sum_value, min_value, max_value
+                    )
+                    SELECT t.vehicle_id, ?, 1, CAST(strftime('%s', o.timestamp) AS INTEGER) AS second,
+                           COUNT(o.{signal}), SUM(o.{signal}), MIN(o.{signal}), MAX(o.{signal})
+                    FROM obd_data o
+                    JOIN trips t ON t.id = o.trip_id
+                    WHERE o.{signal} IS NOT NULL AND second IS NOT NULL{vehicle_filter}
+                    GROUP BY t.vehicle_id, second
+                ''', [signal] + vehicle_params)
+            cursor.executemany(ROLLUP_UPSERT, chunk_rollups)
+            seconds = cursor.execute(
+                'SELECT COUNT(*) FROM obd_rollups WHERE resolution = 1'
+                + (' AND vehicle_id = ?' if vehicle_id is not None else ''),
+                vehicle_params
+            ).fetchone()[0]
+
+            for finer, coarser in zip(RESOLUTIONS, RESOLUTIONS[1:]):
+                cursor.execute(f'''
+                    INSERT INTO obd_rollups (
+                        vehicle_id, signal, resolution, bucket, count, sum_value, min_value, max_value
+                    )
+                    SELECT vehicle_id, signal, ?, bucket / ? * ?, SUM(count), SUM(sum_value),
+                           MIN(min_value), MAX(max_value)
+                    FROM obd_rollups
+                    WHERE resolution = ?{' AND vehicle_id = ?' if vehicle_id is not None else ''}
+                    GROUP BY vehicle_id, signal, bucket / ?
+                ''', [coarser, coarser, coarser, finer] + vehicle_params + [coarser])
+            return seconds
+
+        seconds = self._write(write)
+        print(f"[DB] ✓ Rollups recalculados ({seconds} cubos de 1 s)")
+        return seconds
+
+    def _rollup_range(self, vehicle_id: int, start: str = None, end: str = None) -> Optional[Tuple[int, int]]:
+        """
+        Rango [inicio, fin] en segundos de reloj; lo que falte se toma de los datos
+
+        Una fecha de fin sin hora ('2026-10-31') incluye el día completo.
+        """
+        start_s = bucket_epoch(start) if start else None
+        end_s = bucket_epoch(end) if end else None
+        if end_s is not None and len(str(end)) == 10:
+            end_s += 86399
+        if start_s is None or end_s is None:
+            conn = self._get_connection()
+            try:
+                row = conn.execute('''
+                    SELECT MIN(bucket) AS first, MAX(bucket) AS last FROM obd_rollups
+                    WHERE vehicle_id = ? AND resolution = ?
+                ''', (vehicle_id, RESOLUTIONS[-1])).fetchone()
+            finally:
+                conn.close()
+            if row['first'] is None:
+                return None
+            start_s = row['first'] if start_s is None else start_s
+            end_s = row['last'] + RESOLUTIONS[-1] - 1 if end_s is None else end_s
+        return (start_s, end_s) if start_s <= end_s else None
+
+    def get_rollup_series(self, vehicle_id: int, signals=None, start: str = None, end: str = None,
+                          max_points: int = DEFAULT_MAX_POINTS) -> Dict:
+        """
+        Serie temporal agregada de un vehículo para gráficos de rango largo
+
+        Elige la resolución más gruesa que respeta el presupuesto de puntos
+        (ver choose_resolution()) y reagrupa en SQL.
+
+        Args:
+            vehicle_id: ID del vehículo
+            signals: Señales de ROLLUP_SIGNALS (None = todas)
+            start: Inicio ISO (None = primer dato)
+            end: Fin ISO (None = último dato)
+            max_points: Puntos máximos por señal
+
+        Returns:
+            Dict con resolution, bucket_seconds, start, end y por señal
+            listas timestamps/avg/min/max/count
+        """
+        signals = [s for s in (signals or ROLLUP_SIGNALS) if s in ROLLUP_SIGNALS]
+        result = {'resolution': None, 'bucket_seconds': None, 'start': None, 'end': None,
+                  'series': {signal: {'timestamps': [], 'avg': [], 'min': [], 'max': [], 'count': []}
+                             for signal in signals}}
+        bounds = self._rollup_range(vehicle_id, start, end)
+        if bounds is None or not signals:
+            return result
+
+        start_s, end_s = bounds
+        resolution, width = choose_resolution(start_s, end_s, max_points)
+        result.update(resolution=resolution, bucket_seconds=width,
+                      start=format_bucket(start_s), end=format_bucket(end_s))
+
+        conn = self._get_connection()
+        try:
+            rows = conn.execute(f'''
+                SELECT signal, bucket / ? * ? AS point, SUM(count) AS count, SUM(sum_value) AS total,
+                       MIN(min_value) AS min, MAX(max_value) AS max
+                FROM obd_rollups
+                WHERE vehicle_id = ? AND resolution = ?
+                  AND signal IN ({', '.join('?' * len(signals))})
+                  AND bucket BETWEEN ? AND ?
+                GROUP BY signal, point
+                ORDER BY signal, point
+            ''', [width, width, vehicle_id, resolution] + signals
+                 + [start_s - start_s % resolution, end_s]).fetchall()
+        finally:
+            conn.close()
+
+        for row in rows:
+            series = result['series'][row['signal']]
+            series['timestamps'].append(format_bucket(row['point']))
+            series['avg'].append(round(row['total'] / row['count'], 3))
+            series['min'].append(row['min'])
+            series['max'].append(row['max'])
+            series['count'].append(row['count'])
+        return result
+
+    def get_rollup_summary(self, vehicle_id: int, signals=None, start: str = None,
+                           end: str = None) -> Dict:
+        """
+        Media ponderada por muestra, mínimo y máximo de cada señal en un rango
+
+        Usa la resolución más gruesa cuyos cubos encajan en el rango (1 h
+        para rangos por días), así el resultado es exacto.
+
+        Returns:
+            Dict señal -> {count, avg, min, max}
+        """
+        signals = [s for s in (signals or ROLLUP_SIGNALS) if s in ROLLUP_SIGNALS]
+        bounds = self._rollup_range(vehicle_id, start, end)
+        if bounds is None or not signals:
+            return {}
 
+        start_s, end_s = bounds
+        conn = self._get_connection()
+        try:
+            rows = conn.execute(f'''
+                SELECT signal, SUM(count) AS count, SUM(sum_value) AS total,
+                       MIN(min_value) AS min, MAX(max_value) AS max
+                FROM obd_rollups
+                WHERE vehicle_id = ? AND resolution = ?
+                  AND signal IN ({', '.join('?' * len(signals))})
+                  AND bucket BETWEEN ? AND ?
+                GROUP BY signal
+            ''', [vehicle_id, aligned_resolution(start_s, end_s)] + signals + [start_s, end_s]).fetchall()
         finally:
             conn.close()
 
+        return {
+            row['signal']: {
+                'count': row['count'],
+                'avg': round(row['total'] / row['count'], 2),
+                'min': row['min'],
+                'max': row['max']
+            }
+            for row in rows
+        }
+
     def get_fleet_stats(self) -> Dict:
         """
         Obtiene estadísticas de toda la flota
 
+        Una sola consulta: los totales de viajes salen de vehicle_summary
+        (una fila por vehículo) y los viajes activos del índice parcial
+        idx_trips_open.
+
         Returns:
             Diccionario con estadísticas de la flota
         """
@@ -966,27 +1912,20 @@ class DatabaseManager:
         cursor = conn.cursor()
 
         try:
-            # Total vehículos activos
-            cursor.execute('SELECT COUNT(*) as count FROM vehicles WHERE active = 1')
-            total_vehicles = cursor.fetchone()['count']
-
-            # Total viajes
-            cursor.execute('SELECT COUNT(*) as count FROM trips WHERE active = 0')
-            total_trips = cursor.fetchone()['count']
-
-            # Distancia total
-            cursor.execute('SELECT SUM(distance) as total FROM trips WHERE active = 0')
-            total_distance = cursor.fetchone()['total'] or 0
-
-            # Viajes activos
-            cursor.execute('SELECT COUNT(*) as count FROM trips WHERE active = 1')
-            active_trips = cursor.fetchone()['count']
+            cursor.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM vehicles WHERE active = 1) AS total_vehicles,
+                    (SELECT COALESCE(SUM(total_trips), 0) FROM vehicle_summary) AS total_trips,
+                    (SELECT COALESCE(SUM(total_distance), 0) FROM vehicle_summary) AS total_distance,
+                    (SELECT COUNT(*) FROM trips INDEXED BY idx_trips_open WHERE active = 1) AS active_trips
+            ''')
+            row = cursor.fetchone()
 
             return {
-                'total_vehicles': total_vehicles,
-                'total_trips': total_trips,
-                'total_distance': round(total_distance, 2),
-                'active_trips': active_trips
+                'total_vehicles': row['total_vehicles'],
+                'total_trips': row['total_trips'],
+                'total_distance': round(row['total_distance'], 2),
+                'active_trips': row['active_trips']
             }
 
         finally:
@@ -998,7 +1937,7 @@ class DatabaseManager:
 
     def create_alert(self, vehicle_id: int, alert_type: str, severity: str,
                     message: str, value: float = None, threshold: float = None,
-                    trip_id: int = None) -> int:
+                    trip_id: int = None, wait: bool = True):
         """
         Crea una alerta
 
@@ -1010,32 +1949,31 @@ class DatabaseManager:
             value: Valor que disparó la alerta
             threshold: Umbral
             trip_id: ID del viaje (opcional)
+            wait: False = no esperar al commit (devuelve un Future con el ID)
 
         Returns:
-            ID de la alerta
+            ID de la alerta (Future con el ID si wait=False)
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        try:
+        def write(cursor):
             cursor.execute('''
                 INSERT INTO alerts (
                     vehicle_id, trip_id, alert_type, severity,
                     message, value, threshold
                 ) VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (vehicle_id, trip_id, alert_type, severity, message, value, threshold))
+            return cursor.lastrowid
 
-            alert_id = cursor.lastrowid
-            conn.commit()
-            print(f"[DB] ⚠️  Alerta creada: {alert_type} - {message}")
-            return alert_id
+        future = self.submit_write(write)
+        if not wait:
+            return future
 
+        try:
+            alert_id = future.result()
         except Exception as e:
-            conn.rollback()
             print(f"[DB] ✗ Error creando alerta: {e}")
             raise
-        finally:
-            conn.close()
+        print(f"[DB] ⚠️  Alerta creada: {alert_type} - {message}")
+        return alert_id
 
     def get_vehicle_alerts(self, vehicle_id: int,
                           acknowledged: bool = None,
@@ -1387,6 +2325,203 @@ class DatabaseManager:
         """
         return self.update_alert_rule(rule_id, enabled=1 if enabled else 0)
 
+    # =========================================================================
+    # HISTORIAL DE SALUD Y RESÚMENES DE VIAJE
+    # =========================================================================
+
+    def add_health_record(self, health: Dict, vehicle_id: int = None, trip_id: int = None,
+                          wait: bool = True):
+        """
+        Añade una evaluación de salud al historial (un INSERT, sin reescrituras)
+
+        Args:
+            health: Dict con la estructura de vehicle_health
+            vehicle_id: Vehículo evaluado (None si no se conoce)
+            trip_id: Viaje en curso
+            wait: False = no esperar al commit (hilo de adquisición)
+
+        Returns:
+            ID del registro (Future con el ID si wait=False)
+        """
+        row = (
+            vehicle_id,
+            trip_id,
+            health.get('last_update') or datetime.now().isoformat(),
+            health.get('overall_score'),
+            health.get('engine_health'),
+            health.get('thermal_health'),
+            health.get('efficiency_health'),
+            json.dumps(health.get('warnings', []), ensure_ascii=False),
+            json.dumps(health.get('predictions', []), ensure_ascii=False)
+        )
+
+        def write(cursor):
+            cursor.execute('''
+                INSERT INTO health_history (
+                    vehicle_id, trip_id, timestamp, overall_score, engine_health,
+                    thermal_health, efficiency_health, warnings, predictions
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', row)
+            return cursor.lastrowid
+
+        future = self.submit_write(write)
+        if not wait:
+            return future
+
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"[DB] ✗ Error guardando historial de salud: {e}")
+            raise
+
+    def get_health_history(self, vehicle_id: int = None, start: str = None,
+                           end: str = None, limit: int = 100) -> List[Dict]:
+        """
+        Historial de salud en un rango temporal (usa el índice vehículo + tiempo)
+
+        Args:
+            vehicle_id: Filtrar por vehículo
+            start: Timestamp ISO inicial (incluido)
+            end: Timestamp ISO final (incluido)
+            limit: Máximo de registros (los más recientes)
+
+        Returns:
+            Registros en orden cronológico con la estructura de vehicle_health
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            query = 'SELECT * FROM health_history WHERE 1=1'
+            params = []
+
+            if vehicle_id is not None:
+                query += ' AND vehicle_id = ?'
+                params.append(vehicle_id)
+            if start:
+                query += ' AND timestamp >= ?'
+                params.append(start)
+            if end:
+                query += ' AND timestamp <= ?'
+                params.append(end)
+
+            query += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+            params.append(limit)
+
+            cursor.execute(query, params)
+            history = []
+            for row in reversed(cursor.fetchall()):
+                record = dict(row)
+                record['warnings'] = json.loads(record['warnings'] or '[]')
+                record['predictions'] = json.loads(record['predictions'] or '[]')
+                record['last_update'] = record.pop('timestamp')
+                history.append(record)
+            return history
+
+        finally:
+            conn.close()
+
+    def add_trip_summary(self, summary: Dict, vehicle_id: int = None) -> int:
+        """
+        Añade un resumen de viaje
+
+        Args:
+            summary: Resumen (se guarda completo como JSON)
+            vehicle_id: Vehículo del viaje
+
+        Returns:
+            ID del registro
+        """
+        row = (
+            vehicle_id,
+            summary.get('timestamp') or summary.get('fecha') or datetime.now().isoformat(),
+            summary.get('distancia_km') or summary.get('distance_km') or 0,
+            json.dumps(summary, ensure_ascii=False)
+        )
+
+        def write(cursor):
+            cursor.execute('''
+                INSERT INTO trip_summaries (vehicle_id, timestamp, distance_km, summary)
+                VALUES (?, ?, ?, ?)
+            ''', row)
+            return cursor.lastrowid
+
+        try:
+            return self._write(write)
+        except Exception as e:
+            print(f"[DB] ✗ Error guardando resumen de viaje: {e}")
+            raise
+
+    def get_trip_summary_totals(self, vehicle_id: int = None) -> Dict:
+        """
+        Número de viajes y kilómetros de los resúmenes guardados
+
+        Args:
+            vehicle_id: Filtrar por vehículo (None = todos)
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            query = 'SELECT COUNT(*) AS trips, COALESCE(SUM(distance_km), 0) AS total_km FROM trip_summaries'
+            params = []
+            if vehicle_id is not None:
+                query += ' WHERE vehicle_id = ?'
+                params.append(vehicle_id)
+            cursor.execute(query, params)
+            return dict(cursor.fetchone())
+
+        finally:
+            conn.close()
+
+    def prune_history(self, table: str, max_age_days: int = None, max_rows: int = None,
+                      wait: bool = True):
+        """
+        Retención del historial por antigüedad y/o número de registros por vehículo
+
+        Args:
+            table: 'health_history' o 'trip_summaries'
+            max_age_days: Borrar registros más antiguos que estos días
+            max_rows: Registros máximos que se conservan por vehículo
+            wait: False = no esperar al commit (hilo de adquisición)
+
+        Returns:
+            Registros borrados (Future con el número si wait=False)
+        """
+        if table not in ('health_history', 'trip_summaries'):
+            raise ValueError(f"Tabla de historial no válida: {table}")
+
+        def write(cursor):
+            deleted = 0
+            if max_age_days:
+                cutoff = datetime.fromtimestamp(datetime.now().timestamp() - max_age_days * 86400).isoformat()
+                cursor.execute(f'DELETE FROM {table} WHERE timestamp < ?', (cutoff,))
+                deleted += cursor.rowcount
+
+            if max_rows:
+                # Por vehículo: el timestamp del registro max_rows-ésimo más reciente marca el corte
+                cursor.execute(f'SELECT DISTINCT vehicle_id FROM {table}')
+                for (vehicle_id,) in cursor.fetchall():
+                    cursor.execute(f'''
+                        DELETE FROM {table}
+                        WHERE vehicle_id IS ? AND timestamp < (
+                            SELECT timestamp FROM {table} WHERE vehicle_id IS ?
+                            ORDER BY timestamp DESC LIMIT 1 OFFSET ?
+                        )
+                    ''', (vehicle_id, vehicle_id, max_rows - 1))
+                    deleted += cursor.rowcount
+            return deleted
+
+        future = self.submit_write(write)
+        if not wait:
+            return future
+
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"[DB] ✗ Error aplicando retención en {table}: {e}")
+            raise
+
     # =========================================================================
     # GESTIÓN DE PERFILES DE PIDs
     # =========================================================================
@@ -1402,37 +2537,50 @@ class DatabaseManager:
                 - pids: Lista de PIDs con sus datos
                 - protocol: Protocolo OBD del vehículo
                 - scan_date: Fecha del escaneo
+                - pid_stats: (opcional) estadísticas de fiabilidad por PID
 
         Returns:
             ID del perfil creado
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        profile_data = dict(profile_data)
+        pid_stats = profile_data.pop('pid_stats', None)
+
+        def write(cursor):
+            if pid_stats is None:
+                # Conservar lo aprendido en el perfil anterior
+                cursor.execute('''
+                    SELECT pid_stats FROM vehicle_pids_profiles
+                    WHERE vehicle_id = ? AND pid_stats IS NOT NULL
+                    ORDER BY scan_date DESC, id DESC
+                    LIMIT 1
+                ''', (vehicle_id,))
+                row = cursor.fetchone()
+                pid_stats_json = row[0] if row else None
+            else:
+                pid_stats_json = json.dumps(pid_stats)
 
-        try:
             cursor.execute('''
-                INSERT INTO vehicle_pids_profiles (vehicle_id, total_pids, pids_data, protocol)
-                VALUES (?, ?, ?, ?)
+                INSERT INTO vehicle_pids_profiles (vehicle_id, total_pids, pids_data, protocol, pid_stats)
+                VALUES (?, ?, ?, ?, ?)
             ''', (
                 vehicle_id,
                 profile_data.get('total_pids', 0),
                 json.dumps(profile_data),
-                profile_data.get('protocol', 'Unknown')
+                profile_data.get('protocol', 'Unknown'),
+                pid_stats_json
             ))
+            return cursor.lastrowid
 
-            conn.commit()
-            profile_id = cursor.lastrowid
+        try:
+            profile_id = self._write(write)
 
             print(f"[DB] ✓ Perfil de PIDs guardado para vehículo {vehicle_id}: {profile_data.get('total_pids', 0)} PIDs")
 
             return profile_id
 
         except Exception as e:
-            conn.rollback()
             print(f"[DB] ✗ Error guardando perfil de PIDs: {e}")
             raise
-        finally:
-            conn.close()
 
     def get_vehicle_pids_profile(self, vehicle_id: int) -> Optional[dict]:
         """
@@ -1449,10 +2597,10 @@ class DatabaseManager:
 
         try:
             cursor.execute('''
-                SELECT pids_data, scan_date, total_pids, protocol
+                SELECT pids_data, scan_date, total_pids, protocol, pid_stats
                 FROM vehicle_pids_profiles
                 WHERE vehicle_id = ?
-                ORDER BY scan_date DESC
+                ORDER BY scan_date DESC, id DESC
                 LIMIT 1
             ''', (vehicle_id,))
 
@@ -1463,6 +2611,7 @@ class DatabaseManager:
                 profile['scan_date'] = row[1]
                 profile['total_pids'] = row[2]
                 profile['protocol'] = row[3]
+                profile['pid_stats'] = json.loads(row[4]) if row[4] else {}
                 return profile
 
             return None
@@ -1473,6 +2622,37 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def save_pid_stats(self, vehicle_id: int, pid_stats: dict) -> bool:
+        """
+        Actualiza las estadísticas de fiabilidad por PID del perfil más reciente
+
+        Args:
+            vehicle_id: ID del vehículo
+            pid_stats: Dict {pid_name: contadores} (PIDStatsTracker.to_dict())
+
+        Returns:
+            True si se actualizó; False si el vehículo aún no tiene perfil
+        """
+        def write(cursor):
+            cursor.execute('''
+                UPDATE vehicle_pids_profiles
+                SET pid_stats = ?
+                WHERE id = (
+                    SELECT id FROM vehicle_pids_profiles
+                    WHERE vehicle_id = ?
+                    ORDER BY scan_date DESC, id DESC
+                    LIMIT 1
+                )
+            ''', (json.dumps(pid_stats), vehicle_id))
+            return cursor.rowcount > 0
+
+        try:
+            return self._write(write)
+
+        except Exception as e:
+            print(f"[DB] ✗ Error guardando estadísticas de PIDs: {e}")
+            return False
+
     def get_all_pids_profiles(self, vehicle_id: int) -> List[dict]:
         """
         Obtiene todos los perfiles de PIDs históricos de un vehículo
@@ -1515,16 +2695,19 @@ class DatabaseManager:
 # Inicialización global
 _db_instance = None
 
-def get_db() -> DatabaseManager:
+def get_db(profile=None) -> DatabaseManager:
     """
     Obtiene instancia singleton del DatabaseManager
 
+    Args:
+        profile: Perfil de almacenamiento (solo se usa al crear la instancia)
+
     Returns:
         Instancia de DatabaseManager
     """
     global _db_instance
     if _db_instance is None:
-        _db_instance = DatabaseManager()
+        _db_instance = DatabaseManager(profile=profile)
     return _db_instance
 
 
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - POOL DE CONEXIONES SQLITE
+# Conexiones persistentes reutilizadas entre llamadas: cada hilo toma una
+# del pool y la devuelve al cerrarla, en vez de abrir y cerrar el fichero
+# =============================================================================
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Union
+
+# =============================================================================
+# PERFILES DE ALMACENAMIENTO
+# =============================================================================
+
+# PRAGMAs por perfil. journal_mode es del fichero (se fija una vez al abrir);
+# el resto se aplica a cada conexión nueva del pool.
+STORAGE_PROFILES = {
+    # WAL: los lectores no bloquean al escritor; NORMAL solo hace fsync en
+    # los checkpoints (una caída del SO puede perder las últimas
+    # transacciones, nunca corromper la BD)
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,          # KiB (negativo) = 64 MiB por conexión
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,          # ms esperando un bloqueo antes de "database is locked"
+        'wal_autocheckpoint': 10000,   # Red de seguridad; el checkpoint normal lo hace WALCheckpointer
+    },
+    # WAL con fsync en cada commit
+    'wal_durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -65536,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 10000,
+    },
+    # Comportamiento anterior (rollback journal, valores por defecto de SQLite)
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+}
+
+
+def resolve_profile(profile: Union[str, Dict, None]) -> Dict:
+    """
+    PRAGMAs de un perfil por nombre, o un dict que se superpone a 'wal'
+
+    Args:
+        profile: Nombre de STORAGE_PROFILES, dict de PRAGMAs o None ('wal')
+    """
+    if profile is None:
+        return dict(STORAGE_PROFILES['wal'])
+    if isinstance(profile, str):
+        if profile not in STORAGE_PROFILES:
+            raise ValueError(f"Perfil de almacenamiento desconocido: {profile}")
+        return dict(STORAGE_PROFILES[profile])
+    return {**STORAGE_PROFILES['wal'], **profile}
+
+
+def apply_connection_pragmas(conn: sqlite3.Connection, pragmas: Dict):
+    """Aplica los PRAGMAs de conexión de un perfil (todos salvo journal_mode)"""
+    for name, value in pragmas.items():
+        if name != 'journal_mode':
+            conn.execute(f"PRAGMA {name} = {value}")
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Conexión SQLite perteneciente a un pool
+
+    close() no cierra el fichero: devuelve la conexión al pool (deshaciendo
+    lo que no se haya confirmado, igual que antes hacía el cierre real).
+    dispose() la cierra de verdad.
+
+    Un préstamo anidado (un método que llama a otro en el mismo hilo) abre
+    un SAVEPOINT: mientras está abierto, commit() confirma solo el trabajo
+    del préstamo interior (RELEASE) y rollback() deshace solo ese trabajo
+    (ROLLBACK TO), sin tocar lo pendiente del exterior. Lo confirmado dentro
+    pasa a formar parte de la transacción exterior y se hace durable con
+    el commit de esta.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self._savepoints = []
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def begin_nested(self):
+        """Abre el SAVEPOINT de un préstamo anidado"""
+        name = f"pool_nested_{len(self._savepoints) + 1}"
+        self.execute(f"SAVEPOINT {name}")
+        self._savepoints.append(name)
+
+    def end_nested(self):
+        """Cierra el SAVEPOINT del préstamo anidado, deshaciendo lo no confirmado"""
+        name = self._savepoints.pop()
+        try:
+            self.execute(f"ROLLBACK TO {name}")
+            self.execute(f"RELEASE {name}")
+        except sqlite3.Error:
+            pass
+
+    def commit(self):
+        if not self._savepoints:
+            return super().commit()
+        name = self._savepoints[-1]
+        self.execute(f"RELEASE {name}")
+        self.execute(f"SAVEPOINT {name}")
+
+    def rollback(self):
+        if not self._savepoints:
+            return super().rollback()
+        self.execute(f"ROLLBACK TO {self._savepoints[-1]}")
+
+    def dispose(self):
+        """Cierra la conexión definitivamente"""
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones SQLite con préstamo por hilo
+
+    - acquire() devuelve la conexión que el hilo ya tiene prestada (llamadas
+      anidadas comparten conexión, cada una dentro de su propio SAVEPOINT)
+      o toma una libre del pool
+    - La conexión vuelve al pool cuando se libera tantas veces como se pidió;
+      en ese momento se deshace cualquier transacción sin confirmar
+    - Como mucho max_idle conexiones quedan abiertas esperando
+
+    Las conexiones se crean con check_same_thread=False porque pasan de un
+    hilo a otro, pero nunca las usan dos hilos a la vez.
+    """
+
+    def __init__(self, db_path: str, max_idle: int = 8,
+                 configure: Optional[Callable[[sqlite3.Connection], None]] = None):
+        """
+        Args:
+            db_path: Ruta al archivo de base de datos SQLite
+            max_idle: Conexiones libres que se mantienen abiertas
+            configure: Función aplicada a cada conexión nueva (row_factory, PRAGMAs)
+        """
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.configure = configure
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.created = 0
+        self.acquired = 0
+        self.reused = 0
+
+    def acquire(self) -> PooledConnection:
+        """
+        Presta una conexión al hilo actual
+
+        Returns:
+            Conexión lista para usar (liberarla con close())
+        """
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None:
+            conn.begin_nested()
+            local.depth += 1
+            return conn
+
+        with self._lock:
+            self.acquired += 1
+            conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self.reused += 1
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, factory=PooledConnection, check_same_thread=False)
+            if self.configure:
+                self.configure(conn)
+            with self._lock:
+                self.created += 1
+
+        conn.pool = self
+        local.conn = conn
+        local.depth = 1
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Devuelve una conexión prestada (la llama PooledConnection.close())"""
+        local = self._local
+        if getattr(local, 'conn', None) is not conn:
+            # Conexión de otro hilo o ya devuelta: no tocar el préstamo actual
+            return
+        local.depth -= 1
+        if local.depth > 0:
+            conn.end_nested()
+            return
+        local.conn = None
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.dispose()
+            return
+
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.dispose()
+
+    def close_all(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.max_idle = 0
+        for conn in idle:
+            conn.dispose()
+
+    def get_stats(self) -> Dict:
+        """Contadores del pool"""
+        with self._lock:
+            return {
+                'created': self.created,
+                'acquired': self.acquired,
+                'reused': self.reused,
+                'idle': len(self._idle),
+                'max_idle': self.max_idle
+            }
+
+
+class WALCheckpointer:
+    """
+    Checkpoint del WAL en segundo plano
+
+    Cada interval segundos hace un checkpoint PASSIVE (copia al fichero
+    principal lo que ningún lector necesita, sin bloquear a nadie). Si el
+    -wal supera truncate_bytes, hace TRUNCATE para devolver el espacio
+    (espera a los lectores como mucho busy_timeout). Así los commits de la
+    ingesta no pagan el checkpoint automático.
+    """
+
+    def __init__(self, db_path: str, interval: float = 30.0,
+                 truncate_bytes: int = 64 * 1024 * 1024, busy_timeout: int = 5000):
+        """
+        Args:
+            db_path: Ruta al archivo de base de datos SQLite
+            interval: Segundos entre checkpoints
+            truncate_bytes: Tamaño del -wal que fuerza un checkpoint TRUNCATE
+            busy_timeout: ms de espera ante bloqueos
+        """
+        self.db_path = db_path
+        self.interval = interval
+        self.truncate_bytes = truncate_bytes
+        self.busy_timeout = busy_timeout
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.checkpoints = 0
+        self.truncates = 0
+        self.busy = 0
+        self.last_checkpoint = None
+        self.last_result = None
+        self.last_duration_ms = None
+        self.last_error = None
+
+    @property
+    def wal_path(self) -> str:
+        return self.db_path + '-wal'
+
+    def wal_bytes(self) -> int:
+        """Tamaño actual del fichero -wal (0 si no existe)"""
+        try:
+            return os.path.getsize(self.wal_path)
+        except OSError:
+            return 0
+
+    def start(self):
+        """Arranca el hilo de checkpoints (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wal-checkpointer", daemon=True)
+        self._thread.start()
+        print(f"[DB] ✓ Checkpoint WAL cada {self.interval:g}s (TRUNCATE a partir de "
+              f"{self.truncate_bytes // (1024 * 1024)} MB)")
+
+    def stop(self):
+        """Detiene el hilo y deja el WAL vacío"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.interval + 1)
+            self._thread = None
+        self.checkpoint('TRUNCATE')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.checkpoint('TRUNCATE' if self.wal_bytes() >= self.truncate_bytes else 'PASSIVE')
+
+    def checkpoint(self, mode: str = 'PASSIVE') -> Optional[Dict]:
+        """
+        Ejecuta un checkpoint
+
+        Args:
+            mode: PASSIVE, FULL, RESTART o TRUNCATE
+
+        Returns:
+            Dict con busy, log_frames y checkpointed_frames, o None si falla
+        """
+        start = time.perf_counter()
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000)
+            try:
+                busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            self.last_error = str(e)
+            print(f"[DB] ✗ Error en checkpoint WAL: {e}")
+            return None
+
+        self.checkpoints += 1
+        if mode == 'TRUNCATE':
+            self.truncates += 1
+        if busy:
+            self.busy += 1
+        self.last_checkpoint = time.time()
+        self.last_duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.last_result = {'mode': mode, 'busy': busy, 'log_frames': log_frames,
+                            'checkpointed_frames': checkpointed}
+        return self.last_result
+
+    def get_status(self) -> Dict:
+        """Estado del checkpointer y tamaño actual del WAL"""
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'interval': self.interval,
+            'wal_bytes': self.wal_bytes(),
+            'truncate_bytes': self.truncate_bytes,
+            'checkpoints': self.checkpoints,
+            'truncates': self.truncates,
+            'busy': self.busy,
+            'last_checkpoint': self.last_checkpoint,
+            'last_duration_ms': self.last_duration_ms,
+            'last_result': self.last_result,
+            'last_error': self.last_error
+        }
+
+
+if __name__ == "__main__":
+    # Coste por consulta: conexión nueva en cada llamada frente a pool
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    setup = sqlite3.connect(path)
+    setup.execute('CREATE TABLE vehicles (id INTEGER PRIMARY KEY, brand TEXT, model TEXT)')
+    setup.executemany('INSERT INTO vehicles (brand, model) VALUES (?, ?)', [('VW', f'M{i}') for i in range(100)])
+    setup.commit()
+    setup.close()
+
+    def configure(conn):
+        conn.row_factory = sqlite3.Row
+
+    def per_call():
+        conn = sqlite3.connect(path)
+        configure(conn)
+        conn.execute('SELECT * FROM vehicles WHERE id = ?', (42,)).fetchone()
+        conn.close()
+
+    pool = ConnectionPool(path, configure=configure)
+
+    def pooled():
+        conn = pool.acquire()
+        conn.execute('SELECT * FROM vehicles WHERE id = ?', (42,)).fetchone()
+        conn.close()
+
+    for name, fn in (('connect() por llamada', per_call), ('pool', pooled)):
+        rounds = 2000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        print(f"{name:22s} {(time.perf_counter() - start) / rounds * 1e6:8.1f} µs/consulta")
+    print(pool.get_stats())
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - ESCRITOR ÚNICO DE BASE DE DATOS (GROUP COMMIT)
+# Todas las escrituras pasan por una cola acotada; un hilo con su propia
+# conexión las agrupa en transacciones y resuelve un Future por escritura
+# =============================================================================
+
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+from acquisition_metrics import LatencyHistogram
+
+_STOP = object()
+
+
+class DBWriter:
+    """
+    Hilo escritor con group commit
+
+    - submit(fn) encola fn(cursor) y devuelve un Future con su resultado
+      (ej: lastrowid); la cola está acotada, así que si la BD no da abasto
+      los productores esperan en vez de acumular memoria
+    - El hilo toma todas las escrituras pendientes (las que llegaron
+      mientras se confirmaba el grupo anterior) hasta max_batch y las
+      ejecuta en una única transacción (un solo fsync). Con max_latency > 0
+      además espera hasta ese plazo desde la primera a que lleguen más,
+      útil solo con productores que no esperan el resultado
+    - Cada escritura va dentro de un SAVEPOINT: si una falla solo se
+      deshace la suya y su Future recibe la excepción; el resto se confirma
+
+    Las funciones encoladas solo deben usar el cursor recibido (sin
+    commit/rollback ni llamadas a otros métodos que escriban).
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_batch: int = 256,
+                 max_latency: float = 0.0, max_queue: int = 10000):
+        """
+        Args:
+            connect: Crea la conexión del escritor (se usa en modo autocommit)
+            max_batch: Escrituras máximas por transacción
+            max_latency: Segundos máximos que la primera escritura espera a otras
+            max_queue: Escrituras máximas en cola (submit() bloquea al llegar)
+        """
+        self.connect = connect
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stopping = False
+
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.commits = 0
+        self.failed_commits = 0
+        self.max_group = 0
+        self.last_error = None
+        self._commit_latency = LatencyHistogram()
+
+    # =========================================================================
+    # CICLO DE VIDA
+    # =========================================================================
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        """Abre la conexión del escritor y arranca el hilo (idempotente)"""
+        if self.running:
+            return
+        self._conn = self.connect()
+        self._conn.isolation_level = None  # BEGIN/COMMIT explícitos
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        print(f"[DB] ✓ Escritor único activo (grupos de hasta {self.max_batch}, "
+              f"espera máx {self.max_latency * 1000:g} ms)")
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Confirma lo pendiente y detiene el hilo
+
+        Desde aquí submit() rechaza escrituras nuevas; las que aun así
+        queden detrás de la marca de parada reciben una excepción.
+        """
+        if not self.running:
+            return
+        with self._lock:
+            self._stopping = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        print(f"[DB] Escritor detenido ({self.jobs} escrituras en {self.commits} commits)")
+
+    def in_writer_thread(self) -> bool:
+        """True si se llama desde el propio hilo escritor"""
+        return threading.current_thread() is self._thread
+
+    # =========================================================================
+    # ENCOLADO Y GROUP COMMIT
+    # =========================================================================
+
+    def submit(self, fn: Callable[[sqlite3.Cursor], object]) -> Future:
+        """
+        Encola una escritura
+
+        Args:
+            fn: Función que recibe un cursor y devuelve el resultado del Future
+
+        Returns:
+            Future resuelto tras el commit del grupo que la incluye
+
+        Raises:
+            RuntimeError: Si el escritor no está activo o se está deteniendo
+        """
+        future = Future()
+        with self._lock:
+            if self._stopping or not self.running:
+                raise RuntimeError("El escritor de BD no está activo")
+            self._queue.put((fn, future))
+        return future
+
+    def _collect(self, first) -> list:
+        """Agrupa las escrituras en cola hasta max_batch (esperando como mucho max_latency)"""
+        batch = [first]
+        if first is _STOP:
+            return batch
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = self._collect(self._queue.get())
+            if batch[-1] is _STOP:
+                batch.pop()
+                stopping = True
+            if batch:
+                self._commit_group(batch)
+        self._fail_pending()
+        self._conn.close()
+
+    def _fail_pending(self):
+        """Resuelve con error lo que quedó en cola detrás de _STOP"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("El escritor de BD se detuvo antes de ejecutar la escritura"))
+
+    def _commit_group(self, batch: list):
+        cursor = self._conn.cursor()
+        done = []
+        ran = 0
+        start = time.perf_counter()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                ran += 1
+                cursor.execute('SAVEPOINT job')
+                try:
+                    result = fn(cursor)
+                    cursor.execute('RELEASE job')
+                    done.append((future, result))
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO job')
+                    cursor.execute('RELEASE job')
+                    self.failed_jobs += 1
+                    future.set_exception(e)
+            cursor.execute('COMMIT')
+        except Exception as e:
+            # Fallo de la transacción completa: nada del grupo se confirmó
+            try:
+                self._conn.rollback()
+            except sqlite3.Error:
+                pass
+            self.failed_commits += 1
+            self.last_error = str(e)
+            print(f"[DB] ✗ Error en commit de grupo ({len(batch)} escrituras): {e}")
+            for fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if ran:  # Un grupo de Futures cancelados no cuenta como commit
+            self._commit_latency.add((time.perf_counter() - start) * 1000)
+            self.commits += 1
+            self.jobs += ran
+            self.max_group = max(self.max_group, ran)
+        for future, result in done:
+            future.set_result(result)
+
+    # =========================================================================
+    # ESTADÍSTICAS
+    # =========================================================================
+
+    def get_status(self) -> Dict:
+        """Profundidad de cola, tamaño medio de grupo y latencia de commit"""
+        return {
+            'running': self.running,
+            'queue_depth': self._queue.qsize(),
+            'jobs': self.jobs,
+            'failed_jobs': self.failed_jobs,
+            'commits': self.commits,
+            'failed_commits': self.failed_commits,
+            'avg_group': round(self.jobs / self.commits, 1) if self.commits else None,
+            'max_group': self.max_group,
+            'max_batch': self.max_batch,
+            'max_latency_ms': self.max_latency * 1000,
+            'commit_latency': self._commit_latency.to_dict(),
+            'last_error': self.last_error
+        }
+
+
+if __name__ == "__main__":
+    # Escrituras pequeñas concurrentes: commit por escritura frente a group commit
+    import os
+    import tempfile
+    from db_pool import ConnectionPool, STORAGE_PROFILES, apply_connection_pragmas
+
+    PRODUCERS = 8
+    WRITES = 300
+    INSERT = 'INSERT INTO alerts (vehicle_id, message, value) VALUES (?, ?, ?)'
+
+    def run(profile_name: str, grouped: bool) -> float:
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        pragmas = STORAGE_PROFILES[profile_name]
+
+        def connect():
+            conn = sqlite3.connect(path, check_same_thread=False)
+            apply_connection_pragmas(conn, pragmas)
+            return conn
+
+        setup = connect()
+        setup.execute(f"PRAGMA journal_mode = {pragmas['journal_mode']}")
+        setup.execute('CREATE TABLE alerts (id INTEGER PRIMARY KEY, vehicle_id INTEGER, message TEXT, value REAL)')
+        setup.commit()
+        setup.close()
+
+        pool = ConnectionPool(path, configure=lambda c: apply_connection_pragmas(c, pragmas))
+        writer = DBWriter(connect)
+        if grouped:
+            writer.start()
+
+        def producer(n):
+            for i in range(WRITES):
+                row = (n, f'alerta {i}', float(i))
+                if grouped:
+                    writer.submit(lambda cursor, row=row: cursor.execute(INSERT, row).lastrowid).result()
+                else:
+                    conn = pool.acquire()
+                    conn.execute(INSERT, row)
+                    conn.commit()
+                    conn.close()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=producer, args=(n,)) for n in range(PRODUCERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        if grouped:
+            print(f"    grupos: media {writer.get_status()['avg_group']}, máx {writer.max_group}")
+            writer.stop()
+        pool.close_all()
+        return PRODUCERS * WRITES / elapsed
+
+    for profile_name in ('wal', 'wal_durable', 'legacy'):
+        single = run(profile_name, grouped=False)
+        grouped = run(profile_name, grouped=True)
+        print(f"{profile_name:12s} commit por escritura {single:8.0f} escr/s   group commit {grouped:8.0f} escr/s")
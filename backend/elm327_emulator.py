@@ -0,0 +1,707 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - EMULADOR ELM327
+# Adaptador OBD simulado (pty o socket en proceso) con señales sintéticas o
+# reproducción de viajes grabados, para pruebas de carga sin coche
+# =============================================================================
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import obd
+
+from fast_decode import FAST_PIDS, obdb_offset
+
+
+# Protocolo anunciado: ISO 15765-4 CAN (11 bit ID, 500 kbaud)
+EMULATED_PROTOCOL = '6'
+ENGINE_RESPONSE_HEADER = '7E8'
+# Sin '0'/'1'/'2' al final: el decoder de python-obd los recorta al limpiar el relleno
+DEFAULT_VIN = 'WVWZZZ1KZ8W386754'
+BITMAP_PIDS = [0x00, 0x20, 0x40, 0x60, 0x80, 0xA0, 0xC0, 0xE0]
+
+
+# =============================================================================
+# FUENTES DE SEÑALES
+# =============================================================================
+
+class SyntheticSignals:
+    """
+    Ciclo de conducción sintético de 180 s (ralentí, ciudad, carretera)
+
+    Las señales están correlacionadas entre sí: RPM según marcha y
+    velocidad, carga/MAF según aceleración y temperatura del refrigerante
+    subiendo hasta 90°C desde el arranque.
+    """
+
+    # (segundo, velocidad km/h) del perfil de velocidad
+    SPEED_PROFILE = [(0, 0), (20, 0), (40, 50), (80, 50), (95, 90), (130, 90), (150, 0), (180, 0)]
+
+    # (velocidad máxima, rpm por km/h) por marcha
+    GEARS = [(15, 110), (30, 65), (50, 45), (70, 34), (999, 28)]
+
+    def __init__(self, seed: int = None):
+        self._random = random.Random(seed)
+        self._distance_km = 0.0
+        self._last_t = 0.0
+
+    def _profile_speed(self, t: float) -> float:
+        t = t % self.SPEED_PROFILE[-1][0]
+        for (t0, v0), (t1, v1) in zip(self.SPEED_PROFILE, self.SPEED_PROFILE[1:]):
+            if t0 <= t <= t1:
+                return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+        return 0.0
+
+    def sample(self, t: float) -> Dict[str, float]:
+        """
+        Valores de todos los PIDs en el instante t (segundos desde el arranque)
+
+        Returns:
+            Dict {pid_name: valor}
+        """
+        noise = self._random.uniform
+        speed = max(0.0, self._profile_speed(t) + (noise(-1.5, 1.5) if self._profile_speed(t) > 0 else 0))
+        accel = self._profile_speed(t + 1) - self._profile_speed(t)  # km/h por segundo
+
+        if speed < 1:
+            rpm = 820 + noise(-20, 20)
+        else:
+            ratio = next(r for limit, r in self.GEARS if speed <= limit)
+            rpm = max(900.0, speed * ratio + noise(-30, 30))
+
+        throttle = 12 if speed < 1 else min(100.0, 15 + 8 * max(accel, 0) + speed * 0.15)
+        load = 22 if speed < 1 else min(100.0, 20 + 6 * max(accel, 0) + speed * 0.3)
+        coolant = 90 - 70 * math.exp(-t / 300)
+
+        if t > self._last_t:
+            self._distance_km += speed * (t - self._last_t) / 3600
+            self._last_t = t
+
+        return {
+            'RPM': rpm,
+            'SPEED': speed,
+            'THROTTLE_POS': throttle,
+            'ENGINE_LOAD': load,
+            'MAF': rpm * load / 100 * 0.03,
+            'INTAKE_PRESSURE': min(255.0, 30 + load * 1.5),
+            'COOLANT_TEMP': coolant,
+            'INTAKE_TEMP': 20 + 10 * (1 - math.exp(-t / 600)),
+            'CONTROL_MODULE_VOLTAGE': 14.1 + noise(-0.1, 0.1),
+            'FUEL_RAIL_PRESSURE_DIRECT': 25000 + rpm * 5 + load * 100,
+            'BAROMETRIC_PRESSURE': 94,
+            'RELATIVE_THROTTLE_POS': throttle * 0.6,
+            'AMBIANT_AIR_TEMP': 17,
+            'ACCELERATOR_POS_D': throttle * 0.6,
+            'ACCELERATOR_POS_E': throttle * 0.6,
+            'RUN_TIME': t,
+            'DISTANCE_W_MIL': 0,
+            'DISTANCE_SINCE_DTC_CLEAR': 1250 + self._distance_km,
+            'FUEL_LEVEL': max(5.0, 65 - t * 0.001),
+            'TIMING_ADVANCE': 8 + load * 0.1,
+            'OIL_TEMP': coolant - 5,
+            'FUEL_RATE': rpm * load / 100 * 0.004,
+            'COMMANDED_EGR': 30 if speed < 60 else 10,
+            'EGR_ERROR': noise(-2, 2),
+            'SHORT_FUEL_TRIM_1': noise(-3, 3),
+            'LONG_FUEL_TRIM_1': 2.3,
+            'FUEL_PRESSURE': 300,
+            'ABSOLUTE_LOAD': load * 0.9,
+        }
+
+
+class ReplaySignals:
+    """
+    Reproduce un viaje grabado fila a fila
+
+    Los PIDs que no estén en la grabación se completan con la fuente
+    sintética; las celdas vacías de la grabación se responden con NO DATA.
+    """
+
+    # Columnas de obd_data / CSV que no se llaman igual que el PID
+    COLUMN_ALIASES = {'speed_kmh': 'SPEED', 'speed': 'SPEED'}
+
+    def __init__(self, rows: List[Dict], interval: float = 1.0, fallback: SyntheticSignals = None):
+        """
+        Args:
+            rows: Lista de dicts {pid_name: valor o None}
+            interval: Segundos entre filas
+            fallback: Fuente para los PIDs no grabados
+        """
+        if not rows:
+            raise ValueError("La grabación no contiene filas")
+        self.rows = rows
+        self.interval = max(interval, 0.01)
+        self.fallback = fallback or SyntheticSignals()
+
+    @classmethod
+    def _row_from_record(cls, record: Dict) -> Dict:
+        """Convierte una fila de CSV/BD en {pid_name: valor}"""
+        row = {}
+        for column, raw in record.items():
+            name = cls.COLUMN_ALIASES.get(column, str(column).upper())
+            if name not in FAST_PIDS:
+                continue
+            try:
+                row[name] = float(raw) if raw not in (None, '') else None
+            except (TypeError, ValueError):
+                row[name] = None
+        return row
+
+    @staticmethod
+    def _median_interval(timestamps: List[str]) -> float:
+        """Intervalo mediano entre marcas de tiempo ISO (1 s si no se pueden leer)"""
+        try:
+            times = [datetime.fromisoformat(str(ts)).timestamp() for ts in timestamps if ts]
+            deltas = sorted(b - a for a, b in zip(times, times[1:]) if b > a)
+            return deltas[len(deltas) // 2] if deltas else 1.0
+        except ValueError:
+            return 1.0
+
+    @classmethod
+    def from_csv(cls, path: str, interval: float = None) -> 'ReplaySignals':
+        """Carga una grabación de csv_data/obd_readings.csv"""
+        with open(path, 'r', encoding='utf-8') as f:
+            records = list(csv.DictReader(f))
+
+        rows = [cls._row_from_record(r) for r in records]
+        if interval is None:
+            interval = cls._median_interval([r.get('timestamp') for r in records])
+        print(f"[ELM-EMU] ✓ Reproduciendo {len(rows)} filas de {path} (cada {interval:.2f}s)")
+        return cls(rows, interval)
+
+    @classmethod
+    def from_database(cls, trip_id: int, db_path: str = '../db/sentinel.db',
+                      interval: float = None) -> 'ReplaySignals':
+        """Carga los puntos obd_data de un viaje"""
+        from database import DatabaseManager
+
+        records = DatabaseManager(db_path).get_trip_obd_data(trip_id)
+        rows = [cls._row_from_record(r) for r in records]
+        if interval is None:
+            interval = cls._median_interval([r.get('timestamp') for r in records])
+        print(f"[ELM-EMU] ✓ Reproduciendo viaje {trip_id}: {len(rows)} puntos (cada {interval:.2f}s)")
+        return cls(rows, interval)
+
+    def sample(self, t: float) -> Dict[str, float]:
+        values = self.fallback.sample(t)
+        values.update(self.rows[int(t / self.interval) % len(self.rows)])
+        return values
+
+
+# =============================================================================
+# CODIFICACIÓN DE RESPUESTAS
+# =============================================================================
+
+def encode_fmt(value: float, fmt: Dict, size: int, obdb: bool = False) -> int:
+    """
+    Inversa de fast_decode.compile_fmt (o de compile_obdb_fmt): valor físico -> bits en su posición
+
+    Args:
+        value: Valor físico
+        fmt: Formato de la señal (bix, len, add, mul, div)
+        size: Bytes de datos del PID
+        obdb: Señal OBDb (offset aplicado tras el escalado)
+
+    Returns:
+        Entero con los bits de la señal colocados (big endian)
+    """
+    bix = fmt.get('bix', 0)
+    length = fmt['len']
+    if obdb:
+        raw = round((value - obdb_offset(fmt)) * fmt.get('div', 1) / fmt.get('mul', 1))
+    else:
+        raw = round(value * fmt.get('div', 1) / fmt.get('mul', 1) - fmt.get('add', 0))
+    if fmt.get('sign') and raw < 0:
+        raw += 1 << length
+    raw = max(0, min(raw, (1 << length) - 1))
+    return raw << (size * 8 - bix - length)
+
+
+def build_obdb_templates(json_path: str) -> Dict[int, bytes]:
+    """
+    Respuestas fijas para los PIDs de default.json sin decoder rápido
+
+    Cada señal toma el punto medio de su rango (o el primer valor del mapa).
+
+    Returns:
+        Dict {pid: bytes de datos}
+    """
+    templates = {}
+    if not json_path or not os.path.exists(json_path):
+        return templates
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        commands = json.load(f).get('commands', [])
+
+    for command in commands:
+        mode, pid = next(iter(command.get('cmd', {}).items()), (None, None))
+        if mode != '01' or pid is None:
+            continue
+
+        fmts = [s.get('fmt', {}) for s in command.get('signals', []) if 'len' in s.get('fmt', {})]
+        if not fmts:
+            continue
+
+        size = max((f.get('bix', 0) + f['len'] + 7) // 8 for f in fmts)
+        bits = 0
+        for fmt in fmts:
+            if 'map' in fmt:
+                target = int(next(iter(fmt['map'])))
+                fmt = {k: v for k, v in fmt.items() if k in ('bix', 'len')}
+            elif 'min' in fmt and 'max' in fmt:
+                target = (fmt['min'] + fmt['max']) / 2
+            else:
+                target = fmt.get('max', 0) / 2
+            bits |= encode_fmt(target, fmt, size, obdb=True)
+
+        templates[int(pid, 16)] = bits.to_bytes(size, 'big')
+
+    return templates
+
+
+# =============================================================================
+# EMULADOR
+# =============================================================================
+
+class ELM327Emulator:
+    """
+    Intérprete de comandos ELM327 (AT + OBD) con un vehículo simulado
+
+    Responde como un ELM327 v1.5 conectado a un coche CAN: comandos AT
+    usados por python-obd, Mode 01 (incluidas peticiones multi-PID y los
+    bitmaps de PIDs soportados), Mode 03/04/07 y VIN (09 02).
+    """
+
+    def __init__(self, source=None, latency: float = 0.0, jitter: float = 0.0,
+                 no_data_rate: float = 0.0, dropout_rate: float = 0.0,
+                 dropout_timeout: float = 0.5, supported_pids: Iterable[str] = None,
+                 obdb_json: str = None, vin: str = DEFAULT_VIN, seed: int = None):
+        """
+        Inicializa el emulador
+
+        Args:
+            source: Fuente de señales (SyntheticSignals o ReplaySignals)
+            latency: Retardo base por petición OBD en segundos
+            jitter: Variación aleatoria (+/-) del retardo
+            no_data_rate: Probabilidad de responder NO DATA inmediatamente
+            dropout_rate: Probabilidad de que la ECU no conteste (espera
+                dropout_timeout y responde NO DATA, como un timeout real)
+            dropout_timeout: Segundos de espera en un dropout
+            supported_pids: Nombres de PIDs soportados (por defecto todos
+                los de FAST_PIDS y default.json)
+            obdb_json: Ruta a default.json (por defecto junto a este módulo)
+            vin: VIN devuelto en 09 02
+            seed: Semilla para reproducibilidad
+        """
+        self.source = source or SyntheticSignals(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.no_data_rate = no_data_rate
+        self.dropout_rate = dropout_rate
+        self.dropout_timeout = dropout_timeout
+        self.vin = vin
+        self._random = random.Random(seed)
+
+        if obdb_json is None:
+            obdb_json = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'default.json')
+        self._templates = build_obdb_templates(obdb_json)
+
+        self._fast = {}
+        for name, (pid, fmt, _) in FAST_PIDS.items():
+            cmd = getattr(obd.commands, name, None)
+            size = cmd.bytes - 2 if cmd is not None else (fmt.get('bix', 0) + fmt['len'] + 7) // 8
+            self._fast[pid] = (name, fmt, size)
+
+        available = set(self._fast) | set(self._templates)
+        if supported_pids is not None:
+            wanted = set(supported_pids)
+            available = {pid for pid in available
+                         if (pid in self._fast and self._fast[pid][0] in wanted)
+                         or (obd.commands.has_pid(1, pid) and obd.commands[1][pid].name in wanted)}
+        self.supported = {pid for pid in available if pid not in BITMAP_PIDS}
+
+        self.stats = {'requests': 0, 'at_commands': 0, 'no_data': 0, 'dropouts': 0}
+        self.reset()
+
+    def reset(self):
+        """Estado tras ATZ"""
+        self.echo = True
+        self.headers = False
+        self.spaces = True
+        self.linefeeds = False
+        self._start_time = time.time()
+
+    # =========================================================================
+    # ENTRADA DE COMANDOS
+    # =========================================================================
+
+    def handle(self, line: str) -> str:
+        """
+        Procesa una línea recibida y devuelve la respuesta completa con prompt
+
+        Args:
+            line: Comando sin el retorno de carro final
+
+        Returns:
+            Texto a enviar por el puerto (termina en '>')
+        """
+        command = line.strip().upper().replace(' ', '')
+        eol = '\r\n' if self.linefeeds else '\r'
+        echo = line.strip() + eol if self.echo and command else ''
+
+        if not command or not all(c.isprintable() for c in command) or '\x7f' in line:
+            lines = ['?']
+        elif command.startswith('AT'):
+            self.stats['at_commands'] += 1
+            lines = self._handle_at(command[2:])
+        else:
+            self.stats['requests'] += 1
+            lines = self._handle_obd(command)
+
+        return echo + eol.join(lines) + eol + eol + '>'
+
+    def _handle_at(self, at: str) -> List[str]:
+        """Comandos AT"""
+        if at in ('Z', 'WS'):
+            self.reset()
+            return ['', 'ELM327 v1.5']
+        if at == 'I':
+            return ['ELM327 v1.5']
+        if at == '@1':
+            return ['SENTINEL PRO ELM327 EMULATOR']
+        if at == 'RV':
+            return [f"{14.1 + self._random.uniform(-0.1, 0.1):.1f}V"]
+        if at == 'DPN':
+            return ['A' + EMULATED_PROTOCOL]
+        if at == 'DP':
+            return ['AUTO, ISO 15765-4 (CAN 11/500)']
+
+        flags = {'E': 'echo', 'H': 'headers', 'S': 'spaces', 'L': 'linefeeds'}
+        if len(at) == 2 and at[0] in flags and at[1] in '01':
+            setattr(self, flags[at[0]], at[1] == '1')
+            return ['OK']
+
+        # Configuración aceptada sin efecto (protocolo, timeouts, cabeceras...)
+        if at[:2] in ('SP', 'TP', 'ST', 'AT', 'SH', 'CA', 'CF', 'CM', 'CR', 'M0', 'M1', 'D0', 'D1', 'AL', 'PC') or at == 'D':
+            return ['OK']
+
+        return ['?']
+
+    def _handle_obd(self, command: str) -> List[str]:
+        """Peticiones OBD en hexadecimal"""
+        if len(command) % 2 == 1:
+            command = command[:-1]  # Dígito opcional de número de respuestas
+        try:
+            request = bytes.fromhex(command)
+        except ValueError:
+            return ['?']
+        if not request:
+            return ['?']
+
+        self._simulate_latency()
+
+        roll = self._random.random()
+        if roll < self.dropout_rate:
+            self.stats['dropouts'] += 1
+            time.sleep(self.dropout_timeout)
+            return ['NO DATA']
+        if roll < self.dropout_rate + self.no_data_rate:
+            self.stats['no_data'] += 1
+            return ['NO DATA']
+
+        payload = self._build_payload(request)
+        if payload is None:
+            self.stats['no_data'] += 1
+            return ['NO DATA']
+
+        return self._format_frames(payload)
+
+    def _simulate_latency(self):
+        delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    # =========================================================================
+    # CONSTRUCCIÓN DE RESPUESTAS
+    # =========================================================================
+
+    def _build_payload(self, request: bytes) -> Optional[bytes]:
+        """Bytes de respuesta (modo + 0x40, datos) o None para NO DATA"""
+        mode = request[0]
+
+        if mode == 0x01:
+            pids = request[1:]
+            if not pids or len(pids) > 6:
+                return None
+            values = self.source.sample(time.time() - self._start_time)
+            payload = bytearray([0x41])
+            for pid in pids:
+                data = self._pid_data(pid, values)
+                if data is not None:
+                    payload += bytes([pid]) + data
+            return bytes(payload) if len(payload) > 1 else None
+
+        if mode == 0x03:
+            return bytes([0x43, 0x00])
+        if mode == 0x04:
+            return bytes([0x44])
+        if mode == 0x07:
+            return bytes([0x47, 0x00])
+        if mode == 0x09 and request[1:2] == b'\x00':
+            return bytes([0x49, 0x00, 0x54, 0x40, 0x00, 0x00])  # 02, 04, 0A
+        if mode == 0x09 and request[1:2] == b'\x02':
+            return bytes([0x49, 0x02, 0x01]) + self.vin.encode()[:17]
+
+        return None
+
+    def _pid_data(self, pid: int, values: Dict) -> Optional[bytes]:
+        """Bytes de datos de un PID Mode 01"""
+        if pid in BITMAP_PIDS:
+            return self._bitmap(pid)
+        if pid not in self.supported:
+            return None
+
+        if pid in self._fast:
+            name, fmt, size = self._fast[pid]
+            value = values.get(name)
+            if value is None:
+                return None
+            return encode_fmt(value, fmt, size).to_bytes(size, 'big')
+
+        return self._templates.get(pid)
+
+    def _bitmap(self, base: int) -> Optional[bytes]:
+        """Bitmap de PIDs soportados [base+1, base+32]"""
+        # Solo se responde si el bitmap anterior anunció este rango
+        if base and not any(pid > base for pid in self.supported):
+            return None
+
+        bits = 0
+        for i in range(32):
+            pid = base + i + 1
+            if pid in self.supported or (i == 31 and any(p > pid for p in self.supported)):
+                bits |= 1 << (31 - i)
+        return bits.to_bytes(4, 'big')
+
+    def _format_frames(self, payload: bytes) -> List[str]:
+        """Tramas CAN ISO-TP (single frame o first + consecutive frames)"""
+        sep = ' ' if self.spaces else ''
+
+        def hexs(data):
+            return sep.join(f"{b:02X}" for b in data)
+
+        if not self.headers:
+            return [hexs(payload)]
+
+        header = ENGINE_RESPONSE_HEADER + sep
+        if len(payload) <= 7:
+            return [header + hexs(bytes([len(payload)]) + payload)]
+
+        frames = [header + hexs(bytes([0x10 | (len(payload) >> 8), len(payload) & 0xFF]) + payload[:6])]
+        seq = 1
+        for i in range(6, len(payload), 7):
+            frames.append(header + hexs(bytes([0x20 | (seq & 0x0F)]) + payload[i:i + 7]))
+            seq += 1
+        return frames
+
+    # =========================================================================
+    # TRANSPORTES
+    # =========================================================================
+
+    def _serve_stream(self, read, write, stop_event: threading.Event):
+        """Bucle común: acumula hasta '\\r', procesa y responde"""
+        buffer = b''
+        while not stop_event.is_set():
+            try:
+                data = read()
+            except (OSError, socket.timeout):
+                if stop_event.is_set():
+                    break
+                continue
+            if not data:
+                break
+
+            buffer += data
+            while b'\r' in buffer:
+                line, buffer = buffer.split(b'\r', 1)
+                line = line.replace(b'\n', b'').decode('ascii', errors='ignore')
+                try:
+                    write(self.handle(line).encode('ascii'))
+                except OSError:
+                    return  # Puerto cerrado durante la respuesta
+
+    def start_pty(self) -> str:
+        """
+        Expone el emulador en un pseudo-terminal (Linux/macOS)
+
+        Returns:
+            Ruta del puerto (ej: /dev/pts/3) para obd.OBD()
+        """
+        import pty
+        import tty
+
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        self._stop_event = threading.Event()
+        self._pty_fds = (master, slave)
+
+        self._thread = threading.Thread(
+            target=self._serve_stream,
+            args=(lambda: os.read(master, 1024), lambda data: os.write(master, data), self._stop_event),
+            name="elm327-emulator",
+            daemon=True
+        )
+        self._thread.start()
+
+        port = os.ttyname(slave)
+        print(f"[ELM-EMU] ✓ Emulador ELM327 en {port}")
+        return port
+
+    def start_socket(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """
+        Expone el emulador en un socket TCP local (funciona también en Windows)
+
+        Returns:
+            URL para obd.OBD() (ej: socket://127.0.0.1:35000)
+        """
+        self._stop_event = threading.Event()
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, port))
+        server.listen(1)
+        server.settimeout(0.5)
+        self._server = server
+
+        def serve():
+            while not self._stop_event.is_set():
+                try:
+                    client, _ = server.accept()
+                except (socket.timeout, OSError):
+                    continue
+                client.settimeout(0.5)
+                self.reset()
+                with client:
+                    self._serve_stream(lambda: client.recv(1024), client.sendall, self._stop_event)
+
+        self._thread = threading.Thread(target=serve, name="elm327-emulator", daemon=True)
+        self._thread.start()
+
+        url = f"socket://{host}:{server.getsockname()[1]}"
+        print(f"[ELM-EMU] ✓ Emulador ELM327 en {url}")
+        return url
+
+    def stop(self):
+        """Detiene el transporte activo"""
+        if getattr(self, '_stop_event', None):
+            self._stop_event.set()
+        if getattr(self, '_server', None):
+            self._server.close()
+            self._server = None
+        if getattr(self, '_pty_fds', None):
+            for fd in self._pty_fds:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            self._pty_fds = None
+
+
+def create_emulator(transport: str = 'socket', replay: str = None, **options):
+    """
+    Crea y arranca un emulador
+
+    Args:
+        transport: 'socket' o 'pty'
+        replay: None (señales sintéticas), ruta a un CSV o 'trip:<id>'
+        **options: Parámetros de ELM327Emulator (latency, no_data_rate...)
+
+    Returns:
+        (emulador, puerto para obd.OBD)
+    """
+    source = None
+    if replay and replay.startswith('trip:'):
+        source = ReplaySignals.from_database(int(replay.split(':', 1)[1]))
+    elif replay:
+        source = ReplaySignals.from_csv(replay)
+
+    emulator = ELM327Emulator(source=source, **options)
+    port = emulator.start_pty() if transport == 'pty' else emulator.start_socket()
+    return emulator, port
+
+
+# =============================================================================
+# CLI / BENCHMARK
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Emulador ELM327 para SENTINEL PRO')
+    parser.add_argument('--transport', choices=['socket', 'pty'], default='socket')
+    parser.add_argument('--replay', help="CSV a reproducir o 'trip:<id>' de obd_data")
+    parser.add_argument('--latency', type=float, default=0.0, help='Retardo por petición (s)')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--no-data-rate', type=float, default=0.0)
+    parser.add_argument('--dropout-rate', type=float, default=0.0)
+    parser.add_argument('--benchmark', type=float, metavar='SEGUNDOS',
+                        help='Conectar python-obd y medir lecturas/s durante N segundos')
+    args = parser.parse_args()
+
+    emulator, port = create_emulator(
+        args.transport, args.replay,
+        latency=args.latency, jitter=args.jitter,
+        no_data_rate=args.no_data_rate, dropout_rate=args.dropout_rate
+    )
+
+    if not args.benchmark:
+        print(f"Conecta con obd.OBD('{port}') — Ctrl+C para salir")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            emulator.stop()
+        return
+
+    from obd_batch import MultiPIDReader
+    from fast_decode import query_value
+
+    connection = obd.OBD(port, fast=False, timeout=5)
+    if not connection.is_connected():
+        print("✗ python-obd no pudo conectar con el emulador")
+        return
+
+    pid_names = [name for name in FAST_PIDS if connection.supports(getattr(obd.commands, name))]
+    print(f"\n✓ Conectado ({connection.protocol_name()}), {len(pid_names)} PIDs soportados")
+
+    multi_reader = MultiPIDReader()
+
+    def single(name):
+        return query_value(connection, getattr(obd.commands, name))
+
+    for label, read_cycle in (
+        ('Individual', lambda: {n: single(n) for n in pid_names}),
+        ('Multi-PID', lambda: multi_reader.read_pids(connection, pid_names, single)),
+    ):
+        cycles = values = 0
+        start = time.time()
+        while time.time() - start < args.benchmark:
+            data = read_cycle()
+            cycles += 1
+            values += sum(1 for v in data.values() if v is not None)
+        elapsed = time.time() - start
+        print(f"  {label:10s}: {cycles / elapsed:7.1f} ciclos/s, {values / elapsed:8.1f} PIDs/s")
+
+    print(f"\nEstadísticas del emulador: {emulator.stats}")
+    connection.close()
+    emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
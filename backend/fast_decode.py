@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - DECODIFICACIÓN RÁPIDA DE PIDs
+# Decoders por tabla bytes -> float sin pasar por objetos pint de python-obd
+# =============================================================================
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from obd import OBDCommand
+from obd.protocols import ECU
+
+
+# =============================================================================
+# TABLA DE PIDs RÁPIDOS
+# =============================================================================
+# Formato de cada señal (mismas claves que las señales OBDb de default.json):
+#   bix: bit inicial dentro de los datos (tras 41 PID), len: bits,
+#   add/mul/div: valor = (raw + add) * mul / div, sign: complemento a 2
+# En esta tabla el offset va antes del escalado, como en python-obd, para
+# obtener floats idénticos; las señales OBDb lo aplican después (ver
+# compile_obdb_fmt). Las unidades coinciden con str(quantity.units) de python-obd.
+
+FAST_PIDS = {
+    # Críticos
+    'RPM':                       (0x0C, {'len': 16, 'mul': 0.25}, 'revolutions_per_minute'),
+    'SPEED':                     (0x0D, {'len': 8}, 'kilometer_per_hour'),
+    'THROTTLE_POS':              (0x11, {'len': 8, 'mul': 100.0, 'div': 255.0}, 'percent'),
+    'ENGINE_LOAD':               (0x04, {'len': 8, 'mul': 100.0, 'div': 255.0}, 'percent'),
+    'MAF':                       (0x10, {'len': 16, 'mul': 0.01}, 'gps'),
+    'INTAKE_PRESSURE':           (0x0B, {'len': 8}, 'kilopascal'),
+
+    # Importantes
+    'COOLANT_TEMP':              (0x05, {'len': 8, 'add': -40}, 'degree_Celsius'),
+    'INTAKE_TEMP':               (0x0F, {'len': 8, 'add': -40}, 'degree_Celsius'),
+    'CONTROL_MODULE_VOLTAGE':    (0x42, {'len': 16, 'mul': 0.001}, 'volt'),
+    'FUEL_RAIL_PRESSURE_DIRECT': (0x23, {'len': 16, 'mul': 10}, 'kilopascal'),
+    'BAROMETRIC_PRESSURE':       (0x33, {'len': 8}, 'kilopascal'),
+    'RELATIVE_THROTTLE_POS':     (0x45, {'len': 8, 'mul': 100.0, 'div': 255.0}, 'percent'),
+    'AMBIANT_AIR_TEMP':          (0x46, {'len': 8, 'add': -40}, 'degree_Celsius'),
+
+    # Informativos
+    'ACCELERATOR_POS_D':         (0x49, {'len': 8, 'mul': 100.0, 'div': 255.0}, 'percent'),
+    'ACCELERATOR_POS_E':         (0x4A, {'len': 8, 'mul': 100.0, 'div': 255.0}, 'percent'),
+    'RUN_TIME':                  (0x1F, {'len': 16}, 'second'),
+    'DISTANCE_W_MIL':            (0x21, {'len': 16}, 'kilometer'),
+    'DISTANCE_SINCE_DTC_CLEAR':  (0x31, {'len': 16}, 'kilometer'),
+
+    # Adicionales frecuentes en el escaneo
+    'FUEL_LEVEL':                (0x2F, {'len': 8, 'mul': 100.0, 'div': 255.0}, 'percent'),
+    'TIMING_ADVANCE':            (0x0E, {'len': 8, 'add': -128, 'div': 2.0}, 'degree'),
+    'OIL_TEMP':                  (0x5C, {'len': 8, 'add': -40}, 'degree_Celsius'),
+    'FUEL_RATE':                 (0x5E, {'len': 16, 'mul': 0.05}, 'lph'),
+    'COMMANDED_EGR':             (0x2C, {'len': 8, 'mul': 100.0, 'div': 255.0}, 'percent'),
+    'EGR_ERROR':                 (0x2D, {'len': 8, 'add': -128, 'mul': 100.0, 'div': 128.0}, 'percent'),
+    'SHORT_FUEL_TRIM_1':         (0x06, {'len': 8, 'add': -128, 'mul': 100.0, 'div': 128.0}, 'percent'),
+    'LONG_FUEL_TRIM_1':          (0x07, {'len': 8, 'add': -128, 'mul': 100.0, 'div': 128.0}, 'percent'),
+    'FUEL_PRESSURE':             (0x0A, {'len': 8, 'mul': 3}, 'kilopascal'),
+    'ABSOLUTE_LOAD':             (0x43, {'len': 16, 'mul': 100.0 / 255.0}, 'percent'),
+}
+
+
+# =============================================================================
+# COMPILACIÓN DE DECODERS
+# =============================================================================
+
+def _compile_raw(fmt: Dict) -> Tuple[Callable, int]:
+    """
+    Extractor del valor crudo de una señal
+
+    Los casos habituales (1 o 2 bytes alineados) usan acceso directo a los
+    bytes; el resto extrae los bits con un desplazamiento y una máscara.
+
+    Returns:
+        (función payload -> entero, bytes de datos necesarios)
+    """
+    bix = fmt.get('bix', 0)
+    length = fmt['len']
+    signed = fmt.get('sign', False)
+
+    nbytes = (bix + length + 7) // 8
+    index = bix // 8
+
+    if bix % 8 == 0 and length == 8 and not signed:
+        def raw(d):
+            return d[index]
+    elif bix % 8 == 0 and length == 16 and not signed:
+        def raw(d):
+            return (d[index] << 8) | d[index + 1]
+    else:
+        shift = nbytes * 8 - bix - length
+        mask = (1 << length) - 1
+        sign_bit = 1 << (length - 1)
+
+        def raw(d):
+            value = (int.from_bytes(bytes(d[:nbytes]), 'big') >> shift) & mask
+            if signed and value & sign_bit:
+                value -= 1 << length
+            return value
+
+    return raw, nbytes
+
+
+def _with_nulls(scaled: Callable, nbytes: int, fmt: Dict) -> Callable[[bytes], Optional[float]]:
+    """Añade la comprobación de longitud y de valores nulos (nullmin/nullmax)"""
+    null_values = {fmt[k] for k in ('nullmin', 'nullmax') if k in fmt}
+
+    def decode(d):
+        if len(d) < nbytes:
+            return None
+        value = scaled(d)
+        if null_values and value in null_values:
+            return None
+        return value
+
+    return decode
+
+
+def compile_fmt(fmt: Dict) -> Callable[[bytes], Optional[float]]:
+    """
+    Compila un formato de FAST_PIDS en una función payload -> valor
+
+    valor = (raw + add) * mul / div, mismo orden de operaciones que
+    python-obd para obtener floats idénticos.
+
+    Args:
+        fmt: Formato de la señal (bix, len, add, mul, div, sign, nullmin, nullmax)
+
+    Returns:
+        Función que recibe los bytes de datos (sin 41 PID) y devuelve el valor
+    """
+    raw, nbytes = _compile_raw(fmt)
+    add = fmt.get('add', 0)
+    mul = fmt.get('mul', 1)
+    div = fmt.get('div', 1)
+
+    if mul == 1 and div == 1:
+        def scaled(d):
+            return raw(d) + add
+    elif div == 1:
+        def scaled(d):
+            return (raw(d) + add) * mul
+    else:
+        def scaled(d):
+            return (raw(d) + add) * mul / div
+
+    return _with_nulls(scaled, nbytes, fmt)
+
+
+def obdb_offset(fmt: Dict) -> float:
+    """
+    Offset de una señal OBDb aplicado tras el escalado
+
+    La convención OBDb es valor = raw * mul / div + add. Algunas entradas de
+    default.json (ajustes de combustible, error de EGR) traen en cambio el
+    offset previo al escalado, como python-obd: su rango min/max declarado
+    solo cuadra con (raw + add) * mul / div. En ese caso se convierte al
+    equivalente exacto add * mul / div.
+
+    Args:
+        fmt: Formato de la señal OBDb
+
+    Returns:
+        Offset a sumar después de raw * mul / div
+    """
+    add = fmt.get('add', 0)
+    mul = fmt.get('mul', 1)
+    div = fmt.get('div', 1)
+    if not add or (mul == 1 and div == 1) or 'min' not in fmt or 'max' not in fmt:
+        return add
+
+    length = fmt['len']
+    if fmt.get('sign'):
+        lo, hi = -(1 << (length - 1)), (1 << (length - 1)) - 1
+    else:
+        lo, hi = 0, (1 << length) - 1
+    scale = mul / div
+    post = abs(lo * scale + add - fmt['min']) + abs(hi * scale + add - fmt['max'])
+    pre = abs((lo + add) * scale - fmt['min']) + abs((hi + add) * scale - fmt['max'])
+    return add * scale if pre < post else add
+
+
+def compile_obdb_fmt(fmt: Dict) -> Callable[[bytes], Optional[float]]:
+    """
+    Compila un formato de señal OBDb en una función payload -> valor
+
+    valor = raw * mul / div + add (ver obdb_offset()).
+
+    Args:
+        fmt: Formato de la señal (bix, len, add, mul, div, sign, nullmin, nullmax)
+
+    Returns:
+        Función que recibe los bytes de datos (sin modo y PID) y devuelve el valor
+    """
+    raw, nbytes = _compile_raw(fmt)
+    add = obdb_offset(fmt)
+    mul = fmt.get('mul', 1)
+    div = fmt.get('div', 1)
+
+    if mul == 1 and div == 1:
+        def scaled(d):
+            return raw(d) + add
+    else:
+        def scaled(d):
+            return raw(d) * mul / div + add
+
+    return _with_nulls(scaled, nbytes, fmt)
+
+
+_PID_DECODERS = {name: compile_fmt(fmt) for name, (_, fmt, _) in FAST_PIDS.items()}
+_PID_CODES = {name: pid for name, (pid, _, _) in FAST_PIDS.items()}
+_RAW_COMMANDS = {}
+
+
+def has_fast_decoder(pid_name: str) -> bool:
+    """Indica si el PID tiene decoder rápido"""
+    return pid_name in _PID_DECODERS
+
+
+def pid_unit(pid_name: str) -> str:
+    """Unidad del PID (misma cadena que python-obd)"""
+    entry = FAST_PIDS.get(pid_name)
+    return entry[2] if entry else ''
+
+
+def decode_pid(pid_name: str, payload) -> Optional[float]:
+    """
+    Decodifica los bytes de datos de un PID (sin los bytes 41 y PID)
+
+    Args:
+        pid_name: Nombre del PID (ej: 'RPM')
+        payload: Bytes de datos
+
+    Returns:
+        Valor como número o None si no hay decoder o datos suficientes
+    """
+    decoder = _PID_DECODERS.get(pid_name)
+    if decoder is None:
+        return None
+    return decoder(payload)
+
+
+def decode_messages(pid_name: str, messages) -> Optional[float]:
+    """
+    Decodifica la respuesta cruda de python-obd para un PID
+
+    Se prioriza la ECU de motor si responden varias.
+
+    Args:
+        pid_name: Nombre del PID
+        messages: Mensajes devueltos por un comando crudo
+
+    Returns:
+        Valor o None
+    """
+    pid = _PID_CODES.get(pid_name)
+    if pid is None or not messages:
+        return None
+
+    for message in sorted(messages, key=lambda m: 0 if m.ecu == ECU.ENGINE else 1):
+        data = message.data
+        if len(data) > 2 and data[0] == 0x41 and data[1] == pid:
+            return _PID_DECODERS[pid_name](data[2:])
+
+    return None
+
+
+def _raw_messages(messages):
+    """Decoder identidad: la decodificación se hace aquí, no en python-obd"""
+    return messages
+
+
+def get_raw_command(cmd: OBDCommand) -> OBDCommand:
+    """Copia del comando (cacheada) cuyo decoder devuelve los mensajes sin pint"""
+    raw_cmd = _RAW_COMMANDS.get(cmd.name)
+    if raw_cmd is None:
+        raw_cmd = OBDCommand(cmd.name, cmd.desc, cmd.command, cmd.bytes,
+                             _raw_messages, cmd.ecu, cmd.fast, cmd.header)
+        _RAW_COMMANDS[cmd.name] = raw_cmd
+    return raw_cmd
+
+
+def query_value(connection, cmd: OBDCommand, force: bool = False):
+    """
+    Consulta un PID y devuelve su valor como número plano
+
+    Los PIDs de FAST_PIDS se decodifican desde los bytes; el resto pasa por
+    python-obd y se toma .magnitude como hasta ahora.
+
+    Args:
+        connection: Conexión OBD
+        cmd: Comando python-obd
+        force: Consultar aunque python-obd no lo marque como soportado
+
+    Returns:
+        Valor del PID o None
+    """
+    if cmd.name not in _PID_DECODERS:
+        response = connection.query(cmd, force=force)
+        if not response or response.value is None:
+            return None
+        value = response.value
+        return value.magnitude if hasattr(value, 'magnitude') else value
+
+    # Mismo comportamiento que query() sin force: no enviar PIDs no soportados
+    if not force and not connection.supports(cmd):
+        return None
+
+    response = connection.query(get_raw_command(cmd), force=True)
+    if not response or response.value is None:
+        return None
+    return decode_messages(cmd.name, response.value)
+
+
+# =============================================================================
+# SEÑALES OBDb
+# =============================================================================
+
+def compile_obdb_command(command: Dict) -> List[tuple]:
+    """
+    Compila las señales numéricas de un comando OBDb (formato default.json)
+
+    Las señales con 'map' devuelven el valor crudo (clave del mapa).
+
+    Args:
+        command: Definición del comando con su lista 'signals'
+
+    Returns:
+        Lista de (signal_id, decoder)
+    """
+    compiled = []
+    for signal in command.get('signals', []):
+        fmt = signal.get('fmt') or {}
+        if 'len' not in fmt:
+            continue
+        if 'map' in fmt:
+            fmt = {k: v for k, v in fmt.items() if k in ('bix', 'len')}
+        compiled.append((signal['id'], compile_obdb_fmt(fmt)))
+    return compiled
+
+
+def decode_obdb_signals(compiled: List[tuple], payload) -> Dict:
+    """
+    Decodifica todas las señales de un comando OBDb
+
+    Args:
+        compiled: Resultado de compile_obdb_command()
+        payload: Bytes de datos de la respuesta (sin modo y PID)
+
+    Returns:
+        Dict {signal_id: valor}
+    """
+    values = {}
+    for signal_id, decoder in compiled:
+        value = decoder(payload)
+        if value is not None:
+            values[signal_id] = value
+    return values
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+if __name__ == "__main__":
+    import json
+    import os
+    import time
+
+    import obd
+    from obd.protocols.protocol import Message
+
+    print("=" * 60)
+    print("BENCHMARK: decoders rápidos vs python-obd (pint)")
+    print("=" * 60)
+
+    # 1. Verificar que los valores coinciden con python-obd
+    mismatches = 0
+    for name, (pid, fmt, unit) in FAST_PIDS.items():
+        cmd = getattr(obd.commands, name)
+        size = cmd.bytes - 2
+        samples = range(256) if size == 1 else range(0, 65536, 7)
+        for raw in samples:
+            payload = bytearray(raw.to_bytes(size, 'big'))
+            message = Message([])
+            message.data = bytearray([0x41, pid]) + payload
+            expected = cmd.decode([message])
+            if abs(decode_pid(name, payload) - expected.magnitude) > 1e-9 or str(expected.units) != unit:
+                mismatches += 1
+                print(f"  ✗ {name} raw={raw}: {decode_pid(name, payload)} != {expected}")
+                break
+    print(f"\n✓ {len(FAST_PIDS)} PIDs verificados contra python-obd ({mismatches} discrepancias)")
+
+    # 2. Tiempo por muestra
+    messages = {}
+    for name, (pid, fmt, unit) in FAST_PIDS.items():
+        cmd = getattr(obd.commands, name)
+        message = Message([])
+        message.data = bytearray([0x41, pid] + [0x5A] * (cmd.bytes - 2))
+        messages[name] = (cmd, message)
+
+    iterations = 2000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for name, (cmd, message) in messages.items():
+            cmd.decode([message]).magnitude
+    pint_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for name, (cmd, message) in messages.items():
+            decode_messages(name, [message])
+    fast_time = time.perf_counter() - start
+
+    total = iterations * len(messages)
+    print(f"\nDecodificaciones: {total}")
+    print(f"  python-obd/pint: {pint_time / total * 1e6:8.2f} µs/PID")
+    print(f"  tabla rápida:    {fast_time / total * 1e6:8.2f} µs/PID")
+    print(f"  Aceleración:     {pint_time / fast_time:8.1f}x")
+
+    # 3. Señales OBDb
+    json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'default.json')
+    if os.path.exists(json_path):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            commands = json.load(f)['commands']
+
+        compiled = [compile_obdb_command(command) for command in commands]
+        n_signals = sum(len(c) for c in compiled)
+
+        # Valores de referencia (raw * mul / div + add) de señales con offset tras escalar
+        payload = bytearray(8)
+        for command in commands:
+            for signal in command.get('signals', []):
+                if signal['id'] in ('CATEMP11', 'SPARKADV', 'EGRTA_WIDE', 'O2S11_CURRENT', 'SHRTFT1'):
+                    value = compile_obdb_fmt(signal['fmt'])(payload)
+                    print(f"  {signal['id']:14s} raw 0 -> {value:g} (mín. declarado {signal['fmt']['min']:g})")
+        out_of_range = [
+            signal['id']
+            for command in commands for signal in command.get('signals', [])
+            if 'len' in signal.get('fmt', {}) and 'map' not in signal['fmt'] and 'min' in signal['fmt']
+            and not signal['fmt'].get('sign')
+            and compile_obdb_fmt(signal['fmt'])(bytearray(32)) not in (None, signal['fmt']['min'])
+            and abs(compile_obdb_fmt(signal['fmt'])(bytearray(32)) - signal['fmt']['min']) > 0.01
+        ]
+        print(f"  Señales cuyo raw 0 no da el mínimo declarado: {out_of_range or 'ninguna'}")
+        payload = bytearray([0x5A] * 32)
+
+        start = time.perf_counter()
+        for _ in range(200):
+            for c in compiled:
+                decode_obdb_signals(c, payload)
+        obdb_time = time.perf_counter() - start
+
+        print(f"\nOBDb: {len(commands)} comandos, {n_signals} señales compiladas")
+        print(f"  {obdb_time / (200 * n_signals) * 1e6:.2f} µs/señal")
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - MOTOR DE SALUD INCREMENTAL
+# Medias y máximos acumulados, contadores de umbral y detección de
+# aceleraciones bruscas actualizados en O(1) por muestra
+# =============================================================================
+
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class RunningStat:
+    """Contador, suma y máximo de una señal (media y máximo en O(1))"""
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+def _number(value) -> Optional[float]:
+    """Valor numérico de un PID o None (ausente, NaN o no numérico)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    return value
+
+
+class StreamingHealthEngine:
+    """
+    Análisis de salud del viaje en curso sin recorrer los puntos
+
+    Cada muestra actualiza los acumuladores de las seis señales que usa el
+    análisis (mismos filtros que la versión por lotes: RPM, MAF y
+    temperaturas > 0; acelerador y carga con cualquier valor presente).
+    evaluate() aplica las mismas reglas y devuelve la misma estructura
+    vehicle_health a partir de los acumuladores, así que el coste por
+    muestra no depende de la duración del viaje.
+    """
+
+    HIGH_RPM = 4000           # RPM consideradas altas
+    CRITICAL_RPM = 6000       # RPM críticas
+    HARSH_THROTTLE_DELTA = 30  # Salto de acelerador (%) entre muestras = aceleración brusca
+    MIN_SAMPLES = 10          # Muestras mínimas para evaluar
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Vacía los acumuladores (inicio de viaje)"""
+        self.samples = 0
+        self.rpm = RunningStat()
+        self.load = RunningStat()
+        self.maf = RunningStat()
+        self.coolant = RunningStat()
+        self.intake = RunningStat()
+        self.high_rpm_count = 0
+        self.throttle_count = 0
+        self.harsh_accel = 0
+        self._last_throttle = None
+
+    def update(self, sample: Dict):
+        """
+        Incorpora una muestra del viaje
+
+        Args:
+            sample: Snapshot con los PIDs en mayúsculas
+        """
+        self.samples += 1
+
+        rpm = _number(sample.get('RPM'))
+        if rpm is not None and rpm > 0:
+            self.rpm.add(rpm)
+            if rpm > self.HIGH_RPM:
+                self.high_rpm_count += 1
+
+        load = _number(sample.get('ENGINE_LOAD'))
+        if load is not None:
+            self.load.add(load)
+
+        maf = _number(sample.get('MAF'))
+        if maf is not None and maf > 0:
+            self.maf.add(maf)
+
+        coolant = _number(sample.get('COOLANT_TEMP'))
+        if coolant is not None and coolant > 0:
+            self.coolant.add(coolant)
+
+        intake = _number(sample.get('INTAKE_TEMP'))
+        if intake is not None and intake > 0:
+            self.intake.add(intake)
+
+        throttle = _number(sample.get('THROTTLE_POS'))
+        if throttle is not None:
+            if self._last_throttle is not None and throttle - self._last_throttle > self.HARSH_THROTTLE_DELTA:
+                self.harsh_accel += 1
+            self._last_throttle = throttle
+            self.throttle_count += 1
+
+    def evaluate(self) -> Optional[Dict]:
+        """
+        Puntuaciones, avisos y predicciones a partir de los acumuladores
+
+        Returns:
+            Dict con la estructura de vehicle_health, o None si aún no hay
+            MIN_SAMPLES muestras
+        """
+        if self.samples < self.MIN_SAMPLES:
+            return None
+
+        warnings = []
+        predictions = []
+
+        # 1. SALUD DEL MOTOR
+        engine_health = 100
+        if self.rpm.count:
+            if self.high_rpm_count / self.rpm.count > 0.3:
+                engine_health -= 20
+                warnings.append("⚠️ Uso frecuente de RPM altas (>4000). Aumenta desgaste del motor.")
+                predictions.append("Riesgo medio de desgaste prematuro de componentes en 12-18 meses")
+
+            if self.rpm.max > self.CRITICAL_RPM:
+                engine_health -= 15
+                warnings.append("🔴 RPM CRÍTICAS detectadas (>6000). Revisar limitador.")
+
+        if self.load.count and self.load.mean > 80:
+            engine_health -= 10
+            warnings.append("⚠️ Carga motor alta (>80%). Revisar admisión.")
+
+        # 2. SALUD TÉRMICA
+        thermal_health = 100
+        if self.coolant.count:
+            if self.coolant.max > 105:
+                thermal_health -= 30
+                warnings.append("🔴 CRÍTICO: Temperatura >105°C. Revisar sistema URGENTE.")
+                predictions.append("Riesgo ALTO de fallo en junta culata o radiador en 1-3 meses")
+            elif self.coolant.mean > 95:
+                thermal_health -= 15
+                warnings.append("⚠️ Temperatura elevada. Revisar termostato y radiador.")
+                predictions.append("Riesgo medio de sobrecalentamiento. Mantenimiento en 3-6 meses")
+
+        if self.intake.count and self.intake.mean > 50:
+            thermal_health -= 10
+            warnings.append("⚠️ Temperatura admisión alta. Revisar intercooler.")
+
+        # 3. EFICIENCIA
+        efficiency_health = 100
+        if self.maf.count:
+            maf_avg = self.maf.mean
+            if maf_avg < 10 or maf_avg > 80:
+                efficiency_health -= 15
+                warnings.append("⚠️ Flujo aire anómalo. Revisar MAF y filtro.")
+                predictions.append("Posible obstrucción en admisión. Reducción eficiencia 5-10%")
+
+        if self.throttle_count > 1 and self.harsh_accel / self.throttle_count > 0.05:
+            efficiency_health -= 10
+            warnings.append("⚠️ Conducción agresiva. Aumenta consumo y desgaste.")
+
+        # PUNTUACIÓN GLOBAL
+        overall_score = round((engine_health + thermal_health + efficiency_health) / 3)
+
+        return {
+            "overall_score": overall_score,
+            "engine_health": round(engine_health),
+            "thermal_health": round(thermal_health),
+            "efficiency_health": round(efficiency_health),
+            "warnings": warnings,
+            "predictions": predictions,
+            "last_update": datetime.now().isoformat()
+        }
+
+    def get_stats(self) -> Dict:
+        """Acumuladores actuales (depuración y endpoints)"""
+        return {
+            'samples': self.samples,
+            'rpm_avg': self.rpm.mean,
+            'rpm_max': self.rpm.max,
+            'high_rpm_count': self.high_rpm_count,
+            'load_avg': self.load.mean,
+            'maf_avg': self.maf.mean,
+            'coolant_avg': self.coolant.mean,
+            'coolant_max': self.coolant.max,
+            'intake_avg': self.intake.mean,
+            'harsh_accel': self.harsh_accel,
+            'throttle_samples': self.throttle_count
+        }
+
+
+if __name__ == "__main__":
+    # Coste por muestra: recálculo completo cada 30 puntos frente a incremental
+    import statistics
+    import time
+    from elm327_emulator import SyntheticSignals
+
+    signals = SyntheticSignals(seed=1)
+
+    def full_recompute(points):
+        rpms = [p['RPM'] for p in points if p.get('RPM') and p['RPM'] > 0]
+        loads = [p['ENGINE_LOAD'] for p in points if p.get('ENGINE_LOAD') is not None]
+        throttles = [p['THROTTLE_POS'] for p in points if p.get('THROTTLE_POS') is not None]
+        statistics.mean(rpms), max(rpms), statistics.mean(loads)
+        sum(1 for i in range(1, len(throttles)) if throttles[i] - throttles[i - 1] > 30)
+
+    for rows in (1500, 9000, 18000):
+        samples = [signals.sample(i * 0.2) for i in range(rows)]
+
+        start = time.perf_counter()
+        points = []
+        for i, sample in enumerate(samples, 1):
+            points.append(sample)
+            if i % 30 == 0:
+                full_recompute(points)
+        full_us = (time.perf_counter() - start) / rows * 1e6
+
+        engine = StreamingHealthEngine()
+        start = time.perf_counter()
+        for i, sample in enumerate(samples, 1):
+            engine.update(sample)
+            if i % 30 == 0:
+                engine.evaluate()
+        stream_us = (time.perf_counter() - start) / rows * 1e6
+
+        print(f"{rows:6d} muestras: recálculo {full_us:8.1f} µs/muestra  incremental {stream_us:5.1f} µs/muestra")
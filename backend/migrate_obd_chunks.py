@@ -0,0 +1,244 @@
+"""
+OBD Time Series Compaction Script
+=================================
+
+Converts the per-sample rows of closed trips (obd_data) into compressed
+per-signal chunks (obd_chunks), and benchmarks both formats.
+
+What this script does:
+- Compacts every closed trip (or a single one) into obd_chunks
+- Optionally deletes the compacted rows from obd_data (creates a backup first)
+- Optionally runs VACUUM to return the freed pages to the filesystem
+- Optionally compares storage size and read time of rows vs chunks
+
+Compaction is idempotent: re-running it rebuilds the trip's chunks.
+Trips whose rows are deleted keep their stored statistics, but they can no
+longer be recomputed from obd_data (recompute-stats returns 404 for them).
+
+Usage:
+    python migrate_obd_chunks.py
+    python migrate_obd_chunks.py --benchmark
+    python migrate_obd_chunks.py --trip-id 42 --delete-rows --vacuum
+
+Author: SENTINEL PRO Team
+Version: 1.0
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from database import DatabaseManager
+from migrate_db import backup_database
+from obd_chunks import CHUNK_SIGNALS, DEFAULT_CHUNK_SIZE
+
+ROW_OBJECTS = ('obd_data', 'idx_obd_trip', 'idx_obd_timestamp')
+CHUNK_OBJECTS = ('obd_chunks', 'idx_obd_chunks_trip_time', 'sqlite_autoindex_obd_chunks_1')
+
+
+def object_bytes(conn: sqlite3.Connection, names) -> int:
+    """
+    Bytes used by tables/indices (DBSTAT virtual table).
+
+    Args:
+        conn: Database connection
+        names: Table and index names
+
+    Returns:
+        Total page bytes, or -1 if SQLite was built without DBSTAT
+    """
+    try:
+        row = conn.execute(
+            f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({', '.join('?' * len(names))})",
+            list(names)
+        ).fetchone()
+        return row[0] or 0
+    except sqlite3.OperationalError:
+        return -1
+
+
+def closed_trips(db: DatabaseManager, trip_id: int = None) -> list:
+    """IDs of closed trips that have rows in obd_data."""
+    with db.connection() as conn:
+        query = '''
+            SELECT DISTINCT t.id FROM trips t
+            JOIN obd_data o ON o.trip_id = t.id
+            WHERE t.active = 0
+        '''
+        params = []
+        if trip_id is not None:
+            query += ' AND t.id = ?'
+            params.append(trip_id)
+        return [row[0] for row in conn.execute(query + ' ORDER BY t.id', params)]
+
+
+def compact(db: DatabaseManager, trip_ids: list, chunk_size: int, delete_rows: bool) -> dict:
+    """Compact trips and return the totals."""
+    totals = {'trips': 0, 'samples': 0, 'chunks': 0, 'bytes': 0}
+    for trip_id in trip_ids:
+        result = db.compact_trip_to_chunks(trip_id, chunk_size, delete_rows)
+        totals['trips'] += 1
+        totals['samples'] += result['samples']
+        totals['chunks'] += result['chunks']
+        totals['bytes'] += result['bytes']
+        print(f"[Migrate] ✓ Trip {trip_id}: {result['samples']} samples -> "
+              f"{result['chunks']} chunks ({result['bytes']} bytes)")
+    return totals
+
+
+def benchmark(db: DatabaseManager, trip_ids: list, rounds: int = 5):
+    """
+    Compare storage and read time of obd_data rows vs obd_chunks.
+
+    Only trips that still have rows in obd_data can be compared.
+    """
+    with db.connection() as conn:
+        row_bytes = object_bytes(conn, ROW_OBJECTS)
+        chunk_bytes = object_bytes(conn, CHUNK_OBJECTS)
+        samples = conn.execute('SELECT COUNT(*) FROM obd_data').fetchone()[0]
+
+    columns = ', '.join(('timestamp',) + CHUNK_SIGNALS)
+
+    def read_rows():
+        for trip_id in trip_ids:
+            with db.connection() as conn:
+                conn.execute(f'SELECT {columns} FROM obd_data WHERE trip_id = ? ORDER BY timestamp',
+                             (trip_id,)).fetchall()
+
+    def read_chunks():
+        for trip_id in trip_ids:
+            db.get_trip_series(trip_id)
+
+    def read_chunks_one_signal():
+        for trip_id in trip_ids:
+            db.get_trip_series(trip_id, ['speed'])
+
+    def read_rows_one_signal():
+        for trip_id in trip_ids:
+            with db.connection() as conn:
+                conn.execute('SELECT timestamp, speed FROM obd_data WHERE trip_id = ? ORDER BY timestamp',
+                             (trip_id,)).fetchall()
+
+    def timed(fn) -> float:
+        fn()  # Calentar caché
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        return (time.perf_counter() - start) / rounds * 1000
+
+    print("\n" + "=" * 70)
+    print("BENCHMARK: obd_data rows vs obd_chunks")
+    print("=" * 70)
+    print(f"Trips compared: {len(trip_ids)} ({samples} samples in obd_data)")
+    if row_bytes >= 0:
+        print(f"Storage  rows   (table + indices): {row_bytes / 1024:10.1f} KiB")
+        print(f"Storage  chunks (table + indices): {chunk_bytes / 1024:10.1f} KiB")
+        if chunk_bytes:
+            print(f"Ratio: {row_bytes / chunk_bytes:.1f}x")
+    else:
+        print("Storage: DBSTAT not available in this SQLite build")
+    print(f"Read all signals   rows {timed(read_rows):8.1f} ms   chunks {timed(read_chunks):8.1f} ms")
+    print(f"Read 'speed' only  rows {timed(read_rows_one_signal):8.1f} ms   "
+          f"chunks {timed(read_chunks_one_signal):8.1f} ms")
+    print("=" * 70)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Compact OBD time series into compressed chunks",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    # Compact all closed trips (rows are kept)
+    python migrate_obd_chunks.py
+
+    # Compact and compare storage/read speed against obd_data
+    python migrate_obd_chunks.py --benchmark
+
+    # Compact one trip, drop its rows and shrink the file
+    python migrate_obd_chunks.py --trip-id 42 --delete-rows --vacuum
+
+Notes:
+    - Active trips are never compacted
+    - --delete-rows creates a backup first unless --skip-backup is given
+    - Timestamps are stored with microsecond precision and read back in ISO format
+        """
+    )
+
+    parser.add_argument('--db-path', type=str, default='../db/sentinel.db',
+                        help='Path to database file')
+    parser.add_argument('--trip-id', type=int, default=None,
+                        help='Compact only this trip')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Samples per chunk (default {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--delete-rows', action='store_true',
+                        help='Delete compacted rows from obd_data')
+    parser.add_argument('--skip-backup', action='store_true',
+                        help='Skip backup before --delete-rows (not recommended)')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='Run VACUUM after compaction')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare storage and read time of rows vs chunks')
+
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db_path)
+    if not os.path.exists(db_path):
+        print(f"[Migrate] ✗ Database not found: {db_path}")
+        print(f"[Migrate] Please check the path and try again")
+        return 1
+
+    if args.delete_rows and args.benchmark:
+        print("[Migrate] ✗ --benchmark needs the rows: do not combine it with --delete-rows")
+        return 1
+
+    db = DatabaseManager(db_path)
+    try:
+        if args.delete_rows and not args.skip_backup:
+            backup_database(db_path)
+
+        trip_ids = closed_trips(db, args.trip_id)
+        if not trip_ids:
+            print("[Migrate] No closed trips with rows in obd_data")
+            return 0
+
+        start = time.perf_counter()
+        totals = compact(db, trip_ids, args.chunk_size, args.delete_rows)
+        elapsed = time.perf_counter() - start
+
+        print("\n" + "=" * 70)
+        print("COMPACTION SUMMARY")
+        print("=" * 70)
+        print(f"Database: {db_path}")
+        print(f"Trips: {totals['trips']}")
+        print(f"Samples: {totals['samples']}")
+        print(f"Chunks: {totals['chunks']} ({len(CHUNK_SIGNALS) + 1} signals each)")
+        print(f"Compressed bytes: {totals['bytes']}")
+        print(f"Rows deleted: {'YES' if args.delete_rows else 'NO'}")
+        print(f"Time: {elapsed:.2f}s")
+        print("=" * 70)
+
+        if args.vacuum:
+            print("[Migrate] Running VACUUM...")
+            with db.connection() as conn:
+                conn.execute('VACUUM')
+            print(f"[Migrate] ✓ Database size: {os.path.getsize(db_path)} bytes")
+
+        if args.benchmark:
+            benchmark(db, trip_ids)
+
+        return 0
+
+    except Exception as e:
+        print(f"\n[Migrate] ✗ Compaction failed: {e}")
+        return 1
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - OBD ACQUISITION WORKER
+# Hilo de adquisición continua desacoplado de las peticiones HTTP
+# =============================================================================
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+class OBDAcquisitionWorker:
+    """
+    Hilo dedicado que posee la conexión OBD y muestrea de forma continua
+
+    Los endpoints HTTP nunca tocan el adaptador: leen el último snapshot
+    publicado (y un histórico corto) protegido por un lock, por lo que su
+    latencia no depende del número de clientes conectados.
+    """
+
+    def __init__(self, read_function: Callable, on_sample: Callable = None,
+                 interval: float = 0.2, history_size: int = 300):
+        """
+        Inicializa el worker de adquisición
+
+        Args:
+            read_function: Función (connection) -> dict con los PIDs leídos en el ciclo
+            on_sample: Callback (values, new_data) -> dict publicado como snapshot
+            interval: Periodo objetivo del ciclo de adquisición en segundos
+            history_size: Número de snapshots conservados en el histórico
+        """
+        self.read_function = read_function
+        self.on_sample = on_sample
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        # Notifica a los clientes en streaming cada snapshot nuevo
+        self._new_snapshot = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._connection = None
+
+        self._latest_values = {}
+        self._snapshot = None
+        self._history = deque(maxlen=history_size)
+        self._sequence = 0
+
+        self._cycles = 0
+        self._errors = 0
+        self._last_error = None
+        self._last_cycle_duration = 0.0
+        self._started_at = None
+
+    # =========================================================================
+    # CICLO DE VIDA
+    # =========================================================================
+
+    def start(self, connection) -> bool:
+        """
+        Arranca (o reinicia) el hilo de adquisición con una conexión
+
+        Args:
+            connection: Conexión OBD de la que el worker pasa a ser propietario
+
+        Returns:
+            True si el hilo quedó en ejecución
+        """
+        if self.is_running() and connection is self._connection:
+            return True
+
+        self.stop()
+
+        self._connection = connection
+        self._latest_values = {}
+        self._stop_event.clear()
+        self._started_at = time.time()
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="obd-acquisition",
+            daemon=True
+        )
+        self._thread.start()
+        print(f"[ACQ] ✓ Hilo de adquisición iniciado (ciclo {self.interval * 1000:.0f} ms)")
+        return True
+
+    def stop(self, timeout: float = 2.0):
+        """
+        Detiene el hilo de adquisición y libera la conexión
+
+        Args:
+            timeout: Segundos máximos de espera para que el hilo termine
+        """
+        self._stop_event.set()
+
+        thread = self._thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+            print("[ACQ] Hilo de adquisición detenido")
+
+        self._thread = None
+        self._connection = None
+
+    def is_running(self) -> bool:
+        """Indica si el hilo de adquisición está activo"""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def connection(self):
+        """Conexión OBD propiedad del worker (None si está detenido)"""
+        return self._connection
+
+    def _run(self):
+        """Bucle principal: lee, publica y espera hasta el siguiente ciclo"""
+        while not self._stop_event.is_set():
+            cycle_start = time.time()
+            connection = self._connection
+
+            if not connection or not connection.is_connected():
+                # Sin coche: no saturar la CPU, reintentar en 1 s
+                self._stop_event.wait(1.0)
+                continue
+
+            try:
+                new_data = self.read_function(connection) or {}
+                self._publish(new_data)
+            except Exception as e:
+                self._errors += 1
+                self._last_error = str(e)
+                print(f"[ACQ] Error en ciclo de adquisición: {e}")
+
+            self._cycles += 1
+            self._last_cycle_duration = time.time() - cycle_start
+
+            remaining = self.interval - self._last_cycle_duration
+            if remaining > 0:
+                self._stop_event.wait(remaining)
+
+    def _publish(self, new_data: Dict):
+        """
+        Fusiona los valores nuevos con los últimos conocidos y publica un snapshot
+
+        Args:
+            new_data: PIDs leídos en este ciclo
+        """
+        self._latest_values.update(new_data)
+        values = dict(self._latest_values)
+
+        if self.on_sample:
+            values = self.on_sample(values, new_data)
+
+        with self._lock:
+            self._sequence += 1
+            snapshot = {
+                'sequence': self._sequence,
+                'timestamp': datetime.now().isoformat(),
+                'data': values
+            }
+            self._snapshot = snapshot
+            self._history.append(snapshot)
+            self._new_snapshot.notify_all()
+
+    # =========================================================================
+    # LECTURA PARA ENDPOINTS
+    # =========================================================================
+
+    def get_snapshot(self) -> Optional[Dict]:
+        """
+        Obtiene el último snapshot publicado
+
+        Los snapshots son inmutables una vez publicados, por lo que se
+        devuelve la referencia sin copiar.
+
+        Returns:
+            Dict con sequence, timestamp y data, o None si aún no hay lecturas
+        """
+        with self._lock:
+            return self._snapshot
+
+    def wait_for_snapshot(self, after_sequence: int, timeout: float) -> Optional[Dict]:
+        """
+        Espera a que se publique un snapshot posterior a una secuencia
+
+        Args:
+            after_sequence: Última secuencia que ya tiene el cliente
+            timeout: Segundos máximos de espera
+
+        Returns:
+            El snapshot más reciente, o None si no hubo ninguno nuevo
+        """
+        with self._new_snapshot:
+            self._new_snapshot.wait_for(
+                lambda: self._snapshot is not None and self._snapshot['sequence'] > after_sequence,
+                timeout
+            )
+            snapshot = self._snapshot
+        if snapshot is None or snapshot['sequence'] <= after_sequence:
+            return None
+        return snapshot
+
+    def get_history(self, since_sequence: int = None) -> List[Dict]:
+        """
+        Obtiene el histórico corto de snapshots
+
+        Args:
+            since_sequence: Si se indica, solo snapshots posteriores a esa secuencia
+
+        Returns:
+            Lista de snapshots en orden cronológico
+        """
+        with self._lock:
+            history = list(self._history)
+
+        if since_sequence is not None:
+            history = [s for s in history if s['sequence'] > since_sequence]
+
+        return history
+
+    def get_status(self) -> Dict:
+        """
+        Obtiene el estado del worker para diagnóstico
+
+        Returns:
+            Diccionario con estado, ciclos, errores y duración del último ciclo
+        """
+        snapshot = self.get_snapshot()
+        return {
+            'running': self.is_running(),
+            'interval_ms': round(self.interval * 1000),
+            'cycles': self._cycles,
+            'errors': self._errors,
+            'last_error': self._last_error,
+            'last_cycle_ms': round(self._last_cycle_duration * 1000, 1),
+            'sequence': snapshot['sequence'] if snapshot else 0,
+            'last_sample': snapshot['timestamp'] if snapshot else None,
+            'uptime_s': round(time.time() - self._started_at, 1) if self._started_at and self.is_running() else 0,
+            'history_size': len(self._history)
+        }
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - LECTURA MULTI-PID (MODE 01 AGRUPADO)
+# Agrupa hasta 6 PIDs por petición en protocolos CAN (ISO 15765-4)
+# =============================================================================
+
+from typing import Callable, Dict, List, Optional
+
+import obd
+from obd import OBDCommand
+from obd.protocols import ECU
+from obd.protocols.protocol import Message
+
+from fast_decode import decode_pid, has_fast_decoder
+
+
+class MultiPIDReader:
+    """
+    Lector de PIDs Mode 01 agrupados en peticiones multi-PID
+
+    En CAN una única petición "01 0C 0D 11 04 10 0B" devuelve los seis PIDs
+    en una sola respuesta, ahorrando cinco round-trips al adaptador. Si la
+    ECU rechaza las peticiones agrupadas se vuelve automáticamente a
+    consultas individuales para esa conexión.
+    """
+
+    # Máximo de PIDs por petición que permite ISO 15765-4
+    MAX_PIDS_PER_REQUEST = 6
+
+    # IDs de protocolo ELM327 que corresponden a CAN
+    CAN_PROTOCOL_IDS = {'6', '7', '8', '9', 'A', 'B', 'C'}
+
+    # Fallos consecutivos (sin ningún PID decodificado) antes de desactivar el modo agrupado
+    MAX_BATCH_FAILURES = 2
+
+    def __init__(self, max_pids_per_request: int = MAX_PIDS_PER_REQUEST):
+        """
+        Inicializa el lector multi-PID
+
+        Args:
+            max_pids_per_request: PIDs por petición (1-6)
+        """
+        self.max_pids_per_request = max(1, min(max_pids_per_request, self.MAX_PIDS_PER_REQUEST))
+        self._connection_id = None
+        self._batch_enabled = None  # None = aún no determinado para esta conexión
+        self._consecutive_failures = 0
+        self._batch_commands = {}
+        self.stats = {'batch_requests': 0, 'batch_failures': 0, 'single_reads': 0}
+
+    # =========================================================================
+    # API PÚBLICA
+    # =========================================================================
+
+    def read_pids(self, connection, pid_names: List[str],
+                  single_reader: Callable[[str], object]) -> Dict:
+        """
+        Lee un grupo de PIDs usando peticiones agrupadas cuando es posible
+
+        Args:
+            connection: Conexión OBD
+            pid_names: Nombres de PIDs (ej: ['RPM', 'SPEED'])
+            single_reader: Función (pid_name) -> valor usada como fallback
+
+        Returns:
+            Dict {pid_name: valor} con los PIDs que respondieron
+        """
+        self._check_connection(connection)
+
+        data = {}
+        batchable = []
+        singles = []
+
+        for pid_name in pid_names:
+            cmd = getattr(obd.commands, pid_name, None)
+            if self._is_batchable(connection, cmd):
+                batchable.append(cmd)
+            else:
+                singles.append(pid_name)
+
+        if batchable and self.is_batch_enabled(connection):
+            for i in range(0, len(batchable), self.max_pids_per_request):
+                group = batchable[i:i + self.max_pids_per_request]
+                if len(group) == 1:
+                    # Un único PID no gana nada agrupado
+                    singles.append(group[0].name)
+                    continue
+
+                values = self._query_batch(connection, group)
+
+                if values is None:
+                    # La ECU rechazó el grupo: leer sus PIDs uno a uno
+                    singles.extend(cmd.name for cmd in group)
+                    if not self.is_batch_enabled(connection):
+                        # Desactivado a mitad de ciclo: el resto también va individual
+                        singles.extend(cmd.name for cmd in batchable[i + len(group):])
+                        break
+                    continue
+
+                data.update(values)
+                # PIDs que la ECU omitió en la respuesta agrupada
+                singles.extend(cmd.name for cmd in group if cmd.name not in values)
+        else:
+            singles.extend(cmd.name for cmd in batchable)
+
+        for pid_name in singles:
+            value = single_reader(pid_name)
+            self.stats['single_reads'] += 1
+            if value is not None:
+                data[pid_name] = value
+
+        return data
+
+    def is_batch_enabled(self, connection) -> bool:
+        """
+        Indica si se usarán peticiones agrupadas con esta conexión
+
+        Args:
+            connection: Conexión OBD
+
+        Returns:
+            True si el protocolo es CAN y la ECU no ha rechazado los grupos
+        """
+        self._check_connection(connection)
+
+        if self._batch_enabled is None:
+            try:
+                protocol_id = str(connection.protocol_id()).upper()
+            except Exception:
+                protocol_id = ''
+            self._batch_enabled = protocol_id in self.CAN_PROTOCOL_IDS
+            if self._batch_enabled:
+                print(f"[MULTI-PID] ✓ Protocolo CAN ({protocol_id}): peticiones de hasta {self.max_pids_per_request} PIDs")
+            else:
+                print(f"[MULTI-PID] Protocolo '{protocol_id}' no CAN: consultas individuales")
+
+        return self._batch_enabled
+
+    def get_status(self) -> Dict:
+        """
+        Obtiene el estado del lector para diagnóstico
+
+        Returns:
+            Dict con modo activo y contadores
+        """
+        return {
+            'batch_enabled': self._batch_enabled,
+            'max_pids_per_request': self.max_pids_per_request,
+            'consecutive_failures': self._consecutive_failures,
+            **self.stats
+        }
+
+    # =========================================================================
+    # FUNCIONES AUXILIARES
+    # =========================================================================
+
+    def _check_connection(self, connection):
+        """Reinicia la detección de capacidad cuando cambia la conexión"""
+        if id(connection) != self._connection_id:
+            self._connection_id = id(connection)
+            self._batch_enabled = None
+            self._consecutive_failures = 0
+
+    def _is_batchable(self, connection, cmd) -> bool:
+        """Solo PIDs Mode 01 de longitud fija soportados por el vehículo"""
+        if cmd is None or cmd.mode != 1 or cmd.pid is None or cmd.bytes <= 2:
+            return False
+        try:
+            return connection.supports(cmd)
+        except Exception:
+            return False
+
+    def _get_batch_command(self, group: List[OBDCommand]) -> OBDCommand:
+        """Construye (y cachea) el comando multi-PID para un grupo"""
+        key = tuple(cmd.pid for cmd in group)
+
+        if key not in self._batch_commands:
+            command = b"01" + "".join(f"{pid:02X}" for pid in key).encode()
+            self._batch_commands[key] = OBDCommand(
+                "MULTI_" + "_".join(cmd.name for cmd in group),
+                "Multi-PID " + ", ".join(cmd.name for cmd in group),
+                command,
+                0,                      # Longitud variable: no recortar la respuesta
+                lambda messages: messages,
+                ECU.ALL,
+                False
+            )
+
+        return self._batch_commands[key]
+
+    def _query_batch(self, connection, group: List[OBDCommand]) -> Optional[Dict]:
+        """
+        Envía una petición agrupada y separa la respuesta por PID
+
+        Returns:
+            Dict {pid_name: valor} o None si la ECU no respondió al grupo
+        """
+        self.stats['batch_requests'] += 1
+
+        try:
+            response = connection.query(self._get_batch_command(group), force=True)
+            messages = response.value if response and not response.is_null() else None
+        except Exception:
+            messages = None
+
+        values = split_multi_pid_response(messages or [], group)
+
+        if not values:
+            self.stats['batch_failures'] += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.MAX_BATCH_FAILURES:
+                self._batch_enabled = False
+                print("[MULTI-PID] ⚠️ La ECU no acepta peticiones agrupadas: fallback a consultas individuales")
+            return None
+
+        self._consecutive_failures = 0
+        return values
+
+
+def split_multi_pid_response(messages: List[Message], group: List[OBDCommand]) -> Dict:
+    """
+    Separa una respuesta Mode 01 multi-PID en valores por PID
+
+    Formato de la respuesta: 41 [PID A B ...] [PID A B ...] ...
+    La longitud de cada bloque se toma de la definición del comando.
+
+    Args:
+        messages: Mensajes devueltos por python-obd
+        group: Comandos solicitados en la petición
+
+    Returns:
+        Dict {pid_name: valor} con los PIDs decodificados
+    """
+    by_pid = {cmd.pid: cmd for cmd in group}
+    values = {}
+
+    # Priorizar la respuesta de la ECU de motor si responden varias
+    ordered = sorted(messages, key=lambda m: 0 if m.ecu == ECU.ENGINE else 1)
+
+    for message in ordered:
+        data = message.data
+        if len(data) < 2 or data[0] != 0x41:
+            continue
+
+        idx = 1
+        while idx < len(data):
+            cmd = by_pid.get(data[idx])
+            if cmd is None:
+                break  # PID inesperado: no se puede seguir separando con seguridad
+
+            size = cmd.bytes - 2
+            payload = data[idx + 1:idx + 1 + size]
+            if len(payload) < size:
+                break
+
+            if cmd.name not in values:
+                value = _decode_payload(cmd, payload)
+                if value is not None:
+                    values[cmd.name] = value
+
+            idx += 1 + size
+
+    return values
+
+
+def _decode_payload(cmd: OBDCommand, payload: bytearray):
+    """Decodifica el bloque de un PID (tabla rápida o decoder estándar del comando)"""
+    if has_fast_decoder(cmd.name):
+        return decode_pid(cmd.name, payload)
+
+    try:
+        message = Message([])
+        message.data = bytearray([0x41, cmd.pid]) + payload
+        value = cmd.decode([message])
+
+        if value is None:
+            return None
+        if hasattr(value, 'magnitude'):
+            return value.magnitude
+        return value
+
+    except Exception:
+        return None
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - ALMACENAMIENTO COLUMNAR COMPRIMIDO DE SERIES OBD
+# Bloques por viaje y señal (timestamps en delta, valores en XOR), con los
+# bytes reordenados por significancia y comprimidos con zlib
+# =============================================================================
+
+import math
+import operator
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Columnas de obd_data que se guardan como señales
+CHUNK_SIGNALS = ('rpm', 'speed', 'coolant_temp', 'intake_temp', 'maf', 'engine_load',
+                 'throttle_pos', 'fuel_pressure', 'latitude', 'longitude')
+TIMESTAMP_SIGNAL = 'timestamp'
+DEFAULT_CHUNK_SIZE = 4096  # Muestras por bloque (~14 min a 5 Hz)
+
+TIMESTAMP_ENCODING = 'delta-shuffle-zlib'
+VALUE_ENCODING = 'xor-shuffle-zlib'
+ZLIB_LEVEL = 6
+
+NAN = float('nan')
+
+
+# =============================================================================
+# CODIFICACIÓN
+# =============================================================================
+
+def _shuffle(raw: bytes, width: int = 8) -> bytes:
+    """Agrupa los bytes por posición (todos los bytes altos juntos, etc.)"""
+    return b''.join(raw[i::width] for i in range(width))
+
+
+def _unshuffle(data: bytes, width: int = 8) -> bytes:
+    n = len(data) // width
+    out = bytearray(len(data))
+    for i in range(width):
+        out[i::width] = data[i * n:(i + 1) * n]
+    return bytes(out)
+
+
+def parse_timestamp(value) -> int:
+    """
+    Timestamp de obd_data (ISO o unix) a microsegundos unix
+
+    Args:
+        value: Texto ISO ('2025-01-01T10:00:00.123456') o número unix
+    """
+    if isinstance(value, (int, float)):
+        return int(round(value * 1_000_000))
+    return int(round(datetime.fromisoformat(str(value)).timestamp() * 1_000_000))
+
+
+def format_timestamp(micros: int) -> str:
+    """Microsegundos unix a texto ISO local (formato de obd_data)"""
+    seconds, micro = divmod(micros, 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micro).isoformat()
+
+
+def encode_timestamps(micros: Sequence[int]) -> bytes:
+    """Primer valor absoluto y después diferencias (int64), reordenado y comprimido"""
+    deltas = array('q', map(operator.sub, micros, [0] + list(micros[:-1])))
+    return zlib.compress(_shuffle(deltas.tobytes()), ZLIB_LEVEL)
+
+
+def decode_timestamps(blob: bytes) -> array:
+    """Inversa de encode_timestamps(): array('q') de microsegundos unix"""
+    deltas = array('q')
+    deltas.frombytes(_unshuffle(zlib.decompress(blob)))
+    return array('q', accumulate(deltas))
+
+
+def encode_values(values: Sequence[float]) -> bytes:
+    """
+    float64 (NaN = sin dato) en XOR con el valor anterior, reordenado y comprimido
+
+    Valores repetidos dan XOR 0 y valores próximos comparten signo,
+    exponente y bits altos de la mantisa, así que tras agrupar los bytes
+    por posición zlib comprime casi todo salvo los bytes bajos.
+    """
+    bits = array('Q')
+    bits.frombytes(array('d', values).tobytes())
+    xored = array('Q', map(operator.xor, bits, [0] + list(bits[:-1])))
+    return zlib.compress(_shuffle(xored.tobytes()), ZLIB_LEVEL)
+
+
+def decode_values(blob: bytes) -> array:
+    """Inversa de encode_values(): array('d') con NaN donde no había dato"""
+    xored = array('Q')
+    xored.frombytes(_unshuffle(zlib.decompress(blob)))
+    values = array('d')
+    values.frombytes(array('Q', accumulate(xored, operator.xor)).tobytes())
+    return values
+
+
+# =============================================================================
+# CONSTRUCCIÓN Y LECTURA DE BLOQUES
+# =============================================================================
+
+def _as_float(value) -> float:
+    if value is None or isinstance(value, bool):
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def build_chunks(trip_id: int, rows: Iterable[Dict],
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple]:
+    """
+    Filas de obd_chunks a partir de las filas de obd_data de un viaje
+
+    Args:
+        trip_id: ID del viaje
+        rows: Filas de obd_data ordenadas por timestamp
+        chunk_size: Muestras por bloque
+
+    Returns:
+        Tuplas (trip_id, signal, chunk, start_ts, end_ts, count, null_count,
+        min_value, max_value, sum_value, encoding, data) para INSERT
+    """
+    chunks = []
+    timestamps = []
+    columns = {signal: [] for signal in CHUNK_SIGNALS}
+
+    def seal():
+        index = len(chunks) // (len(CHUNK_SIGNALS) + 1)
+        start_ts, end_ts = timestamps[0] / 1_000_000, timestamps[-1] / 1_000_000
+        count = len(timestamps)
+        chunks.append((trip_id, TIMESTAMP_SIGNAL, index, start_ts, end_ts, count, 0,
+                       start_ts, end_ts, None, TIMESTAMP_ENCODING, encode_timestamps(timestamps)))
+        for signal in CHUNK_SIGNALS:
+            values = columns[signal]
+            present = [v for v in values if v == v]
+            chunks.append((trip_id, signal, index, start_ts, end_ts, count, count - len(present),
+                           min(present) if present else None,
+                           max(present) if present else None,
+                           math.fsum(present) if present else None,
+                           VALUE_ENCODING, encode_values(values)))
+            values.clear()
+        timestamps.clear()
+
+    for row in rows:
+        timestamps.append(parse_timestamp(row['timestamp']))
+        for signal in CHUNK_SIGNALS:
+            columns[signal].append(_as_float(row.get(signal)))
+        if len(timestamps) >= chunk_size:
+            seal()
+    if timestamps:
+        seal()
+    return chunks
+
+
+def decode_series(chunk_rows: Iterable[Dict], signals: Sequence[str],
+                  start: Optional[float] = None, end: Optional[float] = None) -> Dict:
+    """
+    Decodifica bloques de un viaje en arrays por señal
+
+    Args:
+        chunk_rows: Filas de obd_chunks (timestamp y señales pedidas) ordenadas por chunk
+        signals: Señales a devolver
+        start: Instante unix mínimo (incluido)
+        end: Instante unix máximo (incluido)
+
+    Returns:
+        Dict con 'timestamp' (array('d') de segundos unix) y un array('d')
+        por señal, NaN donde no había dato
+    """
+    by_chunk = {}
+    for row in chunk_rows:
+        by_chunk.setdefault(row['chunk'], {})[row['signal']] = row['data']
+
+    out = {TIMESTAMP_SIGNAL: array('d')}
+    for signal in signals:
+        out[signal] = array('d')
+
+    for index in sorted(by_chunk):
+        blobs = by_chunk[index]
+        micros = decode_timestamps(blobs[TIMESTAMP_SIGNAL])
+        lo = bisect_left(micros, start * 1_000_000) if start is not None else 0
+        hi = bisect_right(micros, end * 1_000_000) if end is not None else len(micros)
+        if lo >= hi:
+            continue
+
+        out[TIMESTAMP_SIGNAL].extend(t / 1_000_000 for t in micros[lo:hi])
+        for signal in signals:
+            blob = blobs.get(signal)
+            if blob is None:
+                out[signal].extend([NAN] * (hi - lo))
+            else:
+                out[signal].extend(decode_values(blob)[lo:hi])
+    return out
+
+
+def rows_to_series(rows: Iterable[Dict], signals: Sequence[str],
+                   start: Optional[float] = None, end: Optional[float] = None) -> Dict:
+    """Mismo resultado que decode_series() a partir de filas de obd_data sin compactar"""
+    out = {TIMESTAMP_SIGNAL: array('d')}
+    for signal in signals:
+        out[signal] = array('d')
+    for row in rows:
+        ts = parse_timestamp(row['timestamp']) / 1_000_000
+        if (start is not None and ts < start) or (end is not None and ts > end):
+            continue
+        out[TIMESTAMP_SIGNAL].append(ts)
+        for signal in signals:
+            out[signal].append(_as_float(row.get(signal)))
+    return out
+
+
+def series_to_rows(series: Dict, trip_id: int) -> List[Dict]:
+    """Series decodificadas a filas con el formato de obd_data (id = None)"""
+    signals = [s for s in CHUNK_SIGNALS if s in series]
+    rows = []
+    for i, ts in enumerate(series[TIMESTAMP_SIGNAL]):
+        row = {'id': None, 'trip_id': trip_id,
+               'timestamp': format_timestamp(int(round(ts * 1_000_000)))}
+        for signal in signals:
+            value = series[signal][i]
+            row[signal] = value if value == value else None
+        rows.append(row)
+    return rows
+
+
+def series_to_json(series: Dict) -> Dict:
+    """Arrays a listas serializables (NaN -> None)"""
+    return {name: [v if v == v else None for v in values] for name, values in series.items()}
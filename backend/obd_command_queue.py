@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - COLA DE COMANDOS DEL ADAPTADOR
+# Acceso serializado al ELM327 con prioridades y fusión de peticiones iguales
+# =============================================================================
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable
+
+
+# Prioridades (menor = antes)
+PRIORITY_LIVE = 0         # Ciclo de adquisición (dashboard)
+PRIORITY_INTERACTIVE = 1  # Consultas puntuales de endpoints
+PRIORITY_SCAN = 2         # Escaneo de PIDs disponibles
+PRIORITY_DIAGNOSTIC = 3   # Diagnósticos lentos (DTCs, OBDb extendido)
+
+
+class AdapterCommandQueue:
+    """
+    Cola única de acceso al adaptador OBD
+
+    Un hilo despachador ejecuta las peticiones de una en una, siempre la de
+    mayor prioridad pendiente. Como cada petición es un único comando, un
+    escaneo largo cede el bus entre comando y comando y las lecturas en vivo
+    nunca esperan más que un comando en curso. Las peticiones idénticas que
+    están pendientes a la vez se fusionan y comparten el resultado.
+    Para que las prioridades bajas no queden bloqueadas para siempre, ganan
+    un nivel por cada AGING_SECONDS de espera.
+    """
+
+    AGING_SECONDS = 5.0
+
+    def __init__(self):
+        """Inicializa la cola (el hilo se arranca con la primera petición)"""
+        lock = threading.Lock()
+        self._cond = threading.Condition(lock)
+        self._idle = threading.Condition(lock)  # Avisa a drain() cuando la cola se vacía
+        self._pending = []
+        self._by_key = {}
+        self._sequence = 0
+        self._thread = None
+        self._busy = False
+
+        self._executed = 0
+        self._merged = 0
+        self._errors = 0
+        self._executed_by_priority = {}
+        self._max_wait = {}
+
+    # =========================================================================
+    # ENVÍO DE PETICIONES
+    # =========================================================================
+
+    def submit(self, fn: Callable, priority: int = PRIORITY_INTERACTIVE,
+               key: Hashable = None) -> Future:
+        """
+        Encola una operación sobre el adaptador
+
+        Args:
+            fn: Función sin argumentos que usa el adaptador
+            priority: Prioridad de la petición (PRIORITY_*)
+            key: Identificador para fusionar peticiones idénticas (None = no fusionar)
+
+        Returns:
+            Future con el resultado de fn
+        """
+        with self._cond:
+            if key is not None and key in self._by_key:
+                request = self._by_key[key]
+                request['priority'] = min(request['priority'], priority)
+                request['merged'] += 1
+                self._merged += 1
+                return request['future']
+
+            self._sequence += 1
+            request = {
+                'fn': fn,
+                'priority': priority,
+                'key': key,
+                'sequence': self._sequence,
+                'enqueued_at': time.time(),
+                'merged': 0,
+                'future': Future()
+            }
+            self._pending.append(request)
+            if key is not None:
+                self._by_key[key] = request
+
+            self._ensure_thread()
+            self._cond.notify()
+            return request['future']
+
+    def run(self, fn: Callable, priority: int = PRIORITY_INTERACTIVE,
+            key: Hashable = None):
+        """
+        Ejecuta una operación a través de la cola y espera su resultado
+
+        Si se llama desde el propio despachador se ejecuta directamente para
+        no bloquearse a sí mismo.
+        """
+        if threading.current_thread() is self._thread:
+            return fn()
+        return self.submit(fn, priority, key).result()
+
+    def connection(self, connection, priority: int = PRIORITY_INTERACTIVE) -> 'QueuedConnection':
+        """Envuelve una conexión para que sus consultas pasen por la cola"""
+        return QueuedConnection(self, connection, priority)
+
+    def drain(self, timeout: float = None) -> bool:
+        """
+        Espera a que no quede ninguna petición pendiente ni en curso
+        (antes de cerrar el adaptador)
+
+        Args:
+            timeout: Segundos máximos de espera (None = sin límite)
+
+        Returns:
+            True si la cola quedó vacía; False si venció el plazo
+        """
+        if threading.current_thread() is self._thread:
+            return not self._pending
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            while self._pending or self._busy:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+            return True
+
+    # =========================================================================
+    # DESPACHO
+    # =========================================================================
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._dispatch, name="obd-adapter-queue", daemon=True)
+            self._thread.start()
+
+    def _next_request(self) -> Dict:
+        """Saca la petición con mejor prioridad efectiva (con envejecimiento)"""
+        now = time.time()
+
+        def effective(request):
+            aging = int((now - request['enqueued_at']) / self.AGING_SECONDS)
+            return (request['priority'] - aging, request['sequence'])
+
+        request = min(self._pending, key=effective)
+        self._pending.remove(request)
+        if request['key'] is not None:
+            self._by_key.pop(request['key'], None)
+        return request
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                request = self._next_request()
+                self._busy = True
+
+            future = request['future']
+            if not future.set_running_or_notify_cancel():
+                self._set_idle()
+                continue
+
+            wait = time.time() - request['enqueued_at']
+            try:
+                future.set_result(request['fn']())
+            except Exception as e:
+                self._errors += 1
+                future.set_exception(e)
+
+            priority = request['priority']
+            self._executed += 1
+            self._executed_by_priority[priority] = self._executed_by_priority.get(priority, 0) + 1
+            self._max_wait[priority] = max(self._max_wait.get(priority, 0.0), wait)
+            self._set_idle()
+
+    def _set_idle(self):
+        with self._cond:
+            self._busy = False
+            if not self._pending:
+                self._idle.notify_all()
+
+    # =========================================================================
+    # ESTADÍSTICAS
+    # =========================================================================
+
+    def get_status(self) -> Dict:
+        """
+        Estado de la cola para diagnóstico
+
+        Returns:
+            Dict con pendientes, ejecutadas, fusionadas y espera máxima por prioridad
+        """
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'executed': self._executed,
+            'merged': self._merged,
+            'errors': self._errors,
+            'executed_by_priority': {str(p): n for p, n in sorted(self._executed_by_priority.items())},
+            'max_wait_ms_by_priority': {str(p): round(w * 1000, 1) for p, w in sorted(self._max_wait.items())}
+        }
+
+
+class QueuedConnection:
+    """
+    Conexión OBD cuyas consultas pasan por la cola del adaptador
+
+    Expone la misma interfaz que obd.OBD (query, supports, protocol_id...),
+    así que el código de lectura existente funciona sin cambios. Solo
+    query() se serializa; el resto de atributos se delegan directamente.
+    """
+
+    def __init__(self, queue: AdapterCommandQueue, connection, priority: int):
+        self._queue = queue
+        self._connection = connection
+        self.priority = priority
+
+    @property
+    def raw(self):
+        """Conexión python-obd subyacente"""
+        return self._connection
+
+    def with_priority(self, priority: int) -> 'QueuedConnection':
+        """La misma conexión con otra prioridad"""
+        return QueuedConnection(self._queue, self._connection, priority)
+
+    def query(self, cmd, force: bool = False):
+        # Mismo comando, cabecera y decoder => misma respuesta: se puede fusionar
+        key = (cmd.command, cmd.header, cmd.decode, force)
+        connection = self._connection
+        return self._queue.run(lambda: connection.query(cmd, force=force), self.priority, key)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - CONEXIÓN RÁPIDA OBD
+# Recuerda protocolo, baudrate y comandos soportados por adaptador/vehículo
+# para reconectar sin autodetección
+# =============================================================================
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import obd
+from obd import OBDStatus
+from obd.elm327 import ELM327
+
+
+class FastELM327(ELM327):
+    """
+    ELM327 sin esperas fijas durante la inicialización
+
+    python-obd duerme 1 s tras ATZ (y otro tras ATSP0/0100 en autodetección)
+    aunque la lectura ya espera al prompt '>'. Con protocolo conocido esas
+    esperas son casi todo el tiempo de conexión.
+    """
+
+    def _ELM327__send(self, cmd, delay=None, end_marker=ELM327.ELM_PROMPT):
+        return ELM327._ELM327__send(self, cmd, None, end_marker)
+
+
+class FastConnectOBD(obd.OBD):
+    """
+    Conexión OBD que reutiliza un perfil de conexión guardado
+
+    Usa el protocolo y baudrate del perfil (sin autodetección) y restaura
+    los comandos soportados tras comprobar con una sola consulta (bitmap
+    0100) que el vehículo es el mismo. Si el bitmap no coincide con ningún
+    perfil conocido del adaptador se enumeran los comandos de forma normal.
+    """
+
+    def __init__(self, portstr, profile: Dict, known_profiles: Dict = None, timeout: float = 10):
+        """
+        Args:
+            portstr: Puerto del adaptador
+            profile: Perfil a probar primero (protocol, baudrate, commands, pids_a)
+            known_profiles: Otros perfiles del adaptador {pids_a: perfil}
+            timeout: Timeout de lectura de python-obd
+        """
+        self.profile = profile
+        self.known_profiles = known_profiles or {}
+        self.commands_from_cache = False
+        self.matched_last_profile = False
+        super().__init__(portstr, baudrate=profile.get('baudrate'), protocol=profile.get('protocol'),
+                         fast=False, timeout=timeout)
+
+    def _OBD__connect(self, portstr, baudrate, protocol, check_voltage, start_low_power):
+        self.interface = FastELM327(portstr, baudrate, protocol, self.timeout,
+                                    check_voltage, start_low_power)
+        if self.interface.status() == OBDStatus.NOT_CONNECTED:
+            self.close()
+
+    def _OBD__load_commands(self):
+        if self.status() != OBDStatus.CAR_CONNECTED:
+            return
+
+        pids_a = read_pids_a_signature(self)
+        profile = self.profile if pids_a == self.profile.get('pids_a') else self.known_profiles.get(pids_a)
+
+        if pids_a and profile and profile.get('commands'):
+            for name in profile['commands']:
+                if obd.commands.has_name(name):
+                    self.supported_commands.add(obd.commands[name])
+            self.commands_from_cache = True
+            self.matched_last_profile = profile is self.profile
+            return
+
+        print("[OBD-FAST] Vehículo distinto al del perfil guardado: enumerando comandos")
+        obd.OBD._OBD__load_commands(self)
+
+
+def read_pids_a_signature(connection) -> Optional[str]:
+    """
+    Bitmap 0100 como cadena de bits; identifica el vehículo sin leer el VIN
+
+    Returns:
+        Cadena '0101...' o None si la ECU no responde
+    """
+    try:
+        response = obd.OBD.query(connection, obd.commands.PIDS_A)
+        if response.is_null():
+            return None
+        return ''.join('1' if bit else '0' for bit in response.value)
+    except Exception:
+        return None
+
+
+def get_connection_baudrate(connection) -> Optional[int]:
+    """Baudrate con el que quedó abierto el puerto serie (None si no aplica)"""
+    port = getattr(connection.interface, '_ELM327__port', None)
+    baudrate = getattr(port, 'baudrate', None)
+    return int(baudrate) if baudrate else None
+
+
+# =============================================================================
+# CACHÉ DE PERFILES DE CONEXIÓN
+# =============================================================================
+
+class ConnectionProfileCache:
+    """
+    Perfiles de conexión persistidos en JSON
+
+    Estructura: {puerto: {'last': pids_a, 'profiles': {pids_a: perfil}}}.
+    Cada adaptador guarda un perfil por vehículo (identificado por su bitmap
+    0100) y recuerda el último usado, que es el que se prueba primero.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Ruta del fichero JSON
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[OBD-FAST] ⚠️ Caché de conexión ilegible, se ignora: {e}")
+
+    def get(self, port: str) -> Tuple[Optional[Dict], Dict]:
+        """
+        Perfil a probar para un puerto y el resto de perfiles conocidos
+
+        Returns:
+            (último perfil o None, dict {pids_a: perfil})
+        """
+        with self._lock:
+            entry = self._data.get(port) or {}
+            profiles = entry.get('profiles', {})
+            return profiles.get(entry.get('last')), dict(profiles)
+
+    def save(self, port: str, connection):
+        """Guarda el perfil de una conexión que acaba de establecerse"""
+        pids_a = read_pids_a_signature(connection)
+        if not pids_a:
+            return
+
+        profile = {
+            'protocol': connection.protocol_id(),
+            'protocol_name': connection.protocol_name(),
+            'baudrate': get_connection_baudrate(connection),
+            'pids_a': pids_a,
+            'commands': sorted(cmd.name for cmd in connection.supported_commands),
+            'updated_at': datetime.now().isoformat()
+        }
+
+        with self._lock:
+            entry = self._data.setdefault(port, {'profiles': {}})
+            entry['profiles'][pids_a] = profile
+            entry['last'] = pids_a
+            self._write()
+
+    def _write(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+# =============================================================================
+# CONEXIÓN
+# =============================================================================
+
+def connect_obd(port: str, cache: Optional[ConnectionProfileCache], timeout: float = 10):
+    """
+    Conecta con el adaptador probando primero el perfil guardado
+
+    Args:
+        port: Puerto del adaptador
+        cache: Caché de perfiles (None = siempre autodetección completa)
+        timeout: Timeout de lectura de python-obd
+
+    Returns:
+        (conexión, modo 'fast' o 'full', segundos empleados)
+    """
+    start = time.time()
+    profile, known = cache.get(port) if cache else (None, {})
+
+    if profile:
+        try:
+            connection = FastConnectOBD(port, profile, known, timeout=timeout)
+            if connection.is_connected():
+                elapsed = time.time() - start
+                source = 'caché' if connection.commands_from_cache else 'enumerados'
+                print(f"[OBD-FAST] ✓ Conexión rápida en {elapsed:.2f}s "
+                      f"(protocolo {profile.get('protocol')}, comandos {source})")
+                if not connection.matched_last_profile:
+                    cache.save(port, connection)
+                return connection, 'fast', elapsed
+            connection.close()
+        except Exception as e:
+            print(f"[OBD-FAST] ⚠️ Error en conexión rápida: {e}")
+
+        # El perfil se conserva: si el coche estaba apagado seguirá siendo válido;
+        # si la autodetección encuentra otro protocolo lo sustituye
+        print("[OBD-FAST] Conexión rápida fallida, autodetección completa")
+
+    connection = obd.OBD(port, baudrate=None, fast=False, timeout=timeout)
+    if cache and connection.is_connected():
+        cache.save(port, connection)
+    return connection, 'full', time.time() - start
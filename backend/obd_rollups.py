@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - AGREGADOS PRECALCULADOS (ROLLUPS) DE SEÑALES OBD
+# count/sum/min/max por vehículo, señal y cubo de 1 s, 1 min y 1 h,
+# actualizados al guardar muestras y usados por los gráficos de analytics
+# =============================================================================
+
+import calendar
+import math
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Señales con agregados (latitud/longitud no tienen media útil)
+ROLLUP_SIGNALS = ('rpm', 'speed', 'coolant_temp', 'intake_temp', 'maf', 'engine_load',
+                  'throttle_pos', 'fuel_pressure')
+RESOLUTIONS = (1, 60, 3600)  # Segundos por cubo
+DEFAULT_MAX_POINTS = 500
+
+# Los cubos se suman: re-guardar una muestra la contaría dos veces, por eso
+# replay_obd_samples() descarta antes las ya guardadas
+ROLLUP_UPSERT = '''
+    INSERT INTO obd_rollups (
+        vehicle_id, signal, resolution, bucket, count, sum_value, min_value, max_value
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (vehicle_id, signal, resolution, bucket) DO UPDATE SET
+        count = count + excluded.count,
+        sum_value = sum_value + excluded.sum_value,
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value)
+'''
+
+
+# =============================================================================
+# CUBOS
+# =============================================================================
+
+def bucket_epoch(value) -> Optional[int]:
+    """
+    Segundo de reloj de un timestamp de obd_data (igual que strftime('%s') de SQLite)
+
+    Los timestamps sin zona se toman tal cual (hora local de pared, sin
+    saltos por horario de verano), así el relleno en SQL y la ingesta en
+    Python caen en los mismos cubos.
+
+    Args:
+        value: Texto ISO o número unix
+
+    Returns:
+        Segundos, o None si el timestamp no es válido
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        dt = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    return calendar.timegm(dt.utctimetuple() if dt.tzinfo else dt.timetuple())
+
+
+def format_bucket(bucket: int) -> str:
+    """Segundos de reloj a texto ISO (inversa de bucket_epoch())"""
+    return datetime.fromtimestamp(bucket, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def aggregate_samples(samples: Iterable[Tuple[int, Dict]],
+                      resolutions: Tuple[int, ...] = RESOLUTIONS) -> List[Tuple]:
+    """
+    Agrega muestras en cubos
+
+    Args:
+        samples: Lista de (clave, punto); la clave (trip_id o vehicle_id)
+            encabeza cada fila resultante
+        resolutions: Resoluciones a calcular
+
+    Returns:
+        Filas (clave, signal, resolution, bucket, count, sum, min, max)
+        con el orden de ROLLUP_UPSERT
+    """
+    cells = {}
+    for key, point in samples:
+        second = bucket_epoch(point.get('timestamp'))
+        if second is None:
+            continue
+        for signal in ROLLUP_SIGNALS:
+            value = point.get(signal)
+            if value is None or isinstance(value, bool):
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if value != value:
+                continue
+            for resolution in resolutions:
+                cell = cells.get((key, signal, resolution, second - second % resolution))
+                if cell is None:
+                    cells[(key, signal, resolution, second - second % resolution)] = [1, value, value, value]
+                else:
+                    cell[0] += 1
+                    cell[1] += value
+                    if value < cell[2]:
+                        cell[2] = value
+                    if value > cell[3]:
+                        cell[3] = value
+    return [key + tuple(cell) for key, cell in cells.items()]
+
+
+# =============================================================================
+# ELECCIÓN DE RESOLUCIÓN
+# =============================================================================
+
+def choose_resolution(start: int, end: int, max_points: int = DEFAULT_MAX_POINTS) -> Tuple[int, int]:
+    """
+    Resolución a leer y ancho de cubo a devolver para un rango y un presupuesto de puntos
+
+    Se lee la resolución más gruesa que no supera el ancho necesario
+    (rango / max_points) y sus cubos se reagrupan a ese ancho, así la
+    consulta recorre el mínimo de filas y devuelve como mucho ~max_points
+    puntos por señal.
+
+    Args:
+        start: Inicio del rango (segundos de reloj)
+        end: Fin del rango (segundos de reloj)
+        max_points: Puntos máximos por señal
+
+    Returns:
+        (resolución almacenada, segundos por punto devuelto)
+    """
+    width = max(1, math.ceil((end - start + 1) / max(1, max_points)))
+    resolution = max(r for r in RESOLUTIONS if r <= width)
+    return resolution, math.ceil(width / resolution) * resolution
+
+
+def aligned_resolution(start: int, end: int) -> int:
+    """Resolución más gruesa cuyos cubos encajan exactamente en [start, end]"""
+    for resolution in reversed(RESOLUTIONS):
+        if start % resolution == 0 and (end + 1) % resolution == 0:
+            return resolution
+    return RESOLUTIONS[0]
+
+
+if __name__ == "__main__":
+    # Gráfico de un mes: obd_data fila a fila frente a rollups
+    import os
+    import random
+    import tempfile
+    import time
+    from datetime import timedelta
+    from database import DatabaseManager
+
+    db = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    vehicle_id = db.create_vehicle(None, 'VW', 'Golf', 2018, 'gasoline', 'manual')
+    start = datetime(2026, 9, 1, 8, 0, 0)
+    for day in range(30):
+        trip_id = db.start_trip(vehicle_id)
+        rpm = 800.0
+        points = []
+        for i in range(18000):  # 1 h a 5 Hz
+            rpm = max(700.0, min(5000.0, rpm + random.gauss(0, 40)))
+            points.append({'timestamp': (start + timedelta(days=day, seconds=i * 0.2)).isoformat(),
+                           'rpm': round(rpm), 'speed': round(rpm / 40, 1), 'coolant_temp': 90})
+        db.save_obd_data_batch(trip_id, points)
+        db.end_trip(trip_id)
+
+    range_start = start.isoformat()
+    range_end = (start + timedelta(days=30)).isoformat()
+
+    def raw():
+        with db.connection() as conn:
+            return conn.execute('''
+                SELECT o.timestamp, o.speed FROM obd_data o JOIN trips t ON t.id = o.trip_id
+                WHERE t.vehicle_id = ? AND o.timestamp BETWEEN ? AND ?
+            ''', (vehicle_id, range_start, range_end)).fetchall()
+
+    def rollup():
+        return db.get_rollup_series(vehicle_id, ['speed'], range_start, range_end, DEFAULT_MAX_POINTS)
+
+    for name, fn in (('obd_data', raw), ('rollups', rollup)):
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(5):
+            result = fn()
+        print(f"{name:10s} {(time.perf_counter() - t0) / 5 * 1000:8.1f} ms")
+    print(f"resolución {result['resolution']}s, {result['bucket_seconds']}s por punto, "
+          f"{len(result['series']['speed']['timestamps'])} puntos")
+
+    t0 = time.perf_counter()
+    db.backfill_rollups()
+    print(f"backfill completo {time.perf_counter() - t0:.2f}s")
+    db.close()
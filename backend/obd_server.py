@@ -3,7 +3,7 @@
 # SENTINEL PRO - MANTENIMIENTO PREDICTIVO v9.0 - SERVIDOR COMPLETO
 # Copia y pega TODO este archivo como obd_server.py
 # -----------------------------------------------------------------------------
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request, send_file, Response, stream_with_context
 from flask_cors import CORS
 import obd
 import time
@@ -13,10 +13,30 @@ import os
 import traceback
 import re
 import csv
+import threading
+import atexit
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 import statistics
 from csv_importer import CSVImporter
+from obd_acquisition import OBDAcquisitionWorker
+from obd_batch import MultiPIDReader
+from pid_scheduler import PIDScheduler
+from pid_stats import PIDStatsTracker
+from acquisition_metrics import AcquisitionMetrics
+from pid_discovery import PIDDiscovery, read_vin
+from fast_decode import query_value
+from elm327_emulator import create_emulator
+from obd_fast_connect import ConnectionProfileCache, connect_obd as fast_connect_obd
+from obd_command_queue import AdapterCommandQueue, PRIORITY_LIVE, PRIORITY_SCAN
+from telemetry_codec import TelemetryDeltaEncoder
+from trip_buffer import ColumnarTripBuffer
+from trip_persistence import TripSampleWriter
+from trip_journal import TripJournal
+from obd_chunks import series_to_json
+from health_engine import StreamingHealthEngine
+from trip_stats import TripAggregator
+from csv_logger import RotatingCSVLogger
 
 # Imports opcionales
 try:
@@ -47,6 +67,14 @@ except ImportError:
         PDF_AVAILABLE = False
         print("[PDF] ⚠️ No disponible")
 
+# WebSocket - Opcional para el feed binario de telemetría (pantallas de flota)
+try:
+    from flask_sock import Sock
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+    print("[WS] ⚠️ flask-sock no disponible - Feed binario /api/obd/ws desactivado (SSE sigue activo)")
+
 # === OBDb Integration ===
 try:
     from obdb_parser import OBDbParser
@@ -60,6 +88,13 @@ except ImportError as e:
 
 # ----- CONFIGURACIÓN OBLIGATORIA -----
 OBD_PORT = "COM6"  # CAMBIA ESTO A TU PUERTO
+# Emulador ELM327 para pruebas sin coche: 'socket' o 'pty' (None = adaptador real)
+OBD_EMULATOR = os.environ.get('SENTINEL_OBD_EMULATOR')
+# Reproducción en el emulador: ruta a un CSV o 'trip:<id>' (None = señales sintéticas)
+OBD_EMULATOR_REPLAY = os.environ.get('SENTINEL_OBD_EMULATOR_REPLAY')
+OBD_EMULATOR_LATENCY = float(os.environ.get('SENTINEL_OBD_EMULATOR_LATENCY', '0.03'))
+OBD_EMULATOR_NO_DATA_RATE = float(os.environ.get('SENTINEL_OBD_EMULATOR_NO_DATA_RATE', '0.0'))
+OBD_EMULATOR_DROPOUT_RATE = float(os.environ.get('SENTINEL_OBD_EMULATOR_DROPOUT_RATE', '0.0'))
 GEMINI_API_KEY = "TU_GEMINI_API_KEY"  # TU API KEY
 GEMINI_MODEL_NAME = "models/gemini-pro-latest"
 # -------------------------------------
@@ -69,9 +104,20 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Direct
 CSV_FOLDER = os.path.join(BASE_DIR, 'csv_data')
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploaded_csv')
 ALLOWED_EXTENSIONS = {'csv'}
-CSV_FILENAME = os.path.join(CSV_FOLDER, 'obd_readings.csv')
+CSV_FLUSH_INTERVAL = 2.0  # Segundos entre escrituras del CSV de lecturas
+CSV_SEGMENT_MAX_BYTES = 20 * 1024 * 1024  # Rotación por tamaño (además de por viaje)
+CSV_COMPRESSION = 'auto'  # Segmentos cerrados: 'auto' (zstd si está instalado, si no gzip), 'gzip' o None
+# Historiales antiguos en JSON: se importan una vez a la BD (tablas health_history/trip_summaries)
 HEALTH_HISTORY_FILE = os.path.join(BASE_DIR, 'health_history.json')
 TRIP_HISTORY_FILE = os.path.join(BASE_DIR, 'historial_viajes.json')
+HISTORY_MAX_AGE_DAYS = 365  # Retención del historial de salud y de resúmenes de viaje
+HISTORY_MAX_ROWS = 5000  # Registros máximos por vehículo
+HISTORY_PRUNE_EVERY = 100  # La retención se aplica cada N inserciones (coste amortizado)
+OBD_CONNECTION_CACHE_FILE = os.path.join(BASE_DIR, 'obd_connection_cache.json')
+TRIP_SPILL_FOLDER = os.path.join(BASE_DIR, 'trip_spill')  # Bloques antiguos del viaje en curso
+TRIP_JOURNAL_FOLDER = os.path.join(BASE_DIR, 'trip_journal')  # Diario write-ahead de muestras del viaje
+# Reconexión rápida con el protocolo/baudrate/comandos de la última conexión
+OBD_FAST_CONNECT = True
 
 os.makedirs(CSV_FOLDER, exist_ok=True)
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -80,6 +126,7 @@ app = Flask(__name__)
 CORS(app)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+sock = Sock(app) if WEBSOCKET_AVAILABLE else None
 
 # Variables globales
 connection = None
@@ -88,12 +135,29 @@ last_connection_attempt_time = 0
 last_thermal_reading_time = 0
 RECONNECTION_COOLDOWN = 10
 THERMAL_READING_INTERVAL = 60
-
-# Variable global para control de frecuencias en lectura optimizada
-# IMPORTANTE: Debe inicializarse aquí para evitar NameError en get_live_data
-obd_last_readings = None
+ACQUISITION_INTERVAL = 0.2  # Ciclo del hilo de adquisición (200ms = PIDs críticos)
+ADAPTER_DRAIN_TIMEOUT = 10  # Espera máxima a la cola del adaptador antes de desconectar (s)
+STREAM_KEEPALIVE_INTERVAL = 15  # Comentario SSE para mantener viva la conexión (s)
+STREAM_OFFLINE_INTERVAL = 3  # Cada cuánto se repite el estado offline en el stream (s)
+STREAM_MAX_CLIENTS = 20  # Cada cliente SSE/WebSocket ocupa un hilo del servidor
+STREAM_KEYFRAME_INTERVAL = 10  # Segundos máximos entre keyframes del feed binario
+ACQUISITION_HISTORY_SIZE = 300  # ~60s de snapshots a 5 Hz
+TRIP_BUFFER_WINDOW_POINTS = 18000  # Puntos del viaje en memoria (~1h a 5 Hz); el resto va a disco
+TRIP_BUFFER_CHUNK_POINTS = 1500  # Puntos por bloque volcado (~5 min a 5 Hz)
+TRIP_PERSIST_BATCH_SIZE = 50  # Muestras por transacción en obd_data (~10s a 5 Hz)
+TRIP_PERSIST_FLUSH_INTERVAL = 2.0  # Segundos máximos que una muestra espera para ir a la BD
+DB_STORAGE_PROFILE = os.environ.get('SENTINEL_DB_PROFILE', 'wal')  # 'wal', 'wal_durable' o 'legacy' (ver db_pool.STORAGE_PROFILES)
+DB_WRITER_MAX_BATCH = 256  # Escrituras máximas por transacción del escritor único
+DB_WRITER_MAX_LATENCY = 0.0  # Espera extra para agrupar (0 = se agrupa lo que llega durante el commit anterior)
+DB_CHECKPOINT_INTERVAL = 30.0  # Segundos entre checkpoints PASSIVE del WAL
+DB_WAL_TRUNCATE_BYTES = 64 * 1024 * 1024  # Tamaño del -wal que fuerza un checkpoint TRUNCATE
+ANALYTICS_MAX_POINTS = 500  # Puntos máximos por señal en gráficos de analytics (elige la resolución de los rollups)
+ANALYTICS_TIMELINE_SIGNALS = ["speed", "rpm", "coolant_temp", "engine_load"]  # Señales del gráfico temporal de analytics
+TRIP_JOURNAL_FSYNC_INTERVAL = 1.0  # Pérdida máxima ante un corte de corriente (s); una caída del proceso no pierde nada
 
 trip_data = {}
+trip_lock = threading.Lock()  # trip_data se modifica desde el hilo de adquisición
+health_engine = StreamingHealthEngine()  # Acumuladores de salud del viaje en curso
 maintenanceHistory = []
 
 # Variables globales OBDb
@@ -178,6 +242,27 @@ WORKING_PIDS = {
 available_pids = []
 current_vehicle_pids_profile = {}
 
+# Instrumentación: latencias por PID, reintentos/NO DATA y jitter por tier
+acquisition_metrics = AcquisitionMetrics(cycle_interval=ACQUISITION_INTERVAL)
+
+# Cola única de acceso al adaptador: toda consulta OBD pasa por aquí con su prioridad
+adapter_queue = AdapterCommandQueue()
+
+# Lector multi-PID (peticiones Mode 01 agrupadas en CAN, fallback individual)
+multi_pid_reader = MultiPIDReader()
+
+# Planificador por deadline: WORKING_PIDS define periodo/prioridad inicial por tier
+EXTRA_PID_PERIOD = 5.0  # PIDs adicionales del escaneo (prioridad más baja)
+pid_scheduler = PIDScheduler(cycle_interval=ACQUISITION_INTERVAL)
+pid_scheduler.add_tiers(WORKING_PIDS)
+
+# Fiabilidad por PID del vehículo actual (backoff, cuarentena, lista negra)
+pid_stats = PIDStatsTracker()
+
+# Descubrimiento por bitmaps "PIDs supported" y caché de perfiles sin vehículo en BD
+pid_discovery = PIDDiscovery()
+pid_profiles_by_vin = {}
+
 # Inicialización Gemini
 model = None
 if GEMINI_AVAILABLE:
@@ -193,70 +278,31 @@ else:
     print("[GEMINI] ⚠️ Módulo no disponible - Funcionalidad de IA deshabilitada")
 
 # === FUNCIONES CSV ===
-def initialize_csv():
-    if not os.path.exists(CSV_FILENAME):
-        with open(CSV_FILENAME, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            # Encabezados para los 21 PIDs confirmados
-            writer.writerow([
-                'timestamp', 'date', 'time',
-                # PIDs críticos (fast)
-                'rpm', 'speed_kmh', 'throttle_pos', 'engine_load', 'maf', 'intake_pressure',
-                # PIDs importantes (medium)
-                'coolant_temp', 'intake_temp', 'control_module_voltage',
-                'fuel_rail_pressure_direct', 'barometric_pressure',
-                'relative_throttle_pos', 'ambiant_air_temp',
-                # PIDs informativos (slow)
-                'accelerator_pos_d', 'accelerator_pos_e', 'run_time',
-                'distance_w_mil', 'distance_since_dtc_clear',
-                # Calculados
-                'distance_km'
-            ])
-        print(f"[CSV] ✓ Archivo creado con 21 PIDs confirmados + distancia")
-
-def save_reading_to_csv(data, thermal_data=None):
-    """
-    Guarda una lectura OBD en el CSV con todos los 21 PIDs confirmados
+# Columnas del CSV de lecturas (tras timestamp, date y time): los 21 PIDs confirmados + distancia
+CSV_COLUMNS = [
+    # PIDs críticos (fast)
+    ('rpm', 'RPM'), ('speed_kmh', 'SPEED'), ('throttle_pos', 'THROTTLE_POS'),
+    ('engine_load', 'ENGINE_LOAD'), ('maf', 'MAF'), ('intake_pressure', 'INTAKE_PRESSURE'),
+    # PIDs importantes (medium)
+    ('coolant_temp', 'COOLANT_TEMP'), ('intake_temp', 'INTAKE_TEMP'),
+    ('control_module_voltage', 'CONTROL_MODULE_VOLTAGE'),
+    ('fuel_rail_pressure_direct', 'FUEL_RAIL_PRESSURE_DIRECT'),  # ¡Importante para diesel!
+    ('barometric_pressure', 'BAROMETRIC_PRESSURE'),
+    ('relative_throttle_pos', 'RELATIVE_THROTTLE_POS'), ('ambiant_air_temp', 'AMBIANT_AIR_TEMP'),
+    # PIDs informativos (slow)
+    ('accelerator_pos_d', 'ACCELERATOR_POS_D'), ('accelerator_pos_e', 'ACCELERATOR_POS_E'),
+    ('run_time', 'RUN_TIME'), ('distance_w_mil', 'DISTANCE_W_MIL'),
+    ('distance_since_dtc_clear', 'DISTANCE_SINCE_DTC_CLEAR'),
+    # Calculados
+    ('distance_km', 'total_distance')
+]
 
-    Args:
-        data: Dict con los datos OBD leídos
-        thermal_data: Deprecated, ya no se usa (los datos térmicos están en data)
-    """
-    try:
-        now = datetime.now()
-        with open(CSV_FILENAME, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                # Timestamp
-                now.isoformat(),
-                now.strftime('%Y-%m-%d'),
-                now.strftime('%H:%M:%S'),
-                # PIDs críticos (fast)
-                data.get('RPM', ''),
-                data.get('SPEED', ''),
-                data.get('THROTTLE_POS', ''),
-                data.get('ENGINE_LOAD', ''),
-                data.get('MAF', ''),
-                data.get('INTAKE_PRESSURE', ''),
-                # PIDs importantes (medium)
-                data.get('COOLANT_TEMP', ''),
-                data.get('INTAKE_TEMP', ''),
-                data.get('CONTROL_MODULE_VOLTAGE', ''),
-                data.get('FUEL_RAIL_PRESSURE_DIRECT', ''),  # ¡Importante para diesel!
-                data.get('BAROMETRIC_PRESSURE', ''),
-                data.get('RELATIVE_THROTTLE_POS', ''),
-                data.get('AMBIANT_AIR_TEMP', ''),
-                # PIDs informativos (slow)
-                data.get('ACCELERATOR_POS_D', ''),
-                data.get('ACCELERATOR_POS_E', ''),
-                data.get('RUN_TIME', ''),
-                data.get('DISTANCE_W_MIL', ''),
-                data.get('DISTANCE_SINCE_DTC_CLEAR', ''),
-                # Calculados
-                data.get('total_distance', '')
-            ])
-    except Exception as e:
-        print(f"[CSV] Error guardando: {e}")
+# Las lecturas se acumulan en memoria y se escriben cada CSV_FLUSH_INTERVAL
+# en segmentos que rotan por viaje/tamaño y se comprimen al cerrarse
+csv_logger = RotatingCSVLogger(CSV_FOLDER, CSV_COLUMNS,
+                               flush_interval=CSV_FLUSH_INTERVAL,
+                               max_bytes=CSV_SEGMENT_MAX_BYTES,
+                               compression=CSV_COMPRESSION)
 
 def read_csv_file(filepath):
     try:
@@ -270,13 +316,6 @@ def read_csv_file(filepath):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# === CÁLCULO MEJORADO DE DISTANCIA ===
-def calculate_distance(speed_kmh, time_delta_s):
-    if speed_kmh and speed_kmh > 0 and time_delta_s > 0:
-        distance_km = (speed_kmh / 3600) * time_delta_s
-        return distance_km
-    return 0
-
 # =============================================================================
 # LECTURA OBD OPTIMIZADA - MÉTODO QUE SÍ FUNCIONA
 # =============================================================================
@@ -287,7 +326,9 @@ def read_pid_with_retries(connection, pid_name, max_attempts=3):
     """
     Lee un PID con múltiples reintentos
 
-    Método extraído de servidor.py que SÍ funciona en VW Touran 2.0 TDI
+    Método extraído de servidor.py que SÍ funciona en VW Touran 2.0 TDI.
+    Los PIDs en backoff, cuarentena o lista negra no se consultan, y los que
+    vienen fallando se intentan una sola vez (ver PIDStatsTracker).
 
     Args:
         connection: Conexión OBD
@@ -300,88 +341,123 @@ def read_pid_with_retries(connection, pid_name, max_attempts=3):
     if not hasattr(obd.commands, pid_name):
         return None
 
+    if not pid_stats.should_read(pid_name):
+        return None
+
     try:
         cmd = getattr(obd.commands, pid_name)
+        attempts = pid_stats.max_attempts(pid_name, max_attempts)
+        start = time.time()
+        result = None
 
         # Intentar varias veces (CRÍTICO para que funcione)
-        for attempt in range(max_attempts):
+        for attempt in range(attempts):
+            query_start = time.time()
             try:
-                response = connection.query(cmd)
+                # Decoder por tabla (sin pint) para los PIDs habituales;
+                # el resto usa python-obd y toma .magnitude
+                value = query_value(connection, cmd)
+                acquisition_metrics.record_query(pid_name, time.time() - query_start,
+                                                 'ok' if value is not None else 'no_data', attempt)
 
-                # Verificación correcta (igual que servidor.py)
-                if response and response.value is not None:
-                    value = response.value
-
-                    # Extraer valor correctamente
-                    if hasattr(value, 'magnitude'):
-                        return value.magnitude
-                    else:
-                        return value
+                if value is not None:
+                    result = value
+                    break
 
             except Exception:
-                pass  # Silenciar errores intermedios
+                acquisition_metrics.record_query(pid_name, time.time() - query_start, 'error', attempt)
 
-            # Pausa entre intentos (da tiempo a la ECU)
-            time.sleep(0.1)
+            # Pausa entre intentos (da tiempo a la ECU); no tras el último
+            if attempt < attempts - 1:
+                time.sleep(0.1)
 
-        return None
+        pid_stats.record(pid_name, result is not None, time.time() - start)
+        return result
 
     except Exception:
         return None
 
 
-def read_obd_data_optimized(connection, last_readings=None):
+def read_pids_batched(connection, pid_names, max_attempts=2):
     """
-    Lee PIDs con frecuencias diferentes según importancia
+    Lee un grupo de PIDs con peticiones Mode 01 multi-PID (hasta 6 por petición)
 
-    - Fast: cada 200ms (datos críticos)
-    - Medium: cada 1s (datos importantes)
-    - Slow: cada 5s (datos informativos)
+    En CAN cada grupo cuesta un único round-trip al adaptador. Si la ECU
+    rechaza los grupos, o el protocolo no es CAN, se usa read_pid_with_retries()
+    para cada PID.
 
     Args:
         connection: Conexión OBD
-        last_readings: Dict con timestamps de últimas lecturas
+        pid_names: Lista de nombres de PIDs
+        max_attempts: Intentos por PID en el fallback individual
 
     Returns:
-        tuple: (data, last_readings)
-            - data: Dict con PIDs leídos
-            - last_readings: Dict actualizado con timestamps
-    """
-    if last_readings is None:
-        last_readings = {
-            'fast': datetime.min,
-            'medium': datetime.min,
-            'slow': datetime.min,
-        }
+        Dict {pid_name: valor} con los PIDs leídos
+    """
+    pid_names = pid_stats.filter_readable(pid_names)
+    if not pid_names:
+        return {}
 
-    data = {}
-    now = datetime.now()
+    # read_pid_with_retries() registra sus propias estadísticas
+    single_reads = set()
 
-    # PIDs rápidos (cada 200ms) - 2 intentos para velocidad
-    if (now - last_readings['fast']).total_seconds() >= 0.2:
-        for pid in WORKING_PIDS['fast']:
-            value = read_pid_with_retries(connection, pid, max_attempts=2)
-            if value is not None:
-                data[pid] = value
-        last_readings['fast'] = now
+    def read_single(pid_name):
+        single_reads.add(pid_name)
+        return read_pid_with_retries(connection, pid_name, max_attempts=max_attempts)
 
-    # PIDs medios (cada 1s) - 3 intentos para fiabilidad
-    if (now - last_readings['medium']).total_seconds() >= 1.0:
-        for pid in WORKING_PIDS['medium']:
-            value = read_pid_with_retries(connection, pid, max_attempts=3)
-            if value is not None:
-                data[pid] = value
-        last_readings['medium'] = now
+    start = time.time()
+    data = multi_pid_reader.read_pids(connection, pid_names, read_single)
 
-    # PIDs lentos (cada 5s) - 3 intentos
-    if (now - last_readings['slow']).total_seconds() >= 5.0:
-        for pid in WORKING_PIDS['slow']:
-            value = read_pid_with_retries(connection, pid, max_attempts=3)
-            if value is not None:
-                data[pid] = value
-        last_readings['slow'] = now
+    batched = [pid_name for pid_name in data if pid_name not in single_reads]
+    if batched:
+        # Latencia aproximada: reparto del tiempo total entre los PIDs pedidos
+        elapsed = time.time() - start
+        share = elapsed / len(pid_names)
+        for pid_name in batched:
+            pid_stats.record(pid_name, True, share)
+        acquisition_metrics.record_batch(batched, share * len(batched))
 
-    return data, last_readings
+    return data
+
+
+def read_obd_data_scheduled(connection, scheduler):
+    """
+    Lee los PIDs que el planificador considera vencidos en este ciclo
+
+    Sustituye a los tiers fijos (200ms / 1s / 5s): cada PID tiene su propio
+    periodo y prioridad, se leen por orden de deadline y los lentos se
+    reparten en los huecos libres en lugar de leerse todos a la vez.
+
+    Args:
+        connection: Conexión OBD
+        scheduler: Instancia de PIDScheduler
+
+    Returns:
+        Dict con los PIDs leídos en este ciclo
+    """
+    now = time.time()
+    pids_due = []
+    for pid_name in scheduler.next_batch(now):
+        if pid_stats.should_read(pid_name, now):
+            pids_due.append(pid_name)
+        else:
+            # En backoff/cuarentena: no ocupar hueco hasta que toque reintentar
+            scheduler.postpone(pid_name, pid_stats.retry_at(pid_name))
+
+    if not pids_due:
+        return {}
+
+    cycle_start = time.time()
+    data = read_pids_batched(connection, pids_due, max_attempts=2)
+    now = time.time()
+    scheduler.record_cycle(pids_due, data.keys(), now - cycle_start, now)
+
+    for pid_name in data:
+        target = scheduler.get_target(pid_name)
+        if target:
+            acquisition_metrics.record_sample(pid_name, target[0] or 'extra', target[1], now)
+
+    return data
 
 
 def get_current_obd_reading(connection):
@@ -406,101 +482,21 @@ def get_current_obd_reading(connection):
     return data
 
 # === ANÁLISIS DE SALUD DEL VEHÍCULO ===
-def analyze_vehicle_health(trip_points):
+def analyze_vehicle_health():
+    """
+    Actualiza vehicle_health con los acumuladores del viaje en curso
+
+    El motor incremental se alimenta muestra a muestra en
+    process_live_sample(), así que evaluar no recorre los puntos del viaje.
+    """
     global vehicle_health
     
-    if not trip_points or len(trip_points) < 10:
-        return vehicle_health
-    
     try:
-        rpms = [p.get('RPM', 0) for p in trip_points if p.get('RPM') and p.get('RPM') > 0]
-        throttles = [p.get('THROTTLE_POS', 0) for p in trip_points if p.get('THROTTLE_POS') is not None]
-        loads = [p.get('ENGINE_LOAD', 0) for p in trip_points if p.get('ENGINE_LOAD') is not None]
-        mafs = [p.get('MAF', 0) for p in trip_points if p.get('MAF') and p.get('MAF') > 0]
-        temps_coolant = [p.get('COOLANT_TEMP', 0) for p in trip_points if p.get('COOLANT_TEMP') and p.get('COOLANT_TEMP') > 0]
-        temps_intake = [p.get('INTAKE_TEMP', 0) for p in trip_points if p.get('INTAKE_TEMP') and p.get('INTAKE_TEMP') > 0]
-        
-        warnings = []
-        predictions = []
-        
-        # 1. SALUD DEL MOTOR
-        engine_health = 100
-        if rpms:
-            rpm_avg = statistics.mean(rpms)
-            rpm_max = max(rpms)
-            
-            high_rpm_count = sum(1 for r in rpms if r > 4000)
-            high_rpm_ratio = high_rpm_count / len(rpms)
-            
-            if high_rpm_ratio > 0.3:
-                engine_health -= 20
-                warnings.append("⚠️ Uso frecuente de RPM altas (>4000). Aumenta desgaste del motor.")
-                predictions.append("Riesgo medio de desgaste prematuro de componentes en 12-18 meses")
-            
-            if rpm_max > 6000:
-                engine_health -= 15
-                warnings.append("🔴 RPM CRÍTICAS detectadas (>6000). Revisar limitador.")
-        
-        if loads:
-            load_avg = statistics.mean(loads)
-            if load_avg > 80:
-                engine_health -= 10
-                warnings.append("⚠️ Carga motor alta (>80%). Revisar admisión.")
-        
-        # 2. SALUD TÉRMICA
-        thermal_health = 100
-        if temps_coolant:
-            temp_max = max(temps_coolant)
-            temp_avg = statistics.mean(temps_coolant)
-            
-            if temp_max > 105:
-                thermal_health -= 30
-                warnings.append("🔴 CRÍTICO: Temperatura >105°C. Revisar sistema URGENTE.")
-                predictions.append("Riesgo ALTO de fallo en junta culata o radiador en 1-3 meses")
-            elif temp_avg > 95:
-                thermal_health -= 15
-                warnings.append("⚠️ Temperatura elevada. Revisar termostato y radiador.")
-                predictions.append("Riesgo medio de sobrecalentamiento. Mantenimiento en 3-6 meses")
-        
-        if temps_intake:
-            temp_intake_avg = statistics.mean(temps_intake)
-            if temp_intake_avg > 50:
-                thermal_health -= 10
-                warnings.append("⚠️ Temperatura admisión alta. Revisar intercooler.")
-        
-        # 3. EFICIENCIA
-        efficiency_health = 100
-        if mafs:
-            maf_avg = statistics.mean(mafs)
-            if maf_avg < 10 or maf_avg > 80:
-                efficiency_health -= 15
-                warnings.append("⚠️ Flujo aire anómalo. Revisar MAF y filtro.")
-                predictions.append("Posible obstrucción en admisión. Reducción eficiencia 5-10%")
-        
-        if throttles and len(throttles) > 1:
-            harsh_accel = 0
-            for i in range(1, len(throttles)):
-                if throttles[i] - throttles[i-1] > 30:
-                    harsh_accel += 1
-            
-            harsh_ratio = harsh_accel / len(throttles)
-            if harsh_ratio > 0.05:
-                efficiency_health -= 10
-                warnings.append("⚠️ Conducción agresiva. Aumenta consumo y desgaste.")
-        
-        # PUNTUACIÓN GLOBAL
-        overall_score = round((engine_health + thermal_health + efficiency_health) / 3)
-        
-        vehicle_health = {
-            "overall_score": overall_score,
-            "engine_health": round(engine_health),
-            "thermal_health": round(thermal_health),
-            "efficiency_health": round(efficiency_health),
-            "warnings": warnings,
-            "predictions": predictions,
-            "last_update": datetime.now().isoformat()
-        }
+        health = health_engine.evaluate()
+        if health is None:
+            return vehicle_health
         
+        vehicle_health = health
         save_health_history(vehicle_health)
         return vehicle_health
         
@@ -508,39 +504,111 @@ def analyze_vehicle_health(trip_points):
         print(f"[HEALTH] Error en análisis: {e}")
         return vehicle_health
 
+history_inserts = {'health_history': 0, 'trip_summaries': 0}  # Inserciones por tabla desde la última retención
+
+def report_history_prune(table):
+    """Callback de la retención asíncrona de una tabla de historial"""
+    def report(future):
+        if future.exception():
+            print(f"[HISTORY] Error aplicando retención en {table}: {future.exception()}")
+        elif future.result():
+            print(f"[HISTORY] Retención: {future.result()} registros antiguos borrados de {table}")
+    return report
+
+def apply_history_retention(table):
+    """
+    Aplica la retención de una tabla cada HISTORY_PRUNE_EVERY inserciones en ella
+
+    El borrado se encola en el escritor de BD sin esperar: se llama desde
+    el hilo de adquisición.
+    """
+    history_inserts[table] += 1
+    if history_inserts[table] >= HISTORY_PRUNE_EVERY:
+        history_inserts[table] = 0
+        db.prune_history(table, HISTORY_MAX_AGE_DAYS, HISTORY_MAX_ROWS,
+                         wait=False).add_done_callback(report_history_prune(table))
+
+def report_health_write(future):
+    """Callback del INSERT asíncrono del historial de salud"""
+    if future.exception():
+        print(f"[HEALTH] Error guardando: {future.exception()}")
+
 def save_health_history(health_data):
+    """
+    Añade la evaluación al historial de salud (un INSERT, coste constante)
+
+    Se llama desde el hilo de adquisición: el INSERT se encola en el
+    escritor de BD sin esperar al commit.
+    """
+    if not db:
+        return
     try:
-        history = []
-        if os.path.exists(HEALTH_HISTORY_FILE):
-            with open(HEALTH_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-        
-        history.append(health_data)
-        
-        if len(history) > 100:
-            history = history[-100:]
-        
-        with open(HEALTH_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
+        db.add_health_record(health_data, trip_data.get("vehicle_id"), trip_data.get("trip_id"),
+                             wait=False).add_done_callback(report_health_write)
+        apply_history_retention('health_history')
     except Exception as e:
         print(f"[HEALTH] Error guardando: {e}")
 
-def get_trip_history():
-    if os.path.exists(TRIP_HISTORY_FILE):
-        with open(TRIP_HISTORY_FILE, 'r', encoding='utf-8') as f:
-            try:
-                return json.load(f)
-            except:
-                return []
-    return []
-
 def save_trip_summary(summary):
-    history = get_trip_history()
-    history.append(summary)
-    with open(TRIP_HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, indent=4, ensure_ascii=False)
+    """Añade un resumen de viaje al historial"""
+    if not db:
+        return
+    try:
+        db.add_trip_summary(summary, summary.get('vehicle_id'))
+        apply_history_retention('trip_summaries')
+    except Exception as e:
+        print(f"[TRIP] Error guardando resumen: {e}")
+
+def migrate_legacy_history():
+    """
+    Importa health_history.json e historial_viajes.json a la BD (una sola vez)
+
+    Tras importarlos se renombran a .migrated para no volver a leerlos.
+    """
+    for path, save in ((HEALTH_HISTORY_FILE, lambda e: db.add_health_record(e)),
+                       (TRIP_HISTORY_FILE, lambda e: db.add_trip_summary(e))):
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            for entry in entries:
+                save(entry)
+            os.replace(path, path + '.migrated')
+            print(f"[HISTORY] ✓ {len(entries)} registros importados de {os.path.basename(path)}")
+        except Exception as e:
+            print(f"[HISTORY] Error importando {os.path.basename(path)}: {e}")
 
 # === FUNCIONES OBD ===
+obd_emulator = None
+obd_emulator_port = None
+obd_connection_cache = ConnectionProfileCache(OBD_CONNECTION_CACHE_FILE) if OBD_FAST_CONNECT else None
+
+
+def get_obd_port():
+    """
+    Puerto al que conectar: el adaptador real o el emulador ELM327
+
+    Si OBD_EMULATOR está configurado se arranca el emulador (una sola vez)
+    y se devuelve su puerto.
+    """
+    global obd_emulator, obd_emulator_port
+
+    if not OBD_EMULATOR:
+        return OBD_PORT
+
+    if obd_emulator is None:
+        obd_emulator, obd_emulator_port = create_emulator(
+            OBD_EMULATOR,
+            OBD_EMULATOR_REPLAY,
+            latency=OBD_EMULATOR_LATENCY,
+            jitter=OBD_EMULATOR_LATENCY / 3,
+            no_data_rate=OBD_EMULATOR_NO_DATA_RATE,
+            dropout_rate=OBD_EMULATOR_DROPOUT_RATE
+        )
+    return obd_emulator_port
+
+
 def initialize_obd_connection(force_reconnect=False):
     global connection, supported_commands_cache, last_connection_attempt_time
     
@@ -554,20 +622,25 @@ def initialize_obd_connection(force_reconnect=False):
         return True
     
     try:
-        print(f"[OBD] Conectando a {OBD_PORT}...")
-        new_connection = obd.OBD(OBD_PORT, baudrate=None, fast=False, timeout=10)
+        port = get_obd_port()
+        print(f"[OBD] Conectando a {port}...")
+        new_connection, connect_mode, connect_time = fast_connect_obd(port, obd_connection_cache, timeout=10)
         
         if new_connection.is_connected():
             connection = new_connection
-            print("[OBD] ✓ Conectado exitosamente")
-            time.sleep(1)
+            print(f"[OBD] ✓ Conectado exitosamente ({connect_mode}, {connect_time:.2f}s)")
+            if connect_mode == 'full':
+                time.sleep(1)
             
-            if force_reconnect or not supported_commands_cache:
-                supported_commands_cache = set(connection.supported_commands)
+            # Los comandos soportados pueden cambiar si se conecta otro vehículo
+            supported_commands_cache = set(connection.supported_commands)
             
             if supported_commands_cache:
                 print(f"[OBD] ✓ {len(supported_commands_cache)} comandos soportados")
 
+            # El hilo de adquisición muestrea el adaptador con la prioridad más alta
+            acquisition_worker.start(adapter_queue.connection(connection, PRIORITY_LIVE))
+
             # === Inicializar integración OBDb ===
             # TEMPORALMENTE DESACTIVADO: Causa regresión en detección de PIDs
             # TODO: Arreglar inicialización de OBDbIntegration para usar default.json correctamente
@@ -588,7 +661,7 @@ def initialize_obd_connection(force_reconnect=False):
             #
             #             # Intentar cargar perfil del vehículo activo
             #             # (Por ahora sin perfil específico)
-            #             obdb_integration = OBDbIntegration(connection)
+            #             obdb_integration = OBDbIntegration(adapter_queue.connection(connection))
             #             print("[OBDb] ✓ Integración OBDb activada")
             #         else:
             #             print("[OBDb] ⚠️ No se cargaron comandos")
@@ -619,52 +692,154 @@ def initialize_obd_connection(force_reconnect=False):
 
 def reset_trip():
     global trip_data
+    health_engine.reset()
+    if trip_data.get("points") is not None:
+        trip_data["points"].clear()  # Borra también los bloques volcados a disco
     trip_data = {
         "active": False,
         "start_time": None,
         "last_read_time": None,
         "distance_km": 0.0,
-        "points": [],
-        "trip_id": None  # ID del viaje en BD (modo manual)
+        "points": ColumnarTripBuffer(TRIP_BUFFER_WINDOW_POINTS, TRIP_BUFFER_CHUNK_POINTS, TRIP_SPILL_FOLDER),
+        "trip_id": None,  # ID del viaje en BD (modo manual)
+        "vehicle_id": None,
+        "stats": TripAggregator(),  # Agregados que se guardan en trips al finalizar
+        "position": None  # Última posición GPS enviada por el navegador (lat, lon)
     }
 
 reset_trip()
-initialize_csv()
+csv_logger.start()
+atexit.register(csv_logger.close)
 
-# === ENDPOINTS ===
+# === ADQUISICIÓN CONTINUA (HILO DEDICADO) ===
 
-@app.route("/get_live_data", methods=["GET"])
-def get_live_data():
-    global connection, trip_data, last_thermal_reading_time, obd_last_readings
+def acquisition_read_cycle(conn):
+    """
+    Ciclo de lectura ejecutado por el hilo de adquisición
 
-    if not connection or not connection.is_connected():
-        return jsonify({
-            "offline": True,
-            "RPM": None,
-            "SPEED": None,
-            "THROTTLE_POS": None,
-            "ENGINE_LOAD": None,
-            "MAF": None,
-            "COOLANT_TEMP": None,
-            "INTAKE_TEMP": None,
-            "total_distance": 0
-        })
+    Lee los 21 PIDs confirmados según el planificador y, si hay un escaneo
+    previo, los PIDs adicionales detectados con la prioridad más baja.
+    """
+    acquisition_metrics.record_cycle()
 
-    # =========================================================================
-    # USAR MÉTODO OPTIMIZADO CON REINTENTOS Y FRECUENCIAS
-    # Lee los 21 PIDs confirmados con frecuencias optimizadas
-    # =========================================================================
-    data, obd_last_readings = read_obd_data_optimized(connection, obd_last_readings)
+    if available_pids:
+        pid_scheduler.ensure_pids(available_pids, EXTRA_PID_PERIOD, priority=3, tier='extra')
+
+    data = read_obd_data_scheduled(conn, pid_scheduler)
+
+    if pid_stats.needs_persist():
+        persist_pid_stats()
+
+    return data
+
+def bind_pid_stats_vehicle(vehicle_id):
+    """
+    Asocia las estadísticas por PID a un vehículo
 
+    Guarda las del vehículo anterior y carga las aprendidas en sesiones
+    previas desde su perfil de PIDs.
+
+    Args:
+        vehicle_id: ID del vehículo
+    """
+    if not vehicle_id or vehicle_id == pid_stats.vehicle_id:
+        return
+
+    persist_pid_stats()
+
+    stats = None
+    try:
+        if db:
+            profile = db.get_vehicle_pids_profile(vehicle_id)
+            stats = profile.get('pid_stats') if profile else None
+    except Exception as e:
+        print(f"[PID-STATS] Error cargando estadísticas: {e}")
+
+    pid_stats.load(vehicle_id, stats)
+
+def persist_pid_stats():
+    """
+    Guarda las estadísticas por PID junto al perfil del vehículo
+
+    Si el vehículo nunca se ha escaneado se crea un perfil con los PIDs que
+    han respondido en lectura continua.
+    """
+    vehicle_id = pid_stats.vehicle_id
+    if not db or vehicle_id is None or not pid_stats.dirty:
+        return
+
+    try:
+        stats = pid_stats.to_dict()
+        if not db.save_pid_stats(vehicle_id, stats):
+            answered = sorted(name for name, entry in stats.items() if entry['successes'] > 0)
+            protocol = 'Unknown'
+            try:
+                if connection and hasattr(connection, 'protocol_name'):
+                    protocol = connection.protocol_name()
+            except Exception:
+                pass
+
+            db.save_vehicle_pids_profile(vehicle_id, {
+                'vehicle_id': vehicle_id,
+                'scan_date': datetime.now().isoformat(),
+                'total_pids': len(answered),
+                'pids': [{'name': name} for name in answered],
+                'protocol': protocol,
+                'source': 'live_stats',
+                'pid_stats': stats
+            })
+
+        pid_stats.mark_persisted()
+
+    except Exception as e:
+        print(f"[PID-STATS] Error guardando estadísticas: {e}")
+
+def build_obd_data_point(results, timestamp):
+    """
+    Punto con las columnas de obd_data a partir de un snapshot de adquisición
+
+    Args:
+        results: Snapshot con los PIDs en mayúsculas
+        timestamp: Instante unix de la muestra
+
+    Returns:
+        Dict para DatabaseManager.save_obd_samples()
+    """
+    position = trip_data.get("position") or (None, None)
+    return {
+        'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+        'rpm': results.get('RPM'),
+        'speed': results.get('SPEED'),
+        'coolant_temp': results.get('COOLANT_TEMP'),
+        'intake_temp': results.get('INTAKE_TEMP'),
+        'maf': results.get('MAF'),
+        'engine_load': results.get('ENGINE_LOAD'),
+        'throttle_pos': results.get('THROTTLE_POS'),
+        'fuel_pressure': results.get('FUEL_PRESSURE'),
+        'latitude': position[0],
+        'longitude': position[1]
+    }
+
+def process_live_sample(values, new_data):
+    """
+    Construye el snapshot publicado y registra el punto si hay viaje activo
+
+    Args:
+        values: Últimos valores conocidos de todos los PIDs
+        new_data: PIDs leídos en este ciclo
+
+    Returns:
+        Dict con los datos que devuelven /get_live_data y endpoints derivados
+    """
     # Asegurar que siempre tengamos valores para los PIDs críticos (aunque sean None)
     critical_keys = ['RPM', 'SPEED', 'THROTTLE_POS', 'ENGINE_LOAD', 'MAF',
                      'COOLANT_TEMP', 'INTAKE_TEMP']
     results = {}
     for key in critical_keys:
-        results[key] = data.get(key)
+        results[key] = values.get(key)
 
     # Añadir TODOS los demás PIDs leídos (incluyendo FUEL_RAIL_PRESSURE_DIRECT para diesel)
-    for key, value in data.items():
+    for key, value in values.items():
         if key not in results:
             results[key] = value
 
@@ -672,43 +847,306 @@ def get_live_data():
     # MODO MANUAL: Solo registrar datos si hay viaje activo
     # El viaje se controla desde el frontend (botones Iniciar/Finalizar)
     # =========================================================================
-    if trip_data["active"]:
-        current_time = time.time()
-        time_delta_s = current_time - trip_data["last_read_time"]
+    with trip_lock:
+        if trip_data["active"] and new_data:
+            current_time = time.time()
+
+            # Distancia, medias, máximos, consumo y bandas del viaje en O(1)
+            trip_data["stats"].update(current_time, results)
+            trip_data["distance_km"] = trip_data["stats"].distance_km
+
+            results['total_distance'] = round(trip_data['distance_km'], 3)
+            trip_data["points"].append(current_time, results)
+            health_engine.update(results)
+            trip_data["last_read_time"] = current_time
+
+            # Persistencia en obd_data sin esperar a SQLite (cola write-behind)
+            if trip_sample_writer and trip_data["trip_id"]:
+                trip_sample_writer.enqueue(trip_data["trip_id"], build_obd_data_point(results, current_time))
+
+            # Guardar en CSV solo si hay viaje activo (append en memoria, lo escribe csv_logger)
+            csv_logger.log(results, current_time)
+
+            # Análisis de salud cada 30 puntos
+            if len(trip_data["points"]) % 30 == 0:
+                analyze_vehicle_health()
+        elif trip_data["active"]:
+            results['total_distance'] = round(trip_data['distance_km'], 3)
+        else:
+            results['total_distance'] = 0
 
-        # Calcular distancia si hay velocidad
-        if results.get("SPEED") and time_delta_s > 0:
-            distance_increment = calculate_distance(results.get("SPEED"), time_delta_s)
-            trip_data["distance_km"] += distance_increment
+    return results
 
-        results['total_distance'] = round(trip_data['distance_km'], 3)
-        trip_data["points"].append(results)
-        trip_data["last_read_time"] = current_time
+acquisition_worker = OBDAcquisitionWorker(
+    acquisition_read_cycle,
+    on_sample=process_live_sample,
+    interval=ACQUISITION_INTERVAL,
+    history_size=ACQUISITION_HISTORY_SIZE
+)
 
-        # Guardar en CSV solo si hay viaje activo (ahora incluye los 21 PIDs)
-        save_reading_to_csv(results, None)
+def get_live_snapshot_data():
+    """
+    Devuelve los datos del último snapshot de adquisición (sin tocar el adaptador)
 
-        # Análisis de salud cada 30 puntos
-        if len(trip_data["points"]) % 30 == 0:
-            analyze_vehicle_health(trip_data["points"])
-    else:
+    Returns:
+        Dict con los PIDs publicados, o None si todavía no hay lecturas
+    """
+    snapshot = acquisition_worker.get_snapshot()
+    return snapshot['data'] if snapshot else None
+
+# === ENDPOINTS ===
+
+def offline_live_data():
+    """Respuesta de datos en vivo cuando no hay adaptador conectado"""
+    return {
+        "offline": True,
+        "RPM": None,
+        "SPEED": None,
+        "THROTTLE_POS": None,
+        "ENGINE_LOAD": None,
+        "MAF": None,
+        "COOLANT_TEMP": None,
+        "INTAKE_TEMP": None,
+        "total_distance": 0
+    }
+
+@app.route("/get_live_data", methods=["GET"])
+def get_live_data():
+    global connection
+
+    if not connection or not connection.is_connected():
+        return jsonify(offline_live_data())
+
+    # =========================================================================
+    # LECTURA DESDE EL SNAPSHOT DEL HILO DE ADQUISICIÓN
+    # El adaptador solo lo muestrea el worker; aquí no hay I/O serie
+    # =========================================================================
+    results = get_live_snapshot_data()
+
+    if results is None:
+        # Conectado pero el worker aún no ha publicado el primer ciclo
+        results = {key: None for key in ['RPM', 'SPEED', 'THROTTLE_POS', 'ENGINE_LOAD',
+                                         'MAF', 'COOLANT_TEMP', 'INTAKE_TEMP']}
         results['total_distance'] = 0
 
     return jsonify(results)
 
+stream_clients = 0
+stream_clients_lock = threading.Lock()
+
+def acquire_stream_slot():
+    """Reserva un hueco de cliente de stream (comprobación e incremento atómicos)"""
+    global stream_clients
+    with stream_clients_lock:
+        if stream_clients >= STREAM_MAX_CLIENTS:
+            return False
+        stream_clients += 1
+        return True
+
+def release_stream_slot():
+    """Libera el hueco reservado con acquire_stream_slot()"""
+    global stream_clients
+    with stream_clients_lock:
+        stream_clients -= 1
+
+def format_sse_event(snapshot, fields=None):
+    """
+    Serializa un snapshot como evento SSE (id = secuencia del snapshot)
+
+    Args:
+        snapshot: Snapshot del hilo de adquisición
+        fields: Conjunto de campos en mayúsculas a incluir (None = todos)
+    """
+    data = snapshot['data']
+    if fields is not None:
+        data = {k: v for k, v in data.items() if k.upper() in fields}
+    payload = dict(data, timestamp=snapshot['timestamp'])
+    return f"id: {snapshot['sequence']}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+@app.route("/api/obd/stream", methods=["GET"])
+def stream_obd_data():
+    """
+    Stream Server-Sent Events con cada snapshot nuevo del hilo de adquisición
+
+    Todos los clientes leen el mismo snapshot publicado, así que el número
+    de dashboards no añade carga al adaptador.
+
+    Query Params:
+        fields: (Opcional) PIDs a incluir separados por comas (ej: RPM,SPEED)
+        max_hz: (Opcional) Eventos por segundo como máximo; si llegan
+            snapshots más rápido se envía solo el último
+        last_event_id: (Opcional) Alternativa a la cabecera Last-Event-ID
+
+    Headers:
+        Last-Event-ID: Reanuda enviando los snapshots posteriores que sigan
+            en el histórico corto del worker
+    """
+    fields_param = request.args.get('fields')
+    fields = {f.strip().upper() for f in fields_param.split(',') if f.strip()} if fields_param else None
+
+    max_hz = request.args.get('max_hz', type=float)
+    min_interval = 1.0 / min(max(max_hz, 0.1), 50.0) if max_hz else 0.0
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_sequence = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_sequence = None
+
+    if not acquire_stream_slot():
+        return jsonify({'error': 'Demasiados clientes conectados al stream'}), 503
+
+    released = []
+
+    def release():
+        # Una sola vez: desde el generador o al cerrar si nunca llegó a iterar
+        if not released:
+            released.append(True)
+            release_stream_slot()
+
+    def generate():
+        try:
+            yield "retry: 2000\n\n"
+
+            sequence = 0
+            current = acquisition_worker.get_snapshot()
+            if last_sequence is not None and current and last_sequence <= current['sequence']:
+                # Reanudación: snapshots perdidos (o solo el último si hay límite de tasa)
+                missed = acquisition_worker.get_history(last_sequence)
+                if min_interval:
+                    missed = missed[-1:]
+                for snapshot in missed:
+                    yield format_sse_event(snapshot, fields)
+                sequence = missed[-1]['sequence'] if missed else last_sequence
+            elif current:
+                yield format_sse_event(current, fields)
+                sequence = current['sequence']
+
+            last_sent = time.time()
+            last_activity = last_sent
+            while True:
+                if not connection or not connection.is_connected():
+                    yield f"data: {json.dumps(offline_live_data())}\n\n"
+                    time.sleep(STREAM_OFFLINE_INTERVAL)
+                    continue
+
+                # Espera acotada para detectar también una desconexión del adaptador
+                snapshot = acquisition_worker.wait_for_snapshot(sequence, STREAM_OFFLINE_INTERVAL)
+                now = time.time()
+
+                if snapshot is None:
+                    if now - last_activity >= STREAM_KEEPALIVE_INTERVAL:
+                        yield ": keepalive\n\n"
+                        last_activity = now
+                    continue
+
+                if min_interval and now - last_sent < min_interval:
+                    time.sleep(min_interval - (now - last_sent))
+                    snapshot = acquisition_worker.get_snapshot()
+
+                yield format_sse_event(snapshot, fields)
+                sequence = snapshot['sequence']
+                last_sent = last_activity = time.time()
+        finally:
+            release()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(release)
+    return response
+
+if WEBSOCKET_AVAILABLE:
+    @sock.route('/api/obd/ws')
+    def telemetry_websocket(ws):
+        """
+        Feed WebSocket binario: keyframe + deltas de los snapshots de adquisición
+
+        Mismos datos que /get_live_data, codificados con TelemetryDeltaEncoder
+        (ver telemetry_codec.py). Al conectar se envía un mensaje de texto
+        {"type": "hello"}, el esquema y un keyframe; después solo deltas, con
+        un keyframe cada STREAM_KEYFRAME_INTERVAL segundos. El cliente puede
+        enviar el texto "keyframe" para resincronizarse.
+
+        Query Params:
+            fields: (Opcional) PIDs a incluir separados por comas
+            max_hz: (Opcional) Tramas por segundo como máximo
+        """
+        if not acquire_stream_slot():
+            ws.close(reason=1013, message='Demasiados clientes conectados al stream')
+            return
+
+        fields_param = request.args.get('fields')
+        fields = [f.strip() for f in fields_param.split(',') if f.strip()] if fields_param else None
+        max_hz = request.args.get('max_hz', type=float)
+        min_interval = 1.0 / min(max(max_hz, 0.1), 50.0) if max_hz else 0.0
+
+        try:
+            encoder = TelemetryDeltaEncoder(fields, keyframe_interval=STREAM_KEYFRAME_INTERVAL)
+            ws.send(json.dumps({'type': 'hello', 'vehicle_id': pid_stats.vehicle_id}))
+
+            sequence = 0
+            last_sent = 0.0
+            while True:
+                message = ws.receive(timeout=0)
+                while message is not None:
+                    if message == 'keyframe':
+                        encoder.request_keyframe()
+                    message = ws.receive(timeout=0)
+
+                if not connection or not connection.is_connected():
+                    ws.send(json.dumps({'type': 'offline'}))
+                    encoder.request_keyframe()
+                    time.sleep(STREAM_OFFLINE_INTERVAL)
+                    continue
+
+                snapshot = acquisition_worker.wait_for_snapshot(sequence, STREAM_OFFLINE_INTERVAL)
+                if snapshot is None:
+                    continue
+
+                now = time.time()
+                if min_interval and now - last_sent < min_interval:
+                    time.sleep(min_interval - (now - last_sent))
+                    snapshot = acquisition_worker.get_snapshot()
+
+                for frame in encoder.encode(snapshot):
+                    ws.send(frame)
+                sequence = snapshot['sequence']
+                last_sent = time.time()
+        finally:
+            release_stream_slot()
+
 @app.route("/get_vehicle_health", methods=["GET"])
 def get_vehicle_health():
     global vehicle_health
-    return jsonify(vehicle_health)
+    # Durante un viaje se evalúa al momento (O(1), no recorre los puntos)
+    with trip_lock:
+        health = health_engine.evaluate() if trip_data["active"] else None
+    return jsonify(health or vehicle_health)
 
 @app.route("/get_health_history", methods=["GET"])
 def get_health_history():
-    try:
-        if os.path.exists(HEALTH_HISTORY_FILE):
-            with open(HEALTH_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-                return jsonify({"history": history})
+    """
+    Historial de evaluaciones de salud
+
+    Query Params:
+        vehicle_id: (Opcional) Solo ese vehículo
+        start: (Opcional) Timestamp ISO inicial
+        end: (Opcional) Timestamp ISO final
+        limit: (Opcional) Máximo de registros, los más recientes (default: 100)
+    """
+    if not db:
         return jsonify({"history": []})
+    try:
+        history = db.get_health_history(
+            vehicle_id=request.args.get('vehicle_id', type=int),
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            limit=request.args.get('limit', 100, type=int)
+        )
+        return jsonify({"history": history})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -792,7 +1230,13 @@ def disconnect_obd():
 
     try:
         if connection and connection.is_connected():
-            connection.close()
+            acquisition_worker.stop()
+            persist_pid_stats()
+            # Escaneos o diagnósticos en cola terminan antes de cerrar; el
+            # cierre pasa por la cola para no coincidir con un comando en curso
+            if not adapter_queue.drain(timeout=ADAPTER_DRAIN_TIMEOUT):
+                print("[OBD] ⚠️ Cola del adaptador no vaciada a tiempo, cerrando igualmente")
+            adapter_queue.run(connection.close, PRIORITY_LIVE)
             connection = None
             return jsonify({
                 "success": True,
@@ -815,77 +1259,66 @@ def disconnect_obd():
 def scan_available_pids():
     """
     Escanea QUÉ PIDs están disponibles en el vehículo conectado
-    Usa el método de 3 reintentos para máxima fiabilidad
+
+    Lee los bitmaps estándar "PIDs supported" (Mode 01 00/20/40...) y solo
+    sondea los PIDs que la ECU declara. El perfil se cachea por vehículo
+    (BD) o VIN: si ya existe se reutiliza sin escanear, salvo que el VIN no
+    coincida o se pida {"refresh": true}.
     """
     global available_pids, current_vehicle_pids_profile
 
     if not connection or not connection.is_connected():
         return jsonify({'error': 'OBD no conectado'}), 400
 
-    data = request.json
+    data = request.get_json(silent=True) or {}
     vehicle_id = data.get('vehicle_id')
+    refresh = bool(data.get('refresh', False))
 
-    print(f"\n🔍 Escaneando PIDs disponibles para vehículo {vehicle_id}...")
-    print(f"   Probando {len(ALL_POSSIBLE_PIDS)} PIDs posibles...")
+    # Las consultas del escaneo ceden el bus a las lecturas en vivo entre comando y comando
+    bus = adapter_queue.connection(connection, PRIORITY_SCAN)
+    vin = read_vin(bus)
 
-    available_pids = []
-    pids_data = []
+    if not vehicle_id and vin and db:
+        vehicle = db.get_vehicle_by_vin(vin)
+        vehicle_id = vehicle['id'] if vehicle else None
 
-    # Probar cada PID con el método de 3 reintentos
-    for idx, pid_name in enumerate(ALL_POSSIBLE_PIDS):
-        if not hasattr(obd.commands, pid_name):
-            continue
+    bind_pid_stats_vehicle(vehicle_id)
 
+    # Perfil cacheado
+    if not refresh:
+        cached = None
         try:
-            cmd = getattr(obd.commands, pid_name)
-            valor_final = None
-            unidad = ''
-
-            # 3 INTENTOS (método robusto)
-            for intento in range(3):
-                try:
-                    response = connection.query(cmd)
-
-                    if response and response.value is not None and not response.is_null():
-                        valor = response.value
-
-                        if hasattr(valor, 'magnitude'):
-                            valor_final = valor.magnitude
-                            unidad = str(response.unit) if hasattr(response, 'unit') else ''
-                        else:
-                            valor_final = valor
-                            unidad = ''
-
-                        break
-
-                except:
-                    pass
+            if vehicle_id and db:
+                cached = db.get_vehicle_pids_profile(vehicle_id)
+            elif vin:
+                cached = pid_profiles_by_vin.get(vin)
+        except Exception as e:
+            print(f"[SCAN] Error leyendo perfil cacheado: {e}")
 
-                time.sleep(0.05)
-
-            # Si obtuvo valor después de 3 intentos
-            if valor_final is not None:
-                pid_info = {
-                    'name': pid_name,
-                    'command': str(cmd.command) if hasattr(cmd, 'command') else 'N/A',
-                    'description': cmd.desc if hasattr(cmd, 'desc') else '',
-                    'unit': unidad,
-                    'sample_value': float(valor_final) if isinstance(valor_final, (int, float)) else str(valor_final)
-                }
-                available_pids.append(pid_name)
-                pids_data.append(pid_info)
-                print(f"  ✅ {pid_name}: {valor_final} {unidad}")
+        # Los perfiles creados solo con estadísticas en vivo no son un escaneo
+        if (cached and cached.get('pids') and cached.get('source') != 'live_stats'
+                and not (vin and cached.get('vin') and cached['vin'] != vin)):
+            cached = {k: v for k, v in cached.items() if k != 'pid_stats'}
+            available_pids = [p['name'] for p in cached['pids']]
+            current_vehicle_pids_profile = cached
+            print(f"[SCAN] ✓ Perfil cacheado para vehículo {vehicle_id or vin}: {len(available_pids)} PIDs")
 
-        except Exception as e:
-            # Error silencioso para no spam en consola
-            pass
+            return jsonify({
+                'success': True,
+                'cached': True,
+                'total_pids': len(available_pids),
+                'available_pids': available_pids,
+                'pids_data': cached['pids'],
+                'profile': cached
+            })
 
-        # Pequeña pausa para no saturar el adaptador
-        time.sleep(0.03)
+    print(f"\n🔍 Escaneando PIDs disponibles para vehículo {vehicle_id or vin}...")
+    result = pid_discovery.discover(bus, ALL_POSSIBLE_PIDS)
 
-        # Progreso cada 10 PIDs
-        if (idx + 1) % 10 == 0:
-            print(f"   Progreso: {idx + 1}/{len(ALL_POSSIBLE_PIDS)} PIDs probados...")
+    for pid_info in result['pids']:
+        print(f"  ✅ {pid_info['name']}: {pid_info['sample_value']} {pid_info['unit']}")
+        # Un PID que responde al escaneo sale de cuarentena/lista negra
+        pid_stats.record(pid_info['name'], True, 0.0)
 
     # Obtener protocolo del vehículo
     protocol = "Unknown"
@@ -897,31 +1330,44 @@ def scan_available_pids():
     except:
         pass
 
-    # Guardar perfil de PIDs para este vehículo
+    available_pids = result['available_pids']
     current_vehicle_pids_profile = {
         'vehicle_id': vehicle_id,
+        'vin': vin,
         'scan_date': datetime.now().isoformat(),
         'total_pids': len(available_pids),
-        'pids': pids_data,
-        'protocol': protocol
+        'pids': result['pids'],
+        'protocol': protocol,
+        'discovery': 'bitmap',
+        'supported_pid_codes': result['supported_pid_codes'],
+        'supported_not_probed': result['supported_not_probed'],
+        'scan_duration_s': result['duration_s']
     }
 
-    # Guardar en base de datos
-    try:
-        db = get_db()
-        if db:
-            db.save_vehicle_pids_profile(vehicle_id, current_vehicle_pids_profile)
-    except Exception as e:
-        print(f"[SCAN] Advertencia: No se pudo guardar perfil en BD: {e}")
+    if not result['supported_pid_codes']:
+        # Sin respuesta al PID 00: no cachear un perfil vacío
+        print("[SCAN] ⚠️ La ECU no respondió a los bitmaps de PIDs soportados")
+    elif vehicle_id and db:
+        try:
+            profile_to_save = dict(current_vehicle_pids_profile)
+            if pid_stats.vehicle_id == vehicle_id:
+                profile_to_save['pid_stats'] = pid_stats.to_dict()
+            db.save_vehicle_pids_profile(vehicle_id, profile_to_save)
+            pid_stats.mark_persisted()
+        except Exception as e:
+            print(f"[SCAN] Advertencia: No se pudo guardar perfil en BD: {e}")
+    elif vin:
+        pid_profiles_by_vin[vin] = current_vehicle_pids_profile
 
-    print(f"\n✅ Escaneo completado: {len(available_pids)} PIDs disponibles")
+    print(f"\n✅ Escaneo completado en {result['duration_s']}s: {len(available_pids)} PIDs disponibles")
     print(f"   Protocolo: {protocol}")
 
     return jsonify({
         'success': True,
+        'cached': False,
         'total_pids': len(available_pids),
         'available_pids': available_pids,
-        'pids_data': pids_data,
+        'pids_data': result['pids'],
         'profile': current_vehicle_pids_profile
     })
 
@@ -929,58 +1375,49 @@ def scan_available_pids():
 def get_live_data_dynamic():
     """
     Lee TODOS los PIDs disponibles dinámicamente
-    MEJORADO: Usa el método con reintentos que SÍ funciona (servidor.py)
+    Devuelve el último snapshot del hilo de adquisición (que ya incluye
+    los PIDs detectados en el escaneo) sin consultar el adaptador
     """
     if not connection or not connection.is_connected():
         return jsonify({'error': 'OBD no conectado'}), 400
 
+    snapshot_data = get_live_snapshot_data() or {}
+
     # Usar PIDs disponibles del scan O los 21 PIDs confirmados
     if available_pids and len(available_pids) > 0:
-        # Usar PIDs del scan
-        pids_to_read = available_pids
         data = {}
-
-        for pid_name in pids_to_read:
-            value = read_pid_with_retries(connection, pid_name, max_attempts=2)
+        for pid_name in available_pids:
+            value = snapshot_data.get(pid_name)
             if value is not None:
                 data[pid_name.lower()] = value
     else:
-        # Usar los 21 PIDs confirmados que SÍ funcionan
-        data = get_current_obd_reading(connection)
         # Convertir keys a minúsculas para compatibilidad
-        data = {k.lower(): v for k, v in data.items()}
+        data = {k.lower(): v for k, v in snapshot_data.items()
+                if v is not None and k != 'total_distance'}
 
     # Añadir timestamp
     data['timestamp'] = datetime.now().isoformat()
 
     return jsonify(data)
 
-# Variable global para control de frecuencias en lectura optimizada
-obd_last_readings = None
-
 @app.route('/api/obd/current-optimized', methods=['GET'])
 def get_current_obd_optimized():
     """
     Obtiene lectura OBD actual usando el método optimizado con frecuencias
 
-    Este endpoint usa el sistema de frecuencias para leer PIDs críticos
-    cada 200ms, importantes cada 1s, e informativos cada 5s.
-    Ideal para lecturas continuas sin saturar el adaptador OBD.
+    El hilo de adquisición lee cada PID según su deadline en el planificador
+    (críticos ~200ms, importantes ~1s, informativos ~5s, alargados si el bus
+    se satura); este endpoint solo devuelve su último snapshot.
     """
-    global obd_last_readings
-
     if not connection or not connection.is_connected():
         return jsonify({'success': False, 'error': 'No conectado'}), 400
 
     try:
-        # Usar el método optimizado con frecuencias
-        data, obd_last_readings = read_obd_data_optimized(
-            connection,
-            obd_last_readings
-        )
+        data = get_live_snapshot_data() or {}
 
         # Convertir keys a minúsculas para compatibilidad
-        data_lower = {k.lower(): v for k, v in data.items()}
+        data_lower = {k.lower(): v for k, v in data.items()
+                      if v is not None and k != 'total_distance'}
 
         return jsonify({
             'success': True,
@@ -991,6 +1428,103 @@ def get_current_obd_optimized():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/obd/acquisition', methods=['GET'])
+def get_acquisition_status():
+    """
+    Estado del hilo de adquisición y, opcionalmente, su histórico corto
+
+    Query Params:
+        history: (Opcional) 'true' para incluir los snapshots recientes
+        since: (Opcional) Solo snapshots con secuencia mayor que este valor
+    """
+    response = {
+        'success': True,
+        'status': acquisition_worker.get_status(),
+        'multi_pid': multi_pid_reader.get_status(),
+        'adapter_queue': adapter_queue.get_status(),
+        'persistence': trip_sample_writer.get_status() if trip_sample_writer else None,
+        'journal': trip_journal.get_status() if trip_journal else None
+    }
+
+    if request.args.get('history', 'false').lower() == 'true':
+        since = request.args.get('since', type=int)
+        response['history'] = acquisition_worker.get_history(since)
+
+    return jsonify(response)
+
+@app.route('/api/obd/pid-rates', methods=['GET'])
+def get_pid_rates():
+    """
+    Frecuencias objetivo vs conseguidas por PID
+
+    Permite ver cuándo el bus del vehículo está saturado y el planificador
+    ha tenido que alargar los periodos.
+    """
+    return jsonify({
+        'success': True,
+        'scheduler': pid_scheduler.get_rates()
+    })
+
+@app.route('/api/obd/pid-stats', methods=['GET'])
+def get_pid_stats():
+    """
+    Fiabilidad por PID del vehículo actual
+
+    Incluye éxitos, fallos, latencia media, tiempo desperdiciado y estado
+    (ok / backoff / quarantined / blacklisted) de cada PID.
+    """
+    return jsonify({
+        'success': True,
+        'pid_stats': pid_stats.get_status()
+    })
+
+@app.route('/api/obd/pid-stats/reset', methods=['POST'])
+def reset_pid_stats():
+    """
+    Vuelve a probar un PID (o todos) olvidando su backoff y lista negra
+
+    Body opcional: {"pid": "FUEL_RATE"}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        pid_name = data.get('pid')
+
+        pid_stats.reset(pid_name)
+        persist_pid_stats()
+
+        return jsonify({
+            'success': True,
+            'message': f"Estadísticas reiniciadas para {pid_name or 'todos los PIDs'}"
+        })
+
+    except Exception as e:
+        print(f"[API] Error reiniciando estadísticas de PIDs: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/obd/metrics', methods=['GET'])
+def get_acquisition_metrics():
+    """
+    Métricas de adquisición: histogramas de latencia por PID, reintentos,
+    NO DATA, jitter del intervalo de muestreo por tier y del ciclo
+
+    Query Params:
+        pid: (Opcional) Solo el detalle de ese PID
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'metrics': acquisition_metrics.get_report(request.args.get('pid'))
+        })
+    except Exception as e:
+        print(f"[API] Error obteniendo métricas de adquisición: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/obd/metrics/reset', methods=['POST'])
+def reset_acquisition_metrics():
+    """Pone a cero las métricas de adquisición (ej: al cambiar de adaptador)"""
+    acquisition_metrics.reset()
+    return jsonify({'success': True, 'message': 'Métricas de adquisición reiniciadas'})
+
 @app.route('/api/vehicles/<int:vehicle_id>/pids-profile', methods=['GET'])
 def get_vehicle_pids_profile_endpoint(vehicle_id):
     """
@@ -1021,16 +1555,17 @@ def predictive_analysis():
     
     vehicle_info = request.json.get("vehicleInfo", {})
     
-    if not trip_data["points"] or len(trip_data["points"]) < 20:
+    if len(trip_data["points"]) < 20:
         return jsonify({"error": "Datos insuficientes. Conduce al menos 2 minutos."}), 400
     
     try:
-        points = trip_data["points"]
+        columns = trip_data["points"].columns(['RPM', 'ENGINE_LOAD', 'MAF', 'COOLANT_TEMP'])
         
-        rpms = [p.get('RPM', 0) for p in points if p.get('RPM')]
-        loads = [p.get('ENGINE_LOAD', 0) for p in points if p.get('ENGINE_LOAD')]
-        mafs = [p.get('MAF', 0) for p in points if p.get('MAF')]
-        temps = [p.get('COOLANT_TEMP', 0) for p in points if p.get('COOLANT_TEMP')]
+        # Mismo criterio que antes (valores distintos de 0); NaN != NaN descarta los ausentes
+        rpms = [v for v in columns['RPM'] if v and v == v]
+        loads = [v for v in columns['ENGINE_LOAD'] if v and v == v]
+        mafs = [v for v in columns['MAF'] if v and v == v]
+        temps = [v for v in columns['COOLANT_TEMP'] if v and v == v]
         
         stats = {
             "rpm_avg": round(statistics.mean(rpms)) if rpms else 0,
@@ -1231,16 +1766,16 @@ def get_vehicle_valuation():
     if not all([brand, model_year, year, mileage]):
         return jsonify({"error": "Todos los datos requeridos."}), 400
 
-    trip_history = get_trip_history()
+    trip_history = db.get_trip_summary_totals() if db else {'trips': 0, 'total_km': 0}
     driving_style_summary = "Sin datos"
     driving_quality_score = 5
     
-    if trip_history and len(trip_history) > 0:
-        total_km = sum(t.get('distancia_km', 0) for t in trip_history)
+    if trip_history['trips'] > 0:
+        total_km = trip_history['total_km']
         
         if total_km > 1:
             driving_quality_score = 8
-            driving_style_summary = f"Conducción registrada: {len(trip_history)} viajes"
+            driving_style_summary = f"Conducción registrada: {trip_history['trips']} viajes"
 
     maintenance_history = request.json.get("maintenanceHistory", [])
     maintenance_score = 5
@@ -1339,16 +1874,42 @@ def list_uploaded_csvs():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/csv/segments", methods=["GET"])
+def list_csv_segments():
+    """Segmentos del CSV de lecturas (el más reciente primero)"""
+    try:
+        return jsonify({
+            'success': True,
+            'segments': csv_logger.list_segments(),
+            'status': csv_logger.get_status()
+        })
+    except Exception as e:
+        print(f"[API] Error listando segmentos CSV: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route("/download_current_csv", methods=["GET"])
 def download_current_csv():
-    if os.path.exists(CSV_FILENAME):
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        return send_file(
-            CSV_FILENAME,
-            as_attachment=True,
-            download_name=f'sentinel_data_{timestamp}.csv'
-        )
-    return jsonify({"error": "No hay datos"}), 404
+    """
+    Descarga un segmento del CSV de lecturas como CSV (descomprimido al vuelo)
+
+    Query Params:
+        segment: (Opcional) Nombre del segmento; por defecto el actual o el más reciente
+    """
+    name = request.args.get('segment')
+    if not name:
+        csv_logger.flush()
+        segments = csv_logger.list_segments()
+        name = csv_logger.current_segment or (segments[0]['name'] if segments else None)
+
+    if not name or not csv_logger.segment_path(name):
+        return jsonify({"error": "No hay datos"}), 404
+
+    download_name = re.sub(r'\.(gz|zst)$', '', name)
+    return Response(
+        stream_with_context(csv_logger.iter_segment(name)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=sentinel_{download_name}'}
+    )
 
 @app.route("/generate_report", methods=["POST"])
 def generate_report():
@@ -1611,10 +2172,10 @@ def analyze_vehicle_history():
         if trips:
             for trip in trips[:5]:  # Analizar últimos 5 viajes
                 try:
-                    trip_data = db.get_trip_obd_data(trip['id'])
-                    if trip_data:
-                        for datapoint in trip_data[:10]:  # Muestra de datos
-                            all_pids_used.update(datapoint.keys())
+                    series = db.get_trip_series(trip['id'])
+                    for signal, values in series.items():
+                        if any(v == v for v in values[:10]):  # Muestra de datos (NaN = sin dato)
+                            all_pids_used.add(signal)
                 except:
                     pass
 
@@ -1782,12 +2343,59 @@ import sys
 sys.path.append(os.path.dirname(__file__))
 try:
     from database import get_db
-    db = get_db()
+    db = get_db(DB_STORAGE_PROFILE)
+    db.start_checkpointer(DB_CHECKPOINT_INTERVAL, DB_WAL_TRUNCATE_BYTES)
+    db.start_writer(DB_WRITER_MAX_BATCH, DB_WRITER_MAX_LATENCY)
+    atexit.register(db.close)  # Se ejecuta después del último volcado (atexit es LIFO)
     print("[DB] ✓ DatabaseManager cargado")
 except Exception as e:
     print(f"[DB] ⚠️  Error cargando DatabaseManager: {e}")
     db = None
 
+def recover_trip_journal():
+    """
+    Reproduce en obd_data las muestras del diario que no llegaron a la BD
+    y cierra los viajes que quedaron activos tras una caída
+
+    Returns:
+        TripJournal listo para la nueva ejecución
+    """
+    journal = TripJournal(TRIP_JOURNAL_FOLDER, fsync_interval=TRIP_JOURNAL_FSYNC_INTERVAL)
+    try:
+        pending = journal.recover()
+        if pending:
+            print(f"[JOURNAL] {len(pending)} muestras sin confirmar de la ejecución anterior")
+            db.replay_obd_samples(pending)
+        journal.discard_recovered()
+    except Exception as e:
+        # Los segmentos se conservan y se reintenta en el próximo arranque
+        print(f"[JOURNAL] ✗ Error reproduciendo el diario: {e}")
+
+    try:
+        orphaned = db.close_orphaned_trips()
+        if orphaned:
+            print(f"[JOURNAL] ✓ {len(orphaned)} viajes huérfanos cerrados: {orphaned}")
+    except Exception as e:
+        print(f"[JOURNAL] ✗ Error cerrando viajes huérfanos: {e}")
+
+    journal.start()
+    return journal
+
+# Persistencia write-behind de las muestras del viaje activo, precedida
+# por el diario write-ahead (lo que quede en la cola sobrevive a una caída)
+trip_journal = None
+trip_sample_writer = None
+if db:
+    trip_journal = recover_trip_journal()
+    atexit.register(trip_journal.close)  # atexit es LIFO: se cierra después del último volcado
+    trip_sample_writer = TripSampleWriter(db.save_obd_samples,
+                                          batch_size=TRIP_PERSIST_BATCH_SIZE,
+                                          flush_interval=TRIP_PERSIST_FLUSH_INTERVAL,
+                                          journal=trip_journal)
+    trip_sample_writer.start()
+    atexit.register(trip_sample_writer.stop)
+    migrate_legacy_history()
+
 # Inicializar CSV Importer
 csv_importer = CSVImporter(db) if db else None
 if csv_importer:
@@ -1969,15 +2577,22 @@ def start_trip_endpoint():
                 "error": "Adaptador OBD no conectado. Conecta el adaptador antes de iniciar el viaje"
             }), 400
 
+        # Cargar la fiabilidad por PID aprendida para este vehículo
+        bind_pid_stats_vehicle(vehicle_id)
+
         # Iniciar viaje en BD
         trip_id = db.start_trip(vehicle_id)
 
-        # Activar trip_data global para que /get_live_data registre datos
-        reset_trip()
-        trip_data["active"] = True
-        trip_data["start_time"] = time.time()
-        trip_data["last_read_time"] = time.time()
-        trip_data["trip_id"] = trip_id  # Guardar ID de BD
+        # Activar trip_data global para que el hilo de adquisición registre datos
+        with trip_lock:
+            reset_trip()
+            trip_data["active"] = True
+            trip_data["start_time"] = time.time()
+            trip_data["last_read_time"] = time.time()
+            trip_data["trip_id"] = trip_id  # Guardar ID de BD
+            trip_data["vehicle_id"] = vehicle_id
+            trip_data["stats"] = TripAggregator(trip_data["start_time"], vehicle.get('fuel_type'))
+        csv_logger.rotate(f"trip_{trip_id}")  # Un segmento CSV por viaje
 
         vehicle_name = f"{vehicle.get('brand', '')} {vehicle.get('model', '')}".strip()
         print(f"[TRIP] ✓ Viaje {trip_id} iniciado para vehículo {vehicle_name} (ID: {vehicle_id})")
@@ -2008,8 +2623,25 @@ def stop_trip_endpoint(trip_id):
         return jsonify({"error": "Base de datos no disponible"}), 500
 
     try:
-        data = request.json
-        stats = data.get('stats', {})
+        # Las estadísticas las calcula el servidor; las que envíe el cliente se ignoran.
+        # Desactivar trip_data global y volcar las muestras pendientes
+        # antes de cerrar el viaje, para que obd_data esté completo
+        stats = None
+        with trip_lock:
+            if trip_data["trip_id"] == trip_id:
+                trip_data["active"] = False
+                if trip_data["stats"].samples:
+                    health = health_engine.evaluate()
+                    stats = trip_data["stats"].get_stats(time.time(), health['overall_score'] if health else None)
+        if trip_sample_writer:
+            trip_sample_writer.flush()
+        if trip_journal:
+            trip_journal.rotate()
+        csv_logger.rotate()
+
+        # Viaje sin agregados en memoria (ej: servidor reiniciado): una pasada SQL
+        if stats is None:
+            stats = db.compute_trip_stats(trip_id)
 
         # Finalizar viaje en BD
         success = db.end_trip(trip_id, stats)
@@ -2017,22 +2649,72 @@ def stop_trip_endpoint(trip_id):
         if not success:
             return jsonify({"error": "No se pudo finalizar el viaje"}), 400
 
-        # Desactivar trip_data global
-        trip_data["active"] = False
+        persist_pid_stats()
         print(f"[TRIP] ✓ Viaje {trip_id} finalizado manualmente")
 
         return jsonify({
             "success": True,
-            "message": "Viaje finalizado"
+            "message": "Viaje finalizado",
+            "stats": stats
         })
 
     except Exception as e:
         print(f"[API] Error finalizando viaje: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/trips/<int:trip_id>/recompute-stats", methods=["POST"])
+def recompute_trip_stats_endpoint(trip_id):
+    """Recalcula las estadísticas de un viaje desde obd_data (viajes importados o antiguos)"""
+    if not db:
+        return jsonify({"error": "Base de datos no disponible"}), 500
+
+    try:
+        stats = db.recompute_trip_stats(trip_id)
+        if stats is None:
+            return jsonify({"error": "El viaje no tiene datos OBD"}), 404
+
+        return jsonify({
+            "success": True,
+            "trip_id": trip_id,
+            "stats": stats
+        })
+
+    except Exception as e:
+        print(f"[API] Error recalculando viaje: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/trips/<int:trip_id>/position", methods=["POST"])
+def update_trip_position_endpoint(trip_id):
+    """
+    Última posición GPS del navegador para las muestras que persiste el servidor
+
+    Body:
+        latitude, longitude
+    """
+    try:
+        data = request.json or {}
+        latitude, longitude = data.get('latitude'), data.get('longitude')
+
+        with trip_lock:
+            if not trip_data["active"] or trip_data["trip_id"] != trip_id:
+                return jsonify({"error": "El viaje no está activo"}), 409
+            trip_data["position"] = (latitude, longitude) if latitude is not None and longitude is not None else None
+
+        return jsonify({"success": True})
+
+    except Exception as e:
+        print(f"[API] Error actualizando posición: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/trips/<int:trip_id>/data", methods=["POST"])
 def save_trip_data_endpoint(trip_id):
-    """Guardar datos OBD del viaje"""
+    """
+    Guardar datos OBD del viaje enviados por un cliente externo
+
+    Las muestras del viaje activo ya las persiste el servidor desde el hilo
+    de adquisición; este endpoint queda para clientes que registran datos
+    por su cuenta.
+    """
     if not db:
         return jsonify({"error": "Base de datos no disponible"}), 500
 
@@ -2100,17 +2782,56 @@ def get_trip_endpoint(trip_id):
         print(f"[API] Error obteniendo viaje: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/trips/<int:trip_id>/series", methods=["GET"])
+def get_trip_series_endpoint(trip_id):
+    """
+    Series de un viaje por señal (gráficos), desde obd_chunks u obd_data
+
+    Query:
+        signals: Señales separadas por comas (por defecto todas)
+        start, end: Rango en segundos unix
+    """
+    if not db:
+        return jsonify({"error": "Base de datos no disponible"}), 500
+
+    try:
+        signals = request.args.get('signals')
+        signals = [s.strip() for s in signals.split(',') if s.strip()] if signals else None
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+
+        series = db.get_trip_series(trip_id, signals, start, end)
+
+        return jsonify({
+            "success": True,
+            "trip_id": trip_id,
+            "count": len(series['timestamp']),
+            "source": "chunks" if db.trip_has_chunks(trip_id) else "rows",
+            "series": series_to_json(series)
+        })
+
+    except Exception as e:
+        print(f"[API] Error obteniendo series del viaje: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/vehicles/<int:vehicle_id>/stats", methods=["GET"])
 def get_vehicle_stats_endpoint(vehicle_id):
-    """Obtener estadísticas de un vehículo"""
+    """
+    Obtener estadísticas de un vehículo
+
+    Query:
+        start_date, end_date: Rango de fechas (opcional)
+        include_trips: 'true' para añadir la lista de viajes
+    """
     if not db:
         return jsonify({"error": "Base de datos no disponible"}), 500
 
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        include_trips = request.args.get('include_trips', 'false').lower() == 'true'
 
-        stats = db.get_vehicle_stats(vehicle_id, start_date, end_date)
+        stats = db.get_vehicle_stats(vehicle_id, start_date, end_date, include_trips=include_trips)
 
         return jsonify({
             "success": True,
@@ -2213,8 +2934,8 @@ def get_analytics_endpoint(vehicle_id):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
 
-        # Obtener estadísticas
-        stats = db.get_vehicle_stats(vehicle_id, start_date, end_date)
+        # Obtener estadísticas (con la lista de viajes para la tabla y los gráficos)
+        stats = db.get_vehicle_stats(vehicle_id, start_date, end_date, include_trips=True)
 
         # Preparar datos para Chart.js
         trips = stats.get('trips', [])
@@ -2238,13 +2959,20 @@ def get_analytics_endpoint(vehicle_id):
             'data': [highway_km, city_km, road_km]
         }
 
+        # Señales agregadas por muestra (rollups), no medias de medias por viaje
+        points = request.args.get('points', ANALYTICS_MAX_POINTS, type=int)
+        signal_timeline = db.get_rollup_series(vehicle_id, ANALYTICS_TIMELINE_SIGNALS,
+                                               start_date, end_date, points)
+
         return jsonify({
             "success": True,
             "vehicle_id": vehicle_id,
             "stats": stats,
+            "signals": db.get_rollup_summary(vehicle_id, None, start_date, end_date),
             "charts": {
                 "health_timeline": health_timeline,
-                "driving_distribution": driving_distribution
+                "driving_distribution": driving_distribution,
+                "signal_timeline": signal_timeline
             }
         })
 
@@ -2252,6 +2980,38 @@ def get_analytics_endpoint(vehicle_id):
         print(f"[API] Error obteniendo analytics: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/analytics/<int:vehicle_id>/series", methods=["GET"])
+def get_analytics_series_endpoint(vehicle_id):
+    """
+    Series agregadas (avg/min/max/count por cubo) para gráficos de rango largo
+
+    Query:
+        signals: Señales separadas por comas (por defecto todas)
+        start_date, end_date: Rango ISO (por defecto todo el histórico)
+        points: Puntos máximos por señal; la resolución (1 s, 1 min, 1 h)
+            se elige automáticamente
+    """
+    if not db:
+        return jsonify({"error": "Base de datos no disponible"}), 500
+
+    try:
+        signals = request.args.get('signals')
+        signals = [s.strip() for s in signals.split(',') if s.strip()] if signals else None
+        points = request.args.get('points', ANALYTICS_MAX_POINTS, type=int)
+
+        series = db.get_rollup_series(vehicle_id, signals, request.args.get('start_date'),
+                                      request.args.get('end_date'), points)
+
+        return jsonify({
+            "success": True,
+            "vehicle_id": vehicle_id,
+            **series
+        })
+
+    except Exception as e:
+        print(f"[API] Error obteniendo series agregadas: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/fleet/stats", methods=["GET"])
 def get_fleet_stats_endpoint():
     """Obtener estadísticas de toda la flota"""
@@ -2270,6 +3030,22 @@ def get_fleet_stats_endpoint():
         print(f"[API] Error obteniendo estadísticas de flota: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/db/storage", methods=["GET"])
+def get_db_storage_endpoint():
+    """Perfil de almacenamiento SQLite, pool de conexiones y estado del WAL"""
+    if not db:
+        return jsonify({"error": "Base de datos no disponible"}), 500
+
+    try:
+        return jsonify({
+            "success": True,
+            "storage": db.get_storage_status()
+        })
+
+    except Exception as e:
+        print(f"[API] Error obteniendo estado de la BD: {e}")
+        return jsonify({"error": str(e)}), 500
+
 # --- ENDPOINTS DE ALERTAS ---
 
 @app.route("/api/alerts", methods=["POST"])
@@ -2726,41 +3502,41 @@ def get_import_history_endpoint():
     try:
         vehicle_id = request.args.get('vehicle_id', type=int)
 
-        conn = db._get_connection()
-        cursor = conn.cursor()
-
-        if vehicle_id:
-            cursor.execute('''
-                SELECT
-                    i.*,
-                    v.brand,
-                    v.model,
-                    v.year
-                FROM imports i
-                LEFT JOIN vehicles v ON i.vehicle_id = v.id
-                WHERE i.vehicle_id = ?
-                ORDER BY i.import_date DESC
-            ''', (vehicle_id,))
-        else:
-            cursor.execute('''
-                SELECT
-                    i.*,
-                    v.brand,
-                    v.model,
-                    v.year
-                FROM imports i
-                LEFT JOIN vehicles v ON i.vehicle_id = v.id
-                ORDER BY i.import_date DESC
-            ''')
+        with db.connection() as conn:
+            cursor = conn.cursor()
 
-        columns = [desc[0] for desc in cursor.description]
-        imports = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            if vehicle_id:
+                cursor.execute('''
+                    SELECT
+                        i.*,
+                        v.brand,
+                        v.model,
+                        v.year
+                    FROM imports i
+                    LEFT JOIN vehicles v ON i.vehicle_id = v.id
+                    WHERE i.vehicle_id = ?
+                    ORDER BY i.import_date DESC
+                ''', (vehicle_id,))
+            else:
+                cursor.execute('''
+                    SELECT
+                        i.*,
+                        v.brand,
+                        v.model,
+                        v.year
+                    FROM imports i
+                    LEFT JOIN vehicles v ON i.vehicle_id = v.id
+                    ORDER BY i.import_date DESC
+                ''')
+
+            columns = [desc[0] for desc in cursor.description]
+            imports = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-        return jsonify({
-            "success": True,
-            "count": len(imports),
-            "imports": imports
-        })
+            return jsonify({
+                "success": True,
+                "count": len(imports),
+                "imports": imports
+            })
 
     except Exception as e:
         print(f"[API] Error obteniendo historial: {e}")
@@ -2773,32 +3549,32 @@ def get_import_detail_endpoint(import_id):
         return jsonify({"error": "Base de datos no disponible"}), 500
 
     try:
-        conn = db._get_connection()
-        cursor = conn.cursor()
+        with db.connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT
-                i.*,
-                v.brand,
-                v.model,
-                v.year
-            FROM imports i
-            LEFT JOIN vehicles v ON i.vehicle_id = v.id
-            WHERE i.id = ?
-        ''', (import_id,))
+            cursor.execute('''
+                SELECT
+                    i.*,
+                    v.brand,
+                    v.model,
+                    v.year
+                FROM imports i
+                LEFT JOIN vehicles v ON i.vehicle_id = v.id
+                WHERE i.id = ?
+            ''', (import_id,))
 
-        row = cursor.fetchone()
+            row = cursor.fetchone()
 
-        if not row:
-            return jsonify({"error": "Importación no encontrada"}), 404
+            if not row:
+                return jsonify({"error": "Importación no encontrada"}), 404
 
-        columns = [desc[0] for desc in cursor.description]
-        import_data = dict(zip(columns, row))
+            columns = [desc[0] for desc in cursor.description]
+            import_data = dict(zip(columns, row))
 
-        return jsonify({
-            "success": True,
-            "import": import_data
-        })
+            return jsonify({
+                "success": True,
+                "import": import_data
+            })
 
     except Exception as e:
         print(f"[API] Error obteniendo detalle: {e}")
@@ -2814,37 +3590,35 @@ def rollback_import_endpoint(import_id):
         return jsonify({"error": "Base de datos no disponible"}), 500
 
     try:
-        conn = db._get_connection()
-        cursor = conn.cursor()
-
-        # Obtener información de la importación
-        cursor.execute('SELECT * FROM imports WHERE id = ?', (import_id,))
-        import_row = cursor.fetchone()
+        with db.connection() as conn:
+            cursor = conn.cursor()
 
-        if not import_row:
-            return jsonify({"error": "Importación no encontrada"}), 404
+            # Obtener información de la importación
+            cursor.execute('SELECT * FROM imports WHERE id = ?', (import_id,))
+            import_row = cursor.fetchone()
 
-        # Verificar si se puede revertir
-        columns = [desc[0] for desc in cursor.description]
-        import_data = dict(zip(columns, import_row))
+            if not import_row:
+                return jsonify({"error": "Importación no encontrada"}), 404
 
-        if not import_data.get('can_rollback'):
-            return jsonify({"error": "Esta importación no se puede revertir"}), 400
+            # Verificar si se puede revertir
+            columns = [desc[0] for desc in cursor.description]
+            import_data = dict(zip(columns, import_row))
 
-        # TODO: Implementar lógica de rollback
-        # Por ahora solo marcar como no reversible
-        cursor.execute('''
-            UPDATE imports
-            SET can_rollback = 0
-            WHERE id = ?
-        ''', (import_id,))
+            if not import_data.get('can_rollback'):
+                return jsonify({"error": "Esta importación no se puede revertir"}), 400
 
-        conn.commit()
+            # TODO: Implementar lógica de rollback
+            # Por ahora solo marcar como no reversible
+            cursor.execute('''
+                UPDATE imports
+                SET can_rollback = 0
+                WHERE id = ?
+            ''', (import_id,))
 
-        return jsonify({
-            "success": True,
-            "message": "Importación marcada para rollback (funcionalidad en desarrollo)"
-        })
+            return jsonify({
+                "success": True,
+                "message": "Importación marcada para rollback (funcionalidad en desarrollo)"
+            })
 
     except Exception as e:
         print(f"[API] Error en rollback: {e}")
@@ -2921,46 +3695,44 @@ def get_all_trips():
         limit = request.args.get('limit', type=int, default=50)
         offset = request.args.get('offset', type=int, default=0)
 
-        conn = db._get_connection()
-        cursor = conn.cursor()
-
-        if vehicle_id:
-            cursor.execute('''
-                SELECT * FROM trips
-                WHERE vehicle_id = ?
-                ORDER BY start_timestamp DESC
-                LIMIT ? OFFSET ?
-            ''', (vehicle_id, limit, offset))
-        else:
-            cursor.execute('''
-                SELECT * FROM trips
-                ORDER BY start_timestamp DESC
-                LIMIT ? OFFSET ?
-            ''', (limit, offset))
-
-        trips = []
-        for row in cursor.fetchall():
-            trips.append({
-                'id': row[0],
-                'vehicle_id': row[1],
-                'start_timestamp': row[2],
-                'end_timestamp': row[3],
-                'duration_seconds': row[4],
-                'distance_km': row[5],
-                'avg_speed': row[6],
-                'max_speed': row[7],
-                'avg_rpm': row[8],
-                'max_rpm': row[9],
-                'fuel_consumed': row[10]
-            })
+        with db.connection() as conn:
+            cursor = conn.cursor()
 
-        conn.close()
+            if vehicle_id:
+                cursor.execute('''
+                    SELECT * FROM trips
+                    WHERE vehicle_id = ?
+                    ORDER BY start_timestamp DESC
+                    LIMIT ? OFFSET ?
+                ''', (vehicle_id, limit, offset))
+            else:
+                cursor.execute('''
+                    SELECT * FROM trips
+                    ORDER BY start_timestamp DESC
+                    LIMIT ? OFFSET ?
+                ''', (limit, offset))
+
+            trips = []
+            for row in cursor.fetchall():
+                trips.append({
+                    'id': row[0],
+                    'vehicle_id': row[1],
+                    'start_timestamp': row[2],
+                    'end_timestamp': row[3],
+                    'duration_seconds': row[4],
+                    'distance_km': row[5],
+                    'avg_speed': row[6],
+                    'max_speed': row[7],
+                    'avg_rpm': row[8],
+                    'max_rpm': row[9],
+                    'fuel_consumed': row[10]
+                })
 
-        return jsonify({
-            'success': True,
-            'trips': trips,
-            'count': len(trips)
-        })
+            return jsonify({
+                'success': True,
+                'trips': trips,
+                'count': len(trips)
+            })
 
     except Exception as e:
         print(f"[API] Error obteniendo viajes: {e}")
@@ -3239,6 +4011,8 @@ if __name__ == "__main__":
     print("SENTINEL PRO - SISTEMA DE FLOTAS v10.0")
     print("=" * 70)
     print(f"\n[CONFIG] Puerto OBD: {OBD_PORT}")
+    if OBD_EMULATOR:
+        print(f"[CONFIG] Emulador ELM327: {OBD_EMULATOR} ({OBD_EMULATOR_REPLAY or 'señales sintéticas'})")
     print(f"[CONFIG] Modelo IA: {GEMINI_MODEL_NAME}")
     print("\n[OPTIMIZACIONES]")
     print("  ✓ Datos críticos cada 3s: RPM, velocidad, acelerador, carga, MAF")
@@ -3261,14 +4035,13 @@ if __name__ == "__main__":
     # Verificar tabla obd_extended
     if db:
         try:
-            conn = db._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT name FROM sqlite_master
-                WHERE type='table' AND name='obd_extended'
-            ''')
+            with db.connection() as conn:
+                table_exists = conn.execute('''
+                    SELECT name FROM sqlite_master
+                    WHERE type='table' AND name='obd_extended'
+                ''').fetchone() is not None
 
-            if not cursor.fetchone():
+            if not table_exists:
                 print("\n[DB] ⚠️  Tabla 'obd_extended' no existe")
                 print("[DB] Ejecutando migración automática...")
 
@@ -27,8 +27,11 @@ except ImportError:
     OBDB_PARSER_AVAILABLE = False
     print("[OBDb Integration] ⚠️  obdb_parser not available")
 
+from obd_command_queue import PRIORITY_DIAGNOSTIC
+
 try:
     import obd
+    from fast_decode import get_raw_command
     OBD_AVAILABLE = True
 except ImportError:
     OBD_AVAILABLE = False
@@ -52,9 +55,14 @@ class OBDbIntegration:
         Initialize OBDb integration.
 
         Args:
-            connection: python-obd connection object
+            connection: python-obd connection object, or a QueuedConnection
+                from the adapter command queue
             vehicle_profile_path: Path to vehicle profile JSON
         """
+        # Extended reads are slow diagnostics: through the adapter queue they
+        # yield the bus to live acquisition between commands
+        if hasattr(connection, 'with_priority'):
+            connection = connection.with_priority(PRIORITY_DIAGNOSTIC)
         self.obd_connection = connection
         self.parser = None
         self.vehicle_profile = {}
@@ -164,7 +172,7 @@ class OBDbIntegration:
                     continue
 
                 # Query command
-                signal_data = self._query_command(cmd_str)
+                signal_data = self._query_command(cmd_str, cmd)
 
                 if signal_data:
                     # Decode and categorize signals
@@ -203,15 +211,20 @@ class OBDbIntegration:
             'diagnostics': {}
         }
 
-    def _query_command(self, cmd_str: str) -> Optional[Dict]:
+    def _query_command(self, cmd_str: str, command: Optional[Dict] = None) -> Optional[Dict]:
         """
         Query a specific OBD-II command.
 
+        With the OBDb command definition, the response bytes are decoded
+        straight into its signals (OBDbParser.decode_signals) instead of
+        going through python-obd's pint decoder.
+
         Args:
             cmd_str: Command string (e.g., "01 06")
+            command: OBDb command dict (default.json format)
 
         Returns:
-            Dict of signal values or None
+            Dict of signal values {signal_id: value} or None
         """
         if not self.obd_connection or not OBD_AVAILABLE:
             return None
@@ -228,7 +241,21 @@ class OBDbIntegration:
             # python-obd uses different naming convention
             obd_cmd = self._find_obd_command(mode_str, pid_str)
 
-            if obd_cmd:
+            if obd_cmd and command is not None:
+                # Same behaviour as query() without force: skip unsupported PIDs
+                if not self.obd_connection.supports(obd_cmd):
+                    return None
+                response = self.obd_connection.query(get_raw_command(obd_cmd), force=True)
+                if not response or response.is_null():
+                    return None
+
+                mode_int, pid_int = int(mode_str, 16), int(pid_str, 16)
+                for message in response.value:
+                    data = message.data
+                    if len(data) > 2 and data[0] == 0x40 + mode_int and data[1] == pid_int:
+                        return self.parser.decode_signals(command, data[2:]) or None
+
+            elif obd_cmd:
                 response = self.obd_connection.query(obd_cmd)
                 if response and not response.is_null():
                     return {'value': response.value}
@@ -259,11 +286,9 @@ class OBDbIntegration:
             mode_int = int(mode, 16)
             pid_int = int(pid, 16)
 
-            # Check if command exists
-            for cmd in obd.commands:
-                if hasattr(cmd, 'mode') and hasattr(cmd, 'pid'):
-                    if cmd.mode == mode_int and cmd.pid == pid_int:
-                        return cmd
+            # Check if command exists (obd.commands is indexed by mode, then PID)
+            if obd.commands.has_pid(mode_int, pid_int):
+                return obd.commands[mode_int][pid_int]
 
         except Exception:
             pass
@@ -13,6 +13,8 @@ import json
 import os
 from typing import Dict, List, Optional, Any
 
+from fast_decode import compile_obdb_command, decode_obdb_signals
+
 
 class OBDbParser:
     """
@@ -35,6 +37,7 @@ class OBDbParser:
         self.json_file_path = json_file_path
         self.commands = []
         self.command_map = {}
+        self._compiled_signals = {}
 
         if os.path.exists(json_file_path):
             self.load_database(json_file_path)
@@ -96,6 +99,11 @@ class OBDbParser:
             if mode and pid:
                 return f"{mode} {pid}".upper()
 
+            # default.json format: {"cmd": {"01": "0C"}}
+            if isinstance(command.get('cmd'), dict) and command['cmd']:
+                mode, pid = next(iter(command['cmd'].items()))
+                return f"{mode} {pid}".upper()
+
             # Alternative: full command string
             if 'command' in command:
                 return command['command'].upper()
@@ -256,6 +264,28 @@ class OBDbParser:
             print(f"[OBDb Parser] Error decoding value: {e}")
             return None
 
+    def decode_signals(self, command: Dict, payload: bytes) -> Dict[str, float]:
+        """
+        Decode every signal of a command straight from the response bytes.
+
+        Uses precompiled table-driven decoders (see fast_decode) instead of
+        building pint quantities. Decoders are compiled once per command.
+
+        Args:
+            command: OBDb command dict (default.json format)
+            payload: Response data bytes, without mode and PID
+
+        Returns:
+            Dict {signal_id: value}
+        """
+        key = self.get_command_string(command) or id(command)
+        compiled = self._compiled_signals.get(key)
+        if compiled is None:
+            compiled = compile_obdb_command(command)
+            self._compiled_signals[key] = compiled
+
+        return decode_obdb_signals(compiled, payload)
+
     def get_supported_pids(self, profile_data: Dict) -> List[str]:
         """
         Extract list of supported PIDs from vehicle profile.
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - DESCUBRIMIENTO DE PIDs POR BITMAP
+# Lee los bitmaps "PIDs supported" (Mode 01 00/20/40/...) y sondea solo
+# los PIDs que la ECU declara
+# =============================================================================
+
+import time
+from typing import Dict, List, Optional, Set
+
+import obd
+from obd import OBDCommand
+from obd.protocols import ECU
+
+from fast_decode import has_fast_decoder, pid_unit, query_value
+
+
+# PIDs de Mode 01 que devuelven un bitmap de los 32 PIDs siguientes
+BITMAP_PIDS = [0x00, 0x20, 0x40, 0x60, 0x80, 0xA0, 0xC0, 0xE0]
+
+
+def _raw_messages(messages):
+    """Decoder identidad: devuelve los mensajes sin interpretar"""
+    return messages
+
+
+def _bitmap_command(base: int) -> OBDCommand:
+    """Comando Mode 01 para el bitmap que empieza en base"""
+    return OBDCommand(
+        f"PIDS_{base:02X}",
+        f"Supported PIDs [{base + 1:02X}-{base + 32:02X}]",
+        b"01" + f"{base:02X}".encode(),
+        0,
+        _raw_messages,
+        ECU.ALL,
+        False
+    )
+
+
+_BITMAP_COMMANDS = {base: _bitmap_command(base) for base in BITMAP_PIDS}
+
+
+def parse_bitmap(messages, base: int) -> Set[int]:
+    """
+    Extrae los PIDs soportados de la respuesta a un bitmap
+
+    Se une la respuesta de todas las ECUs (motor, transmisión...).
+
+    Args:
+        messages: Mensajes devueltos por python-obd
+        base: PID del bitmap consultado (0x00, 0x20...)
+
+    Returns:
+        Conjunto de PIDs soportados (enteros)
+    """
+    supported = set()
+
+    for message in messages or []:
+        data = message.data
+        if len(data) < 6 or data[0] != 0x41 or data[1] != base:
+            continue
+
+        bits = int.from_bytes(bytes(data[2:6]), 'big')
+        for i in range(32):
+            if bits & (1 << (31 - i)):
+                supported.add(base + i + 1)
+
+    return supported
+
+
+def read_supported_pid_codes(connection) -> Set[int]:
+    """
+    Recorre la cadena de bitmaps de Mode 01
+
+    Cada bitmap indica en su último bit si existe el siguiente, así que
+    solo se consultan los rangos que la ECU anuncia.
+
+    Args:
+        connection: Conexión OBD
+
+    Returns:
+        Conjunto de PIDs Mode 01 soportados (vacío si la ECU no responde)
+    """
+    supported = set()
+
+    for base in BITMAP_PIDS:
+        if base != 0x00 and base not in supported:
+            break
+
+        try:
+            response = connection.query(_BITMAP_COMMANDS[base], force=True)
+            messages = response.value if response and not response.is_null() else None
+        except Exception:
+            messages = None
+
+        codes = parse_bitmap(messages, base)
+        if not codes:
+            break
+        supported |= codes
+
+    return supported
+
+
+def read_vin(connection) -> Optional[str]:
+    """
+    Lee el VIN (Mode 09 PID 02) para identificar el vehículo conectado
+
+    Returns:
+        VIN de 17 caracteres o None si la ECU no lo proporciona
+    """
+    try:
+        response = connection.query(obd.commands.VIN, force=True)
+        if response and not response.is_null() and response.value:
+            vin = response.value
+            if isinstance(vin, (bytes, bytearray)):
+                vin = vin.decode(errors='ignore')
+            vin = str(vin).strip().upper()
+            return vin if len(vin) == 17 else None
+    except Exception:
+        pass
+    return None
+
+
+class PIDDiscovery:
+    """
+    Descubrimiento de PIDs disponibles a partir de los bitmaps estándar
+
+    En lugar de probar cada PID conocido con varios reintentos y pausas, se
+    leen los bitmaps (1 consulta por cada 32 PIDs) y solo se sondea una vez
+    cada PID que la ECU declara para obtener valor de muestra y unidad.
+    """
+
+    def __init__(self, probe_attempts: int = 2):
+        """
+        Inicializa el descubridor
+
+        Args:
+            probe_attempts: Intentos por PID declarado (sin pausas)
+        """
+        self.probe_attempts = probe_attempts
+
+    def discover(self, connection, candidate_pids: List[str]) -> Dict:
+        """
+        Descubre los PIDs disponibles en el vehículo conectado
+
+        Args:
+            connection: Conexión OBD
+            candidate_pids: Nombres de PIDs que interesa sondear
+                (ALL_POSSIBLE_PIDS); el resto de soportados solo se listan
+
+        Returns:
+            Dict con available_pids, pids (datos por PID), supported_pid_codes,
+            supported_not_probed y duration_s
+        """
+        start = time.time()
+        codes = read_supported_pid_codes(connection)
+
+        candidates = set(candidate_pids)
+        to_probe = []
+        not_probed = []
+
+        for code in sorted(codes):
+            if code in BITMAP_PIDS or not obd.commands.has_pid(1, code):
+                continue
+            cmd = obd.commands[1][code]
+            if cmd.name in candidates:
+                to_probe.append(cmd)
+            else:
+                not_probed.append(cmd.name)
+
+        available = []
+        pids_data = []
+
+        for cmd in to_probe:
+            value, unit = self._probe(connection, cmd)
+            if value is None:
+                continue
+
+            available.append(cmd.name)
+            pids_data.append({
+                'name': cmd.name,
+                'command': str(cmd.command),
+                'description': cmd.desc,
+                'unit': unit,
+                'sample_value': float(value) if isinstance(value, (int, float)) else str(value)
+            })
+
+        return {
+            'available_pids': available,
+            'pids': pids_data,
+            'supported_pid_codes': [f"{code:02X}" for code in sorted(codes)],
+            'supported_not_probed': not_probed,
+            'duration_s': round(time.time() - start, 2)
+        }
+
+    def _probe(self, connection, cmd: OBDCommand):
+        """Consulta un PID declarado y devuelve (valor, unidad)"""
+        for _ in range(self.probe_attempts):
+            try:
+                if has_fast_decoder(cmd.name):
+                    value = query_value(connection, cmd, force=True)
+                    if value is not None:
+                        return value, pid_unit(cmd.name)
+                    continue
+
+                response = connection.query(cmd, force=True)
+                if response and not response.is_null() and response.value is not None:
+                    value = response.value
+                    if hasattr(value, 'magnitude'):
+                        return value.magnitude, str(value.units)
+                    return value, ''
+            except Exception:
+                pass
+        return None, ''
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - PLANIFICADOR ADAPTATIVO DE PIDs
+# Lecturas ordenadas por deadline con periodos adaptados al RTT del adaptador
+# =============================================================================
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class PIDScheduler:
+    """
+    Planificador EDF (earliest deadline first) de lecturas de PIDs
+
+    Cada PID tiene un periodo objetivo y una prioridad (0 = crítica). En cada
+    ciclo se leen los PIDs vencidos ordenados por deadline; los huecos libres
+    del ciclo se rellenan adelantando PIDs lentos en lugar de leerlos todos a
+    la vez. El coste por PID se mide en el adaptador y, si la carga requerida
+    supera la utilización objetivo, se alargan los periodos empezando por las
+    prioridades bajas.
+    """
+
+    # Periodos y prioridades equivalentes a los antiguos tiers fijos
+    TIER_DEFAULTS = {
+        'fast': {'period': 0.2, 'priority': 0},
+        'medium': {'period': 1.0, 'priority': 1},
+        'slow': {'period': 5.0, 'priority': 2},
+    }
+
+    def __init__(self, cycle_interval: float = 0.2, target_utilization: float = 0.8,
+                 initial_cost_per_pid: float = 0.05, rtt_alpha: float = 0.2):
+        """
+        Inicializa el planificador
+
+        Args:
+            cycle_interval: Periodo del ciclo de adquisición en segundos
+            target_utilization: Fracción máxima del tiempo de bus a ocupar
+            initial_cost_per_pid: Coste estimado por PID hasta tener mediciones
+            rtt_alpha: Factor de suavizado (EWMA) de las mediciones de coste
+        """
+        self.cycle_interval = cycle_interval
+        self.target_utilization = target_utilization
+        self.rtt_alpha = rtt_alpha
+        self.cost_per_pid = initial_cost_per_pid
+
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stretch_high = 1.0  # Factor aplicado a prioridad 0
+        self._stretch_low = 1.0   # Factor aplicado al resto de prioridades
+        self._utilization = 0.0
+
+    # =========================================================================
+    # CONFIGURACIÓN DE PIDs
+    # =========================================================================
+
+    def add_pid(self, name: str, period: float, priority: int, tier: str = None,
+                now: float = None):
+        """
+        Registra un PID (o actualiza su periodo y prioridad)
+
+        Args:
+            name: Nombre del PID (ej: 'RPM')
+            period: Periodo objetivo en segundos
+            priority: Prioridad (0 = máxima)
+            tier: Etiqueta informativa (fast/medium/slow/extra)
+            now: Instante actual (time.time() por defecto)
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry:
+                entry.update({'period': period, 'priority': priority, 'tier': tier or entry['tier']})
+            else:
+                # Escalonar el primer deadline de PIDs con el mismo periodo
+                same_period = sum(1 for e in self._entries.values() if e['period'] == period)
+                offset = (same_period * self.cycle_interval) % period if period > self.cycle_interval else 0.0
+
+                self._entries[name] = {
+                    'period': period,
+                    'priority': priority,
+                    'tier': tier,
+                    'deadline': now + offset,
+                    'last_read': None,
+                    'avg_interval': None,
+                    'reads': 0,
+                    'misses': 0
+                }
+            self._recompute_stretch()
+
+    def add_tiers(self, tiers: Dict[str, List[str]], now: float = None):
+        """
+        Registra PIDs agrupados por tier con sus periodos por defecto
+
+        Args:
+            tiers: Dict {tier: [pid_names]} (formato de WORKING_PIDS)
+            now: Instante actual
+        """
+        for tier, pid_names in tiers.items():
+            defaults = self.TIER_DEFAULTS.get(tier, self.TIER_DEFAULTS['slow'])
+            for name in pid_names:
+                self.add_pid(name, defaults['period'], defaults['priority'], tier, now)
+
+    def ensure_pids(self, pid_names: Iterable[str], period: float, priority: int,
+                    tier: str = None):
+        """Registra los PIDs que aún no estén planificados"""
+        for name in pid_names:
+            if name not in self._entries:
+                self.add_pid(name, period, priority, tier)
+
+    def remove_pid(self, name: str):
+        """Deja de planificar un PID"""
+        with self._lock:
+            self._entries.pop(name, None)
+            self._recompute_stretch()
+
+    def get_target(self, name: str) -> Optional[Tuple[str, float]]:
+        """Tier y periodo objetivo de un PID (None si no está planificado)"""
+        entry = self._entries.get(name)
+        return (entry['tier'], entry['period']) if entry else None
+
+    def get_pids(self) -> List[str]:
+        """Lista de PIDs planificados"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    # =========================================================================
+    # PLANIFICACIÓN
+    # =========================================================================
+
+    def next_batch(self, now: float = None) -> List[str]:
+        """
+        Devuelve los PIDs a leer en este ciclo, por orden de deadline
+
+        Los PIDs vencidos se ordenan por (deadline, prioridad). Si cabe más
+        trabajo en el ciclo, se adelantan PIDs cuyo deadline cae antes del
+        siguiente ciclo o que están en la segunda mitad de su periodo.
+
+        Args:
+            now: Instante actual
+
+        Returns:
+            Lista de nombres de PIDs
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            capacity = max(1, int(self.cycle_interval * self.target_utilization / max(self.cost_per_pid, 1e-6)))
+
+            due = []
+            upcoming = []
+            for name, entry in self._entries.items():
+                if entry['deadline'] <= now:
+                    due.append((entry['deadline'], entry['priority'], name))
+                else:
+                    upcoming.append((entry['deadline'], entry['priority'], name, entry))
+
+            due.sort()
+            # Los críticos vencidos siempre entran aunque superen la capacidad
+            batch = [name for _, priority, name in due if priority == 0]
+            for _, priority, name in due:
+                if priority != 0 and len(batch) < capacity:
+                    batch.append(name)
+
+            # Huecos libres: adelantar lecturas lentas en lugar de agruparlas
+            if len(batch) < capacity and upcoming:
+                upcoming.sort(key=lambda item: (item[0], item[1]))
+                for deadline, priority, name, entry in upcoming:
+                    if len(batch) >= capacity:
+                        break
+                    period = self._effective_period(entry)
+                    if deadline <= now + self.cycle_interval or deadline - now <= period / 2:
+                        if priority != 0:
+                            batch.append(name)
+
+            return batch
+
+    def record_cycle(self, requested: List[str], read_ok: Iterable[str], elapsed: float,
+                     now: float = None):
+        """
+        Registra el resultado de un ciclo de lectura
+
+        Args:
+            requested: PIDs solicitados en el ciclo
+            read_ok: PIDs que devolvieron valor
+            elapsed: Segundos que tardó el ciclo en el adaptador
+            now: Instante de finalización
+        """
+        now = time.time() if now is None else now
+        read_ok = set(read_ok)
+
+        with self._lock:
+            if requested and elapsed > 0:
+                sample = elapsed / len(requested)
+                self.cost_per_pid = (1 - self.rtt_alpha) * self.cost_per_pid + self.rtt_alpha * sample
+                self._recompute_stretch()
+
+            for name in requested:
+                entry = self._entries.get(name)
+                if not entry:
+                    continue
+
+                period = self._effective_period(entry)
+                # Mantener la cadencia sin acumular deriva; si vamos muy atrasados, reiniciar
+                next_deadline = entry['deadline'] + period
+                entry['deadline'] = next_deadline if next_deadline > now else now + period
+
+                if name in read_ok:
+                    if entry['last_read'] is not None:
+                        interval = now - entry['last_read']
+                        if entry['avg_interval'] is None:
+                            entry['avg_interval'] = interval
+                        else:
+                            entry['avg_interval'] = 0.8 * entry['avg_interval'] + 0.2 * interval
+                    entry['last_read'] = now
+                    entry['reads'] += 1
+                else:
+                    entry['misses'] += 1
+
+    def postpone(self, name: str, until: float):
+        """Aplaza la siguiente lectura de un PID hasta un instante dado"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and until > entry['deadline']:
+                entry['deadline'] = until
+
+    # =========================================================================
+    # ADAPTACIÓN AL RTT
+    # =========================================================================
+
+    def _effective_period(self, entry: Dict) -> float:
+        """Periodo tras aplicar el estiramiento por saturación"""
+        stretch = self._stretch_high if entry['priority'] == 0 else self._stretch_low
+        return entry['period'] * stretch
+
+    def _recompute_stretch(self):
+        """
+        Recalcula los factores de estiramiento según la carga requerida
+
+        U = Σ coste/periodo. Si U supera la utilización objetivo se alargan
+        primero los periodos de prioridad baja; solo si los críticos por sí
+        solos no caben se alargan también ellos.
+        """
+        target = self.target_utilization
+        load_high = sum(self.cost_per_pid / e['period'] for e in self._entries.values() if e['priority'] == 0)
+        load_low = sum(self.cost_per_pid / e['period'] for e in self._entries.values() if e['priority'] != 0)
+        self._utilization = load_high + load_low
+
+        if self._utilization <= target:
+            self._stretch_high = self._stretch_low = 1.0
+        elif load_high < target * 0.9:
+            self._stretch_high = 1.0
+            self._stretch_low = max(1.0, load_low / (target - load_high))
+        else:
+            self._stretch_high = self._stretch_low = self._utilization / target
+
+    # =========================================================================
+    # ESTADÍSTICAS
+    # =========================================================================
+
+    def get_rates(self) -> Dict:
+        """
+        Frecuencias objetivo vs conseguidas por PID
+
+        Returns:
+            Dict con estado global (coste por PID, utilización, saturación)
+            y detalle por PID
+        """
+        with self._lock:
+            pids = {}
+            for name, entry in sorted(self._entries.items(), key=lambda item: (item[1]['priority'], item[0])):
+                effective = self._effective_period(entry)
+                achieved_hz = 1.0 / entry['avg_interval'] if entry['avg_interval'] else 0.0
+                target_hz = 1.0 / entry['period']
+                pids[name] = {
+                    'tier': entry['tier'],
+                    'priority': entry['priority'],
+                    'target_hz': round(target_hz, 3),
+                    'effective_hz': round(1.0 / effective, 3),
+                    'achieved_hz': round(achieved_hz, 3),
+                    'achieved_ratio': round(achieved_hz / target_hz, 2) if target_hz else 0,
+                    'reads': entry['reads'],
+                    'misses': entry['misses']
+                }
+
+            return {
+                'cycle_interval_ms': round(self.cycle_interval * 1000),
+                'cost_per_pid_ms': round(self.cost_per_pid * 1000, 2),
+                'utilization': round(self._utilization, 3),
+                'target_utilization': self.target_utilization,
+                'saturated': self._utilization > self.target_utilization,
+                'stretch': {
+                    'critical': round(self._stretch_high, 2),
+                    'other': round(self._stretch_low, 2)
+                },
+                'pids': pids
+            }
+
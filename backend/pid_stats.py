@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - ESTADÍSTICAS DE FIABILIDAD POR PID
+# Backoff exponencial, cuarentena y lista negra de PIDs que no responden
+# =============================================================================
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class PIDStatsTracker:
+    """
+    Contadores de éxito/latencia por PID para el vehículo actual
+
+    Un PID que falla se aplaza con backoff exponencial; tras varios fallos
+    seguidos entra en cuarentena y, si nunca ha respondido en este vehículo
+    después de varias cuarentenas, pasa a la lista negra y deja de leerse.
+    Las estadísticas se exportan como dict para persistirlas junto al
+    perfil de PIDs del vehículo.
+    """
+
+    # Backoff tras cada fallo: BACKOFF_BASE * 2^(fallos-1), con tope
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 60.0
+
+    # Fallos consecutivos que provocan una cuarentena y su duración
+    QUARANTINE_AFTER = 5
+    QUARANTINE_SECONDS = 300.0
+
+    # Cuarentenas sin ninguna respuesta antes de la lista negra permanente
+    BLACKLIST_AFTER_QUARANTINES = 3
+
+    # Intervalo mínimo entre persistencias automáticas
+    PERSIST_INTERVAL = 60.0
+
+    def __init__(self):
+        """Inicializa el tracker sin vehículo asociado"""
+        self.vehicle_id = None
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_persist = time.time()
+
+    # =========================================================================
+    # VEHÍCULO Y PERSISTENCIA
+    # =========================================================================
+
+    def load(self, vehicle_id: Optional[int], stats: Optional[Dict]):
+        """
+        Asocia el tracker a un vehículo y carga sus estadísticas aprendidas
+
+        Args:
+            vehicle_id: ID del vehículo
+            stats: Dict exportado previamente con to_dict() (o None)
+        """
+        with self._lock:
+            self.vehicle_id = vehicle_id
+            self._stats = {}
+            for name, entry in (stats or {}).items():
+                self._stats[name] = self._new_entry()
+                self._stats[name].update({k: v for k, v in entry.items() if k in self._stats[name]})
+            self._dirty = False
+            self._last_persist = time.time()
+
+        blacklisted = self.get_blacklisted()
+        print(f"[PID-STATS] ✓ Estadísticas cargadas para vehículo {vehicle_id}: "
+              f"{len(self._stats)} PIDs, {len(blacklisted)} en lista negra")
+
+    def to_dict(self) -> Dict:
+        """Exporta las estadísticas para persistirlas"""
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._stats.items()}
+
+    @property
+    def dirty(self) -> bool:
+        """Indica si hay cambios sin persistir"""
+        return self._dirty
+
+    def needs_persist(self, now: float = None) -> bool:
+        """Indica si hay cambios pendientes y ya pasó el intervalo de persistencia"""
+        now = time.time() if now is None else now
+        return self._dirty and self.vehicle_id is not None and now - self._last_persist >= self.PERSIST_INTERVAL
+
+    def mark_persisted(self, now: float = None):
+        """Marca las estadísticas como guardadas"""
+        self._dirty = False
+        self._last_persist = time.time() if now is None else now
+
+    # =========================================================================
+    # DECISIONES DE LECTURA
+    # =========================================================================
+
+    def should_read(self, name: str, now: float = None) -> bool:
+        """
+        Indica si merece la pena consultar el PID en este momento
+
+        Args:
+            name: Nombre del PID
+            now: Instante actual
+
+        Returns:
+            False si está en backoff, cuarentena o lista negra
+        """
+        entry = self._stats.get(name)
+        if entry is None:
+            return True
+        if entry['state'] == 'blacklisted':
+            return False
+        return (time.time() if now is None else now) >= entry['retry_at']
+
+    def filter_readable(self, names: Iterable[str], now: float = None) -> List[str]:
+        """Filtra una lista de PIDs dejando solo los que deben leerse"""
+        now = time.time() if now is None else now
+        return [name for name in names if self.should_read(name, now)]
+
+    def retry_at(self, name: str) -> float:
+        """Instante a partir del cual se volverá a intentar el PID"""
+        entry = self._stats.get(name)
+        if entry is None:
+            return 0.0
+        if entry['state'] == 'blacklisted':
+            return time.time() + self.QUARANTINE_SECONDS
+        return entry['retry_at']
+
+    def max_attempts(self, name: str, default: int) -> int:
+        """
+        Reintentos a usar para un PID
+
+        Los reintentos solo compensan en PIDs que responden: uno que viene
+        fallando se consulta una única vez hasta que vuelva a responder.
+        """
+        entry = self._stats.get(name)
+        if entry and (entry['consecutive_failures'] > 0 or entry['state'] != 'ok'):
+            return 1
+        return default
+
+    # =========================================================================
+    # REGISTRO DE RESULTADOS
+    # =========================================================================
+
+    def record(self, name: str, success: bool, latency: float, now: float = None):
+        """
+        Registra el resultado de una consulta (con todos sus reintentos)
+
+        Args:
+            name: Nombre del PID
+            success: True si devolvió valor
+            latency: Segundos empleados en la consulta
+            now: Instante actual
+        """
+        now = time.time() if now is None else now
+        latency_ms = latency * 1000
+
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = self._new_entry()
+
+            entry['attempts'] += 1
+            self._dirty = True
+
+            if success:
+                entry['successes'] += 1
+                entry['consecutive_failures'] = 0
+                entry['quarantines'] = 0
+                entry['state'] = 'ok'
+                entry['retry_at'] = 0.0
+                entry['last_success'] = now
+                if entry['avg_latency_ms'] is None:
+                    entry['avg_latency_ms'] = round(latency_ms, 2)
+                else:
+                    entry['avg_latency_ms'] = round(0.8 * entry['avg_latency_ms'] + 0.2 * latency_ms, 2)
+                return
+
+            entry['failures'] += 1
+            entry['consecutive_failures'] += 1
+            entry['wasted_ms'] = round(entry['wasted_ms'] + latency_ms, 1)
+
+            if entry['consecutive_failures'] >= self.QUARANTINE_AFTER:
+                entry['quarantines'] += 1
+                entry['consecutive_failures'] = 0
+
+                if entry['quarantines'] >= self.BLACKLIST_AFTER_QUARANTINES and entry['successes'] == 0:
+                    entry['state'] = 'blacklisted'
+                    print(f"[PID-STATS] ⚠️ {name} nunca responde: añadido a la lista negra")
+                else:
+                    entry['state'] = 'quarantined'
+                    entry['retry_at'] = now + self.QUARANTINE_SECONDS
+                    print(f"[PID-STATS] {name} en cuarentena {self.QUARANTINE_SECONDS:.0f}s")
+            else:
+                backoff = self.BACKOFF_BASE * (2 ** (entry['consecutive_failures'] - 1))
+                entry['state'] = 'backoff'
+                entry['retry_at'] = now + min(backoff, self.BACKOFF_MAX)
+
+    def reset(self, name: str = None):
+        """
+        Olvida las estadísticas de un PID (o de todos) para volver a probarlo
+
+        Args:
+            name: Nombre del PID; None para todos
+        """
+        with self._lock:
+            if name is None:
+                self._stats = {}
+            else:
+                self._stats.pop(name, None)
+            self._dirty = True
+
+    # =========================================================================
+    # CONSULTA
+    # =========================================================================
+
+    def get_blacklisted(self) -> List[str]:
+        """PIDs en lista negra"""
+        with self._lock:
+            return sorted(name for name, entry in self._stats.items() if entry['state'] == 'blacklisted')
+
+    def get_status(self) -> Dict:
+        """
+        Resumen de fiabilidad por PID
+
+        Returns:
+            Dict con vehículo, PIDs por estado y detalle por PID
+        """
+        now = time.time()
+        with self._lock:
+            pids = {}
+            by_state = {'ok': 0, 'backoff': 0, 'quarantined': 0, 'blacklisted': 0}
+            for name, entry in sorted(self._stats.items()):
+                by_state[entry['state']] = by_state.get(entry['state'], 0) + 1
+                pids[name] = {
+                    **entry,
+                    'success_rate': round(entry['successes'] / entry['attempts'], 3) if entry['attempts'] else None,
+                    'retry_in_s': round(max(0.0, entry['retry_at'] - now), 1) if entry['state'] in ('backoff', 'quarantined') else 0
+                }
+
+            return {
+                'vehicle_id': self.vehicle_id,
+                'states': by_state,
+                'pids': pids
+            }
+
+    @staticmethod
+    def _new_entry() -> Dict:
+        """Entrada vacía de estadísticas para un PID"""
+        return {
+            'attempts': 0,
+            'successes': 0,
+            'failures': 0,
+            'consecutive_failures': 0,
+            'quarantines': 0,
+            'avg_latency_ms': None,
+            'wasted_ms': 0.0,
+            'state': 'ok',
+            'retry_at': 0.0,
+            'last_success': None
+        }
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - CODIFICACIÓN BINARIA DE TELEMETRÍA
+# Keyframes + deltas (máscara de campos cambiados y float32 empaquetados)
+# para el feed WebSocket de pantallas de flota
+# =============================================================================
+
+import json
+import math
+import struct
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+
+# Tipos de trama binaria
+FRAME_KEYFRAME = 0x01
+FRAME_DELTA = 0x02
+
+# Keyframe: tipo (B), id de esquema (H), secuencia (I), timestamp unix (d)
+KEYFRAME_HEADER = struct.Struct('<BHId')
+# Delta: tipo (B), id de esquema (H), secuencia (I), ms desde la trama anterior (H)
+DELTA_HEADER = struct.Struct('<BHIH')
+
+Message = Union[str, bytes]
+
+
+def _to_float(value) -> float:
+    """Valor publicable como float32 (NaN para None o valores no numéricos)"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return math.nan
+
+
+def _float32_bits(value: float) -> int:
+    """Representación float32 como entero, para comparar cambios exactamente"""
+    return struct.unpack('<I', struct.pack('<f', value))[0]
+
+
+class TelemetryDeltaEncoder:
+    """
+    Codificador de snapshots para un cliente
+
+    Formato (little endian):
+      - Esquema (texto JSON): {"type": "schema", "schema_id", "fields": [...]}
+        Se envía al empezar y cada vez que aparece un campo nuevo.
+      - Keyframe (binario): cabecera + float32 de todos los campos del esquema
+      - Delta (binario): cabecera + máscara de bits (1 bit por campo, LSB
+        primero) + float32 solo de los campos cuyo valor float32 cambió
+
+    Los valores ausentes viajan como NaN. Se fuerza un keyframe cada
+    keyframe_interval segundos, al cambiar el esquema y a petición del
+    cliente (reconexión o pérdida de sincronía).
+    """
+
+    def __init__(self, fields: List[str] = None, keyframe_interval: float = 10.0):
+        """
+        Args:
+            fields: Campos a enviar (None = todos los numéricos del snapshot)
+            keyframe_interval: Segundos máximos entre keyframes
+        """
+        self.selected = [f.upper() for f in fields] if fields else None
+        self.keyframe_interval = keyframe_interval
+        self.fields = []
+        self.schema_id = 0
+        self._last_bits = []
+        self._last_keyframe = 0.0
+        self._last_frame_time = None
+        self._force_keyframe = True
+
+    def request_keyframe(self):
+        """Fuerza un keyframe en la siguiente trama"""
+        self._force_keyframe = True
+
+    def _snapshot_fields(self, data: Dict) -> List[str]:
+        if self.selected is not None:
+            return [name for name in self.selected if name in {k.upper() for k in data}]
+        return [k for k, v in data.items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+    def encode(self, snapshot: Dict, now: float = None) -> List[Message]:
+        """
+        Codifica un snapshot del hilo de adquisición
+
+        Args:
+            snapshot: Dict con sequence, timestamp y data
+            now: Instante actual (para el intervalo de keyframes)
+
+        Returns:
+            Lista de mensajes a enviar en orden (texto de esquema y/o binario)
+        """
+        now = time.time() if now is None else now
+        data = {k.upper(): v for k, v in snapshot['data'].items()}
+        messages = []
+
+        new_fields = [f for f in self._snapshot_fields(data) if f not in self.fields]
+        if new_fields or self.schema_id == 0:
+            self.fields = self.fields + new_fields
+            self.schema_id = self.schema_id % 0xFFFF + 1
+            messages.append(json.dumps({'type': 'schema', 'schema_id': self.schema_id, 'fields': self.fields}))
+            self._force_keyframe = True
+
+        values = [_to_float(data.get(name)) for name in self.fields]
+        bits = [_float32_bits(v) for v in values]
+        sequence = snapshot['sequence'] & 0xFFFFFFFF
+
+        if self._force_keyframe or now - self._last_keyframe >= self.keyframe_interval:
+            try:
+                timestamp = datetime_to_unix(snapshot.get('timestamp')) or now
+            except ValueError:
+                timestamp = now
+            frame = KEYFRAME_HEADER.pack(FRAME_KEYFRAME, self.schema_id, sequence, timestamp)
+            frame += struct.pack(f'<{len(values)}f', *values)
+            self._force_keyframe = False
+            self._last_keyframe = now
+        else:
+            mask = 0
+            changed = []
+            for i, (old, new) in enumerate(zip(self._last_bits, bits)):
+                if old != new:
+                    mask |= 1 << i
+                    changed.append(values[i])
+            dt_ms = min(int((now - self._last_frame_time) * 1000), 0xFFFF)
+            frame = DELTA_HEADER.pack(FRAME_DELTA, self.schema_id, sequence, dt_ms)
+            frame += mask.to_bytes((len(self.fields) + 7) // 8, 'little')
+            frame += struct.pack(f'<{len(changed)}f', *changed)
+
+        self._last_bits = bits
+        self._last_frame_time = now
+        messages.append(frame)
+        return messages
+
+
+class TelemetryDeltaDecoder:
+    """
+    Decodificador de referencia (el cliente JS implementa el mismo formato)
+
+    Mantiene el estado completo y devuelve el snapshot reconstruido en cada
+    trama; si llega un delta sin keyframe previo del mismo esquema, se
+    devuelve None y el cliente debe pedir un keyframe.
+    """
+
+    def __init__(self):
+        self.fields = []
+        self.schema_id = None
+        self.values = None
+        self.sequence = None
+
+    def feed(self, message: Message) -> Optional[Dict]:
+        """
+        Procesa un mensaje recibido
+
+        Returns:
+            Dict {campo: valor} tras una trama binaria, o None (esquema o desincronizado)
+        """
+        if isinstance(message, str):
+            schema = json.loads(message)
+            if schema.get('type') == 'schema':
+                self.fields = schema['fields']
+                self.schema_id = schema['schema_id']
+                self.values = None
+            return None
+
+        frame_type = message[0]
+        n = len(self.fields)
+
+        if frame_type == FRAME_KEYFRAME:
+            _, schema_id, sequence, _ = KEYFRAME_HEADER.unpack_from(message)
+            if schema_id != self.schema_id:
+                return None
+            self.values = list(struct.unpack_from(f'<{n}f', message, KEYFRAME_HEADER.size))
+        elif frame_type == FRAME_DELTA:
+            _, schema_id, sequence, _ = DELTA_HEADER.unpack_from(message)
+            if schema_id != self.schema_id or self.values is None:
+                return None
+            offset = DELTA_HEADER.size
+            mask_size = (n + 7) // 8
+            mask = int.from_bytes(message[offset:offset + mask_size], 'little')
+            offset += mask_size
+            for i in range(n):
+                if mask & (1 << i):
+                    self.values[i] = struct.unpack_from('<f', message, offset)[0]
+                    offset += 4
+        else:
+            return None
+
+        self.sequence = sequence
+        return {name: (None if math.isnan(v) else v) for name, v in zip(self.fields, self.values)}
+
+
+def datetime_to_unix(timestamp: Optional[str]) -> Optional[float]:
+    """Convierte el timestamp ISO del snapshot a segundos unix"""
+    if not timestamp:
+        return None
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def measure_bandwidth(snapshots: List[Dict], interval: float,
+                      keyframe_interval: float = 10.0) -> Tuple[int, int]:
+    """
+    Bytes enviados por SSE/JSON frente al feed binario para una serie de snapshots
+
+    Returns:
+        (bytes JSON, bytes binarios)
+    """
+    encoder = TelemetryDeltaEncoder(keyframe_interval=keyframe_interval)
+    json_bytes = binary_bytes = 0
+    for i, snapshot in enumerate(snapshots):
+        json_bytes += len(json.dumps(dict(snapshot['data'], timestamp=snapshot['timestamp'])))
+        for message in encoder.encode(snapshot, now=i * interval):
+            binary_bytes += len(message.encode() if isinstance(message, str) else message)
+    return json_bytes, binary_bytes
+
+
+if __name__ == "__main__":
+    # Comparativa de ancho de banda con señales sintéticas a 5 Hz durante 3 minutos
+    from datetime import timedelta
+    from elm327_emulator import SyntheticSignals
+
+    signals = SyntheticSignals(seed=1)
+    start = datetime(2025, 1, 1, 8, 0, 0)
+    slow = {'COOLANT_TEMP', 'INTAKE_TEMP', 'BAROMETRIC_PRESSURE', 'AMBIANT_AIR_TEMP',
+            'RUN_TIME', 'DISTANCE_W_MIL', 'DISTANCE_SINCE_DTC_CLEAR', 'FUEL_LEVEL', 'OIL_TEMP'}
+    snapshots = []
+    last = {}
+    for i in range(900):
+        t = i * 0.2
+        sample = signals.sample(t)
+        # Los PIDs lentos solo se refrescan cada 5 s, como en el planificador
+        values = {k: (round(v) if k in slow else round(v, 2)) for k, v in sample.items()
+                  if k not in slow or i % 25 == 0 or k not in last}
+        last.update(values)
+        snapshots.append({'sequence': i + 1, 'timestamp': (start + timedelta(seconds=t)).isoformat(),
+                          'data': dict(last)})
+
+    json_bytes, binary_bytes = measure_bandwidth(snapshots, 0.2)
+    print(f"Snapshots: {len(snapshots)} ({len(last)} campos, 5 Hz)")
+    print(f"  JSON (SSE):     {json_bytes / 180 / 1024:6.2f} KB/s")
+    print(f"  Binario delta:  {binary_bytes / 180 / 1024:6.2f} KB/s "
+          f"({binary_bytes / json_bytes * 100:.1f}% del JSON)")
+
+    # Verificación de ida y vuelta
+    encoder, decoder = TelemetryDeltaEncoder(), TelemetryDeltaDecoder()
+    mismatches = 0
+    for i, snapshot in enumerate(snapshots):
+        for message in encoder.encode(snapshot, now=i * 0.2):
+            decoded = decoder.feed(message)
+        for name, value in snapshot['data'].items():
+            if abs(decoded[name.upper()] - struct.unpack('<f', struct.pack('<f', value))[0]) > 1e-9:
+                mismatches += 1
+    print(f"  Ida y vuelta: {mismatches} discrepancias")
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - BUFFER COLUMNAR DE VIAJE
+# Un array tipado por PID + timestamps, ventana acotada en memoria y
+# volcado a disco de los bloques antiguos
+# =============================================================================
+
+import json
+import math
+import os
+import shutil
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional
+
+
+# Tipos de los arrays: timestamps en float64, valores de PIDs en float32
+TIMESTAMP_TYPECODE = 'd'
+VALUE_TYPECODE = 'f'
+
+NAN = math.nan
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class _Chunk:
+    """Bloque de filas consecutivas: timestamps + una columna por PID"""
+
+    def __init__(self, columns: Iterable[str] = ()):
+        self.timestamps = array(TIMESTAMP_TYPECODE)
+        self.columns = {name: array(VALUE_TYPECODE) for name in columns}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp: float, values: Dict):
+        rows = len(self.timestamps)
+        self.timestamps.append(timestamp)
+
+        for name, value in values.items():
+            if name not in self.columns:
+                if not _is_number(value):
+                    continue
+                # Columna nueva: rellenar con NaN las filas anteriores del bloque
+                self.columns[name] = array(VALUE_TYPECODE, [NAN]) * rows
+
+        for name, column in self.columns.items():
+            value = values.get(name)
+            column.append(float(value) if _is_number(value) else NAN)
+
+    def slice_bounds(self, start: Optional[float], end: Optional[float]):
+        """Índices [i, j) de las filas con start <= t <= end"""
+        i = 0 if start is None else bisect_left(self.timestamps, start)
+        j = len(self.timestamps) if end is None else bisect_right(self.timestamps, end)
+        return i, j
+
+    def nbytes(self) -> int:
+        size = len(self.timestamps) * self.timestamps.itemsize
+        return size + sum(len(c) * c.itemsize for c in self.columns.values())
+
+
+class ColumnarTripBuffer:
+    """
+    Puntos de un viaje en formato columnar con memoria acotada
+
+    Las filas se agrupan en bloques de chunk_points. En memoria se conservan
+    los últimos bloques cerrados hasta window_points filas, más el bloque en
+    curso; los bloques más antiguos se escriben en spill_dir y
+    solo se leen cuando una consulta los necesita. Cada bloque guarda su
+    rango temporal, así que las consultas por intervalo solo tocan los
+    bloques que se solapan y devuelven arrays contiguos por PID.
+    """
+
+    def __init__(self, window_points: int = 18000, chunk_points: int = 1500,
+                 spill_dir: str = None):
+        """
+        Args:
+            window_points: Filas máximas en memoria (1 h a 5 Hz por defecto)
+            chunk_points: Filas por bloque
+            spill_dir: Carpeta para los bloques volcados (None = no volcar y
+                descartar los bloques más antiguos)
+        """
+        self.window_points = max(window_points, chunk_points)
+        self.chunk_points = chunk_points
+        self.spill_dir = spill_dir
+
+        self._lock = threading.RLock()
+        self._current = _Chunk()
+        self._sealed = []   # Bloques cerrados en memoria (más antiguos primero)
+        self._spilled = []  # Índice de bloques en disco: path, t0, t1, rows, columns
+        self._dropped_rows = 0
+        self._rows = 0
+
+    # =========================================================================
+    # ESCRITURA
+    # =========================================================================
+
+    def append(self, timestamp: float, values: Dict):
+        """
+        Añade una fila
+
+        Args:
+            timestamp: Instante unix de la muestra (creciente)
+            values: Dict {pid: valor}; los valores no numéricos se ignoran
+        """
+        with self._lock:
+            self._current.append(timestamp, values)
+            self._rows += 1
+
+            if len(self._current) >= self.chunk_points:
+                self._sealed.append(self._current)
+                # Los siguientes bloques empiezan con las columnas ya conocidas
+                self._current = _Chunk(self._current.columns.keys())
+                self._enforce_window()
+
+    def _enforce_window(self):
+        """Vuelca (o descarta) bloques cerrados hasta respetar la ventana"""
+        while self._sealed and self.memory_rows() > self.window_points:
+            chunk = self._sealed.pop(0)
+            if self.spill_dir:
+                self._spill(chunk)
+            else:
+                self._dropped_rows += len(chunk)
+
+    def _spill(self, chunk: _Chunk):
+        """
+        Escribe un bloque a disco
+
+        Formato: longitud de la cabecera (uint32 LE), cabecera JSON con
+        columnas y filas, timestamps y columnas como bytes de los arrays.
+        """
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"chunk_{len(self._spilled):06d}.bin")
+        names = list(chunk.columns.keys())
+        header = json.dumps({'rows': len(chunk), 'columns': names}).encode()
+
+        with open(path, 'wb') as f:
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            chunk.timestamps.tofile(f)
+            for name in names:
+                chunk.columns[name].tofile(f)
+
+        self._spilled.append({
+            'path': path,
+            't0': chunk.timestamps[0],
+            't1': chunk.timestamps[-1],
+            'rows': len(chunk),
+            'columns': names
+        })
+
+    @staticmethod
+    def _load(entry: Dict, names: Optional[Iterable[str]] = None) -> _Chunk:
+        """Lee un bloque volcado (solo las columnas pedidas)"""
+        wanted = set(entry['columns'] if names is None else names)
+        chunk = _Chunk()
+        rows = entry['rows']
+
+        with open(entry['path'], 'rb') as f:
+            header_size = struct.unpack('<I', f.read(4))[0]
+            f.seek(4 + header_size)
+            chunk.timestamps.fromfile(f, rows)
+            for name in entry['columns']:
+                if name in wanted:
+                    column = array(VALUE_TYPECODE)
+                    column.fromfile(f, rows)
+                    chunk.columns[name] = column
+                else:
+                    f.seek(rows * array(VALUE_TYPECODE).itemsize, os.SEEK_CUR)
+        return chunk
+
+    # =========================================================================
+    # LECTURA
+    # =========================================================================
+
+    def __len__(self):
+        return self._rows
+
+    def memory_rows(self) -> int:
+        """Filas que hay ahora mismo en memoria"""
+        return len(self._current) + sum(len(c) for c in self._sealed)
+
+    def column_names(self) -> List[str]:
+        """PIDs que han tenido algún valor numérico en el viaje"""
+        with self._lock:
+            names = dict.fromkeys(self._current.columns)
+            for chunk in self._sealed:
+                names.update(dict.fromkeys(chunk.columns))
+            for entry in self._spilled:
+                names.update(dict.fromkeys(entry['columns']))
+            return list(names)
+
+    def _chunks_in_range(self, start: Optional[float], end: Optional[float],
+                         names: Optional[Iterable[str]]) -> List[_Chunk]:
+        """Bloques (en orden) que se solapan con [start, end]"""
+        chunks = []
+        for entry in self._spilled:
+            if (start is None or entry['t1'] >= start) and (end is None or entry['t0'] <= end):
+                chunks.append(self._load(entry, names))
+        for chunk in self._sealed + [self._current]:
+            if not len(chunk):
+                continue
+            if (start is None or chunk.timestamps[-1] >= start) and (end is None or chunk.timestamps[0] <= end):
+                chunks.append(chunk)
+        return chunks
+
+    def columns(self, names: Iterable[str], start: float = None, end: float = None) -> Dict[str, array]:
+        """
+        Arrays contiguos de varios PIDs en un rango temporal
+
+        Args:
+            names: PIDs a extraer
+            start: Instante inicial (incluido); None = desde el principio
+            end: Instante final (incluido); None = hasta el final
+
+        Returns:
+            Dict {'timestamp': array('d'), pid: array('f')}; NaN donde el PID no tenía valor
+        """
+        names = list(names)
+        with self._lock:
+            result = {'timestamp': array(TIMESTAMP_TYPECODE)}
+            result.update({name: array(VALUE_TYPECODE) for name in names})
+
+            for chunk in self._chunks_in_range(start, end, names):
+                i, j = chunk.slice_bounds(start, end)
+                if i >= j:
+                    continue
+                result['timestamp'].extend(chunk.timestamps[i:j])
+                for name in names:
+                    column = chunk.columns.get(name)
+                    if column is not None:
+                        result[name].extend(column[i:j])
+                    else:
+                        result[name].extend(array(VALUE_TYPECODE, [NAN]) * (j - i))
+            return result
+
+    def column(self, name: str, start: float = None, end: float = None) -> array:
+        """Array contiguo de un PID (ver columns())"""
+        return self.columns([name], start, end)[name]
+
+    def values(self, name: str, start: float = None, end: float = None) -> List[float]:
+        """Valores presentes (sin NaN) de un PID, listos para statistics/max"""
+        return [v for v in self.column(name, start, end) if v == v]
+
+    def get_points(self, start: float = None, end: float = None, limit: int = None) -> List[Dict]:
+        """
+        Filas como lista de dicts (compatibilidad con el formato anterior)
+
+        Args:
+            start: Instante inicial
+            end: Instante final
+            limit: Máximo de filas (las más recientes)
+        """
+        names = self.column_names()
+        data = self.columns(names, start, end)
+        rows = len(data['timestamp'])
+        first = max(0, rows - limit) if limit else 0
+
+        points = []
+        for i in range(first, rows):
+            point = {'timestamp': data['timestamp'][i]}
+            for name in names:
+                value = data[name][i]
+                point[name] = None if value != value else value
+            points.append(point)
+        return points
+
+    def time_range(self):
+        """(primer timestamp, último timestamp) o (None, None) si está vacío"""
+        with self._lock:
+            first = None
+            if self._spilled:
+                first = self._spilled[0]['t0']
+            else:
+                for chunk in self._sealed + [self._current]:
+                    if len(chunk):
+                        first = chunk.timestamps[0]
+                        break
+            last = self._current.timestamps[-1] if len(self._current) else (
+                self._sealed[-1].timestamps[-1] if self._sealed else (
+                    self._spilled[-1]['t1'] if self._spilled else None))
+            return first, last
+
+    # =========================================================================
+    # MANTENIMIENTO
+    # =========================================================================
+
+    def clear(self):
+        """Vacía el buffer y borra los bloques volcados"""
+        with self._lock:
+            self._current = _Chunk()
+            self._sealed = []
+            self._spilled = []
+            self._rows = 0
+            self._dropped_rows = 0
+            if self.spill_dir and os.path.isdir(self.spill_dir):
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def get_stats(self) -> Dict:
+        """Filas totales, en memoria, volcadas y bytes ocupados"""
+        with self._lock:
+            return {
+                'rows': self._rows,
+                'memory_rows': self.memory_rows(),
+                'memory_bytes': self._current.nbytes() + sum(c.nbytes() for c in self._sealed),
+                'spilled_chunks': len(self._spilled),
+                'spilled_rows': sum(e['rows'] for e in self._spilled),
+                'dropped_rows': self._dropped_rows,
+                'columns': len(self.column_names())
+            }
+
+
+if __name__ == "__main__":
+    # Viaje de 3 h a 5 Hz con 28 PIDs: memoria frente a la lista de dicts
+    import tempfile
+    import time
+    import tracemalloc
+    from elm327_emulator import SyntheticSignals
+
+    signals = SyntheticSignals(seed=1)
+    samples = [signals.sample(i * 0.2) for i in range(0, 54000, 9)]  # muestras base recicladas
+    rows = 54000
+
+    tracemalloc.start()
+    points = [dict(samples[i % len(samples)]) for i in range(rows)]
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del points
+
+    spill_dir = tempfile.mkdtemp(prefix='sentinel_trip_')
+    tracemalloc.start()
+    buffer = ColumnarTripBuffer(window_points=18000, chunk_points=1500, spill_dir=spill_dir)
+    t0 = 1_700_000_000.0
+    for i in range(rows):
+        buffer.append(t0 + i * 0.2, samples[i % len(samples)])
+    buffer_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    rpm = buffer.column('RPM', t0 + 3600, t0 + 3900)
+    slice_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    recent = buffer.columns(['RPM', 'SPEED', 'ENGINE_LOAD'], t0 + 10500)
+    recent_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Filas: {rows} ({len(samples[0])} PIDs)")
+    print(f"  Lista de dicts:  {list_bytes / 1024 / 1024:7.1f} MB")
+    print(f"  Buffer columnar: {buffer_bytes / 1024 / 1024:7.1f} MB en memoria  {buffer.get_stats()}")
+    print(f"  Rango 5 min en disco: {len(rpm)} filas en {slice_ms:.2f} ms")
+    print(f"  Últimos 15 min (memoria, 3 PIDs): {len(recent['RPM'])} filas en {recent_ms:.2f} ms")
+    buffer.clear()
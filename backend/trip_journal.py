@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - DIARIO DE ADQUISICIÓN (WRITE-AHEAD)
+# Las muestras del viaje se añaden a un fichero de solo-append antes de
+# entrar en la cola write-behind; al arrancar se reproducen las que no
+# llegaron a obd_data
+# =============================================================================
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+SEGMENT_PREFIX = 'journal_'
+SEGMENT_SUFFIX = '.jsonl'
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+class TripJournal:
+    """
+    Diario de muestras de viaje a prueba de caídas del proceso
+
+    - append() escribe una línea JSON {s: secuencia, t: trip_id, p: punto}
+      y la pasa al sistema operativo (sin fsync): si el proceso muere, la
+      línea ya está en la caché del kernel
+    - Un hilo hace fsync cada fsync_interval segundos, así que ante un corte
+      de corriente se pierde como mucho ese intervalo, sin un commit
+      síncrono por muestra
+    - commit(seq) marca como guardado en BD todo lo anterior a seq; los
+      segmentos cerrados ya cubiertos se borran
+    - recover() devuelve lo no confirmado de ejecuciones anteriores para
+      reproducirlo en obd_data
+
+    La secuencia es monótona entre ejecuciones (se continúa desde el
+    checkpoint o desde la última línea leída).
+    """
+
+    def __init__(self, folder: str, fsync_interval: float = 1.0,
+                 segment_max_bytes: int = 4 * 1024 * 1024):
+        """
+        Args:
+            folder: Carpeta de los segmentos del diario
+            fsync_interval: Segundos entre fsync del segmento abierto
+            segment_max_bytes: Tamaño a partir del cual se abre otro segmento
+        """
+        self.folder = folder
+        self.fsync_interval = fsync_interval
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.Lock()       # Protege secuencia y segmento abierto
+        self._sync_lock = threading.Lock()  # fsync frente a cierre del segmento
+        self._file = None
+        self._path = None
+        self._bytes = 0
+        self._segment_last_seq = 0
+        self._closed = []                   # [(ruta, última secuencia)] de esta ejecución
+        self._recovered = []                # Segmentos de ejecuciones anteriores
+        self._seq = 0
+        self._committed = 0
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.appended = 0
+        self.fsyncs = 0
+        self.errors = 0
+        self.last_error = None
+
+    # =========================================================================
+    # RECUPERACIÓN
+    # =========================================================================
+
+    def _segments(self) -> List[str]:
+        names = [n for n in os.listdir(self.folder)
+                 if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)]
+        return [os.path.join(self.folder, n) for n in sorted(names)]
+
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(os.path.join(self.folder, CHECKPOINT_FILE), 'r', encoding='utf-8') as f:
+                return int(json.load(f).get('committed_seq', 0))
+        except (OSError, ValueError, TypeError):
+            return 0
+
+    def _write_checkpoint(self):
+        path = os.path.join(self.folder, CHECKPOINT_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'committed_seq': self._committed, 'updated': time.time()}, f)
+        os.replace(path + '.tmp', path)
+
+    def recover(self) -> List[Tuple[int, Dict]]:
+        """
+        Lee los segmentos de ejecuciones anteriores (llamar antes de start())
+
+        Las líneas incompletas del final de un segmento (escritura cortada
+        por la caída) se ignoran.
+
+        Returns:
+            Lista de (trip_id, punto) no confirmados, en orden de adquisición
+        """
+        self._committed = self._read_checkpoint()
+        max_seq = self._committed
+        pending = []
+        self._recovered = self._segments()
+
+        for path in self._recovered:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        seq = int(record['s'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    max_seq = max(max_seq, seq)
+                    if seq > self._committed:
+                        pending.append((record['t'], record['p']))
+
+        self._seq = max_seq
+        return pending
+
+    def discard_recovered(self):
+        """Borra los segmentos leídos por recover() (tras reproducirlos en BD)"""
+        with self._lock:
+            self._committed = max(self._committed, self._seq)
+            for path in self._recovered:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._recovered = []
+            self._write_checkpoint()
+
+    # =========================================================================
+    # CICLO DE VIDA
+    # =========================================================================
+
+    def start(self):
+        """Arranca el hilo de fsync periódico"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trip-journal", daemon=True)
+        self._thread.start()
+        print(f"[JOURNAL] ✓ Diario de adquisición activo (fsync cada {self.fsync_interval}s)")
+
+    def close(self):
+        """fsync y cierre del segmento abierto (apagado del servidor)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.fsync_interval + 1)
+        with self._lock:
+            self._close_segment()
+            self._prune()
+
+    def _run(self):
+        while not self._stop.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """fsync del segmento abierto si hay escrituras pendientes"""
+        with self._sync_lock:
+            if not self._dirty or self._file is None:
+                return
+            self._dirty = False
+            try:
+                os.fsync(self._file.fileno())
+                self.fsyncs += 1
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                self.last_error = str(e)
+
+    # =========================================================================
+    # ESCRITURA
+    # =========================================================================
+
+    def append(self, trip_id: int, point: Dict) -> Optional[int]:
+        """
+        Registra una muestra en el diario
+
+        Args:
+            trip_id: ID del viaje en BD
+            point: Punto con las columnas de obd_data
+
+        Returns:
+            Secuencia asignada, o None si no se pudo escribir
+        """
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._open_segment()
+                self._seq += 1
+                line = json.dumps({'s': self._seq, 't': trip_id, 'p': point},
+                                  separators=(',', ':'), default=str) + '\n'
+                self._file.write(line)
+                self._file.flush()  # Al kernel: sobrevive a la caída del proceso
+                self._bytes += len(line)
+                self._segment_last_seq = self._seq
+                self._dirty = True
+                self.appended += 1
+            except OSError as e:
+                self.errors += 1
+                if self.last_error != str(e):
+                    print(f"[JOURNAL] ✗ Error escribiendo el diario: {e}")
+                self.last_error = str(e)
+                return None
+
+            if self._bytes >= self.segment_max_bytes:
+                self._close_segment()
+            return self._seq
+
+    def commit(self, seq: Optional[int]):
+        """
+        Marca como guardadas en BD todas las muestras hasta seq
+
+        Args:
+            seq: Última secuencia incluida en la transacción confirmada
+        """
+        if not seq:
+            return
+        with self._lock:
+            if seq <= self._committed:
+                return
+            self._committed = seq
+            self._prune()
+            try:
+                self._write_checkpoint()
+            except OSError as e:
+                self.errors += 1
+                self.last_error = str(e)
+
+    def rotate(self):
+        """Cierra el segmento abierto (fin de viaje); se borra si ya está confirmado"""
+        with self._lock:
+            self._close_segment()
+            self._prune()
+
+    def _open_segment(self):
+        path = os.path.join(self.folder, f"{SEGMENT_PREFIX}{self._seq + 1:012d}{SEGMENT_SUFFIX}")
+        self._file = open(path, 'a', encoding='utf-8')
+        self._path = path
+        self._bytes = 0
+
+    def _close_segment(self):
+        """fsync y cierre del segmento abierto (con _lock)"""
+        if self._file is None:
+            return
+        with self._sync_lock:
+            try:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except (OSError, ValueError):
+                pass
+            self._file.close()
+            self._file = None
+            self._dirty = False
+        self._closed.append((self._path, self._segment_last_seq))
+        self._path = None
+        self._bytes = 0
+
+    def _prune(self):
+        """Borra los segmentos cerrados cuyas muestras están todas en BD (con _lock)"""
+        remaining = []
+        for path, last_seq in self._closed:
+            if last_seq <= self._committed:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            else:
+                remaining.append((path, last_seq))
+        self._closed = remaining
+
+    # =========================================================================
+    # ESTADÍSTICAS
+    # =========================================================================
+
+    def get_status(self) -> Dict:
+        """Estado del diario (secuencias, segmentos y fsync)"""
+        with self._lock:
+            return {
+                'seq': self._seq,
+                'committed_seq': self._committed,
+                'uncommitted': self._seq - self._committed,
+                'open_segment': os.path.basename(self._path) if self._path else None,
+                'open_bytes': self._bytes,
+                'closed_segments': len(self._closed),
+                'appended': self.appended,
+                'fsyncs': self.fsyncs,
+                'fsync_interval': self.fsync_interval,
+                'errors': self.errors,
+                'last_error': self.last_error
+            }
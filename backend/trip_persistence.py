@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - PERSISTENCIA WRITE-BEHIND DE MUESTRAS DE VIAJE
+# Cola en memoria que el hilo de adquisición llena y un hilo escritor vacía
+# en transacciones agrupadas sobre obd_data
+# =============================================================================
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+
+from acquisition_metrics import LatencyHistogram
+
+
+class TripSampleWriter:
+    """
+    Escritura diferida de las muestras de un viaje
+
+    enqueue() solo añade la muestra a una cola acotada, así que el ciclo de
+    adquisición nunca espera a SQLite. Un hilo escritor vuelca la cola en
+    una única transacción cuando acumula batch_size muestras o cuando la
+    muestra más antigua lleva flush_interval segundos esperando. flush()
+    fuerza el volcado (fin de viaje) y stop() vacía la cola antes de parar
+    (apagado del servidor).
+
+    Si la escritura falla, las muestras vuelven a la cabeza de la cola y se
+    reintentan en el siguiente volcado. Si la cola se llena (BD caída
+    mucho tiempo), se descartan las muestras más antiguas y se cuentan.
+    Las descartadas siguen en el diario: su checkpoint ya no pasa de la
+    primera descartada, así que se reproducen al arrancar.
+
+    Con un journal (TripJournal) cada muestra se registra en el diario al
+    encolarla y cada volcado confirmado avanza su checkpoint, así que lo
+    que quede en la cola si el proceso muere se reproduce al arrancar.
+    """
+
+    def __init__(self, save_fn: Callable[[List[Tuple[int, Dict]]], None],
+                 batch_size: int = 50, flush_interval: float = 2.0,
+                 max_queue: int = 20000, journal=None):
+        """
+        Args:
+            save_fn: Función que guarda una lista de (trip_id, punto) en una transacción
+            batch_size: Muestras que disparan un volcado
+            flush_interval: Segundos máximos que una muestra espera en la cola
+            max_queue: Muestras máximas en cola antes de descartar las más antiguas
+            journal: TripJournal opcional (write-ahead de las muestras encoladas)
+        """
+        self.save_fn = save_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.journal = journal
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # Un único volcado a la vez (hilo o flush())
+        self._oldest = None
+        self._running = False
+        self._thread = None
+
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._first_dropped_seq = None  # Tope del checkpoint del diario
+        self._errors = 0
+        self._flushes = 0
+        self._max_depth = 0
+        self._last_error = None
+        self._failing = False
+        self._last_flush = None
+        self._flush_latency = LatencyHistogram()
+
+    # =========================================================================
+    # CICLO DE VIDA
+    # =========================================================================
+
+    def start(self):
+        """Arranca el hilo escritor (idempotente)"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="trip-sample-writer", daemon=True)
+            self._thread.start()
+        print(f"[PERSIST] ✓ Escritor de muestras iniciado (lote {self.batch_size}, máx {self.flush_interval}s)")
+
+    def stop(self, timeout: float = 5.0):
+        """Detiene el hilo escritor tras volcar lo pendiente"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+        print(f"[PERSIST] Escritor detenido ({self._written} muestras guardadas, {len(self._queue)} pendientes)")
+
+    # =========================================================================
+    # ENCOLADO Y VOLCADO
+    # =========================================================================
+
+    def enqueue(self, trip_id: int, point: Dict):
+        """
+        Añade una muestra a la cola (O(1), no toca la BD)
+
+        Args:
+            trip_id: ID del viaje en BD
+            point: Punto con las columnas de obd_data
+        """
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._drop([self._queue.popleft()])
+            if not self._queue:
+                self._oldest = time.time()
+            seq = self.journal.append(trip_id, point) if self.journal else None
+            self._queue.append((trip_id, point, seq))
+            self._enqueued += 1
+            self._max_depth = max(self._max_depth, len(self._queue))
+            # Primera muestra: el hilo pasa a esperar con plazo flush_interval
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self) -> int:
+        """
+        Vuelca ahora todas las muestras pendientes
+
+        Returns:
+            Número de muestras escritas
+        """
+        with self._write_lock:
+            with self._cond:
+                batch = list(self._queue)
+                self._queue.clear()
+                self._oldest = None
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                self.save_fn([(trip_id, point) for trip_id, point, _ in batch])
+            except Exception as e:
+                self._errors += 1
+                self._failing = True
+                self._last_error = str(e)
+                print(f"[PERSIST] ✗ Error guardando {len(batch)} muestras: {e}")
+                with self._cond:
+                    # Devolver el lote a la cabeza de la cola respetando el límite
+                    room = max(0, self.max_queue - len(self._queue))
+                    self._drop(batch[:len(batch) - room])
+                    self._queue.extendleft(reversed(batch[-room:] if room else []))
+                    if self._queue:
+                        self._oldest = time.time()
+                return 0
+
+            if self.journal:
+                seq = max((seq for _, _, seq in batch if seq), default=None)
+                with self._cond:
+                    if seq and self._first_dropped_seq:
+                        seq = min(seq, self._first_dropped_seq - 1)
+                self.journal.commit(seq)
+            self._flush_latency.add((time.perf_counter() - start) * 1000)
+            self._failing = False
+            self._flushes += 1
+            self._written += len(batch)
+            self._last_flush = time.time()
+            return len(batch)
+
+    def _drop(self, items: list):
+        """Cuenta muestras descartadas y recuerda la primera secuencia perdida (con _cond)"""
+        self._dropped += len(items)
+        seqs = [seq for _, _, seq in items if seq]
+        if seqs:
+            self._first_dropped_seq = min(seqs + [self._first_dropped_seq or seqs[0]])
+
+    def _due(self) -> bool:
+        if not self._queue:
+            return False
+        return len(self._queue) >= self.batch_size or time.time() - self._oldest >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._due():
+                    timeout = None
+                    if self._queue:
+                        timeout = max(0.0, self._oldest + self.flush_interval - time.time())
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+            self.flush()
+            if self._failing:
+                # BD no disponible: no reintentar en bucle cerrado
+                time.sleep(self.flush_interval)
+
+    # =========================================================================
+    # ESTADÍSTICAS
+    # =========================================================================
+
+    def get_status(self) -> Dict:
+        """
+        Métricas de la cola de persistencia
+
+        Returns:
+            Dict con profundidad de cola, muestras escritas/descartadas y latencia de volcado
+        """
+        with self._cond:
+            depth = len(self._queue)
+            oldest_age = round(time.time() - self._oldest, 2) if self._queue else 0.0
+        return {
+            'running': self._running,
+            'queue_depth': depth,
+            'max_queue_depth': self._max_depth,
+            'oldest_pending_s': oldest_age,
+            'enqueued': self._enqueued,
+            'written': self._written,
+            'dropped': self._dropped,
+            'errors': self._errors,
+            'last_error': self._last_error,
+            'flushes': self._flushes,
+            'avg_batch': round(self._written / self._flushes, 1) if self._flushes else None,
+            'last_flush': self._last_flush,
+            'flush_latency': self._flush_latency.to_dict()
+        }
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# SENTINEL PRO - ESTADÍSTICAS DE VIAJE
+# Agregados incrementales durante la adquisición y la misma definición en
+# una sola pasada SQL sobre obd_data (viajes importados o recálculo)
+# =============================================================================
+
+import json
+from typing import Dict, Optional
+
+# Relación aire/combustible estequiométrica y densidad (g/L) por combustible
+# para estimar el consumo a partir del MAF. Eléctrico: sin estimación.
+FUEL_PROPERTIES = {
+    'gasolina': (14.7, 737.0),
+    'hibrido': (14.7, 737.0),
+    'diesel': (14.5, 832.0),
+}
+
+# Huecos mayores entre muestras (s) se consideran pérdida de conexión y no
+# suman tiempo ni distancia
+MAX_SAMPLE_GAP = 10.0
+
+# Bandas de tiempo: (nombre, límite superior exclusivo); la última sin límite
+SPEED_BANDS = (('stopped', 1), ('urban', 50), ('road', 90), ('highway', 120), ('over_120', None))
+RPM_BANDS = (('idle', 1000), ('low', 2500), ('mid', 4000), ('high', None))
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    return value
+
+
+def _band(bands, value: float) -> str:
+    for name, upper in bands:
+        if upper is None or value < upper:
+            return name
+    return bands[-1][0]
+
+
+def fuel_liters(maf_grams: float, fuel_type: str) -> float:
+    """
+    Litros estimados a partir de la masa de aire acumulada
+
+    Args:
+        maf_grams: Suma de MAF (g/s) × segundos
+        fuel_type: Tipo de combustible del vehículo
+    """
+    afr, density = FUEL_PROPERTIES.get((fuel_type or '').lower(), (None, None))
+    if not afr or not maf_grams:
+        return 0.0
+    return maf_grams / afr / density
+
+
+class TripAggregator:
+    """
+    Agregados de un viaje actualizados en O(1) por muestra
+
+    - Distancia integrando la velocidad con el intervalo real entre muestras
+    - Medias y máximos de velocidad, RPM (solo > 0) y carga
+    - Masa de aire acumulada (MAF × dt) para estimar combustible
+    - Segundos en cada banda de velocidad y de RPM
+
+    TRIP_STATS_SQL aplica exactamente las mismas reglas sobre obd_data.
+    """
+
+    def __init__(self, start_time: float = None, fuel_type: str = None):
+        """
+        Args:
+            start_time: Instante unix de inicio del viaje (para la duración)
+            fuel_type: Combustible del vehículo (estimación de consumo)
+        """
+        self.start_time = start_time
+        self.fuel_type = fuel_type
+        self.samples = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.distance_km = 0.0
+        self.maf_grams = 0.0
+        self._sums = {'speed': [0.0, 0], 'rpm': [0.0, 0], 'load': [0.0, 0]}
+        self._max = {'speed': None, 'rpm': None, 'load': None}
+        self.speed_bands = {name: 0.0 for name, _ in SPEED_BANDS}
+        self.rpm_bands = {name: 0.0 for name, _ in RPM_BANDS}
+
+    def _add(self, key: str, value: float):
+        entry = self._sums[key]
+        entry[0] += value
+        entry[1] += 1
+        if self._max[key] is None or value > self._max[key]:
+            self._max[key] = value
+
+    def update(self, timestamp: float, sample: Dict) -> float:
+        """
+        Incorpora una muestra
+
+        Args:
+            timestamp: Instante unix de la muestra
+            sample: Snapshot con los PIDs en mayúsculas
+
+        Returns:
+            Segundos contabilizados para esta muestra (0 en la primera o tras un hueco)
+        """
+        gap = timestamp - self.last_ts if self.last_ts is not None else 0.0
+        dt = gap if 0 < gap <= MAX_SAMPLE_GAP else 0.0
+        self.samples += 1
+        if self.first_ts is None:
+            self.first_ts = timestamp
+        self.last_ts = timestamp
+
+        speed = _number(sample.get('SPEED'))
+        rpm = _number(sample.get('RPM'))
+        load = _number(sample.get('ENGINE_LOAD'))
+        maf = _number(sample.get('MAF'))
+
+        if speed is not None:
+            self._add('speed', speed)
+            self.distance_km += speed * dt / 3600
+            self.speed_bands[_band(SPEED_BANDS, speed)] += dt
+        if rpm is not None and rpm > 0:
+            self._add('rpm', rpm)
+        if rpm is not None:
+            self.rpm_bands[_band(RPM_BANDS, rpm)] += dt
+        if load is not None:
+            self._add('load', load)
+        if maf is not None and maf > 0:
+            self.maf_grams += maf * dt
+        return dt
+
+    def _mean(self, key: str) -> float:
+        total, count = self._sums[key]
+        return total / count if count else 0.0
+
+    def get_stats(self, end_time: float = None, health_score: int = None) -> Dict:
+        """
+        Estadísticas en el formato de DatabaseManager.end_trip()
+
+        Args:
+            end_time: Instante de fin (None = última muestra)
+            health_score: Puntuación de salud del viaje
+        """
+        start = self.start_time if self.start_time is not None else self.first_ts
+        end = end_time if end_time is not None else self.last_ts
+        return build_stats(
+            samples=self.samples,
+            distance=self.distance_km,
+            duration=(end - start) if start is not None and end is not None else 0,
+            avg_speed=self._mean('speed'),
+            max_speed=self._max['speed'],
+            avg_rpm=self._mean('rpm'),
+            max_rpm=self._max['rpm'],
+            avg_load=self._mean('load'),
+            max_load=self._max['load'],
+            fuel_consumed=fuel_liters(self.maf_grams, self.fuel_type),
+            speed_bands=self.speed_bands,
+            rpm_bands=self.rpm_bands,
+            health_score=health_score,
+            source='live'
+        )
+
+
+def build_stats(samples, distance, duration, avg_speed, max_speed, avg_rpm, max_rpm,
+                avg_load, max_load, fuel_consumed, speed_bands, rpm_bands,
+                health_score=None, source='live') -> Dict:
+    """Dict de estadísticas redondeado y con las bandas serializadas"""
+    stats = {
+        'samples': samples,
+        'distance': round(distance or 0, 3),
+        'duration': int(round(duration or 0)),
+        'avg_speed': round(avg_speed or 0, 1),
+        'max_speed': round(max_speed or 0, 1),
+        'avg_rpm': round(avg_rpm or 0),
+        'max_rpm': round(max_rpm or 0),
+        'avg_load': round(avg_load or 0, 1),
+        'max_load': round(max_load or 0, 1),
+        'fuel_consumed': round(fuel_consumed or 0, 3),
+        'speed_bands': json.dumps({k: round(v or 0, 1) for k, v in speed_bands.items()}),
+        'rpm_bands': json.dumps({k: round(v or 0, 1) for k, v in rpm_bands.items()}),
+        'stats_source': source
+    }
+    if health_score is not None:
+        stats['health_score'] = health_score
+    return stats
+
+
+def _band_sql(bands, column: str) -> str:
+    """SUM(dt) por banda, con las mismas fronteras que _band()"""
+    parts = []
+    lower = None
+    for name, upper in bands:
+        conditions = [f"{column} IS NOT NULL"]
+        if lower is not None:
+            conditions.append(f"{column} >= {lower}")
+        if upper is not None:
+            conditions.append(f"{column} < {upper}")
+        parts.append(f"SUM(CASE WHEN {' AND '.join(conditions)} THEN dt ELSE 0 END) AS {column}_{name}")
+        lower = upper
+    return ',\n               '.join(parts)
+
+
+# Una sola pasada: LAG() da el intervalo con la muestra anterior y el resto
+# son agregaciones condicionales equivalentes a TripAggregator.update()
+TRIP_STATS_SQL = f'''
+    WITH gaps AS (
+        SELECT timestamp, speed, rpm, engine_load, maf,
+               (julianday(timestamp) - julianday(LAG(timestamp) OVER (ORDER BY timestamp, id))) * 86400.0 AS gap
+        FROM obd_data
+        WHERE trip_id = ?
+    ), samples AS (
+        SELECT timestamp, speed, rpm, engine_load, maf,
+               CASE WHEN gap > 0 AND gap <= {MAX_SAMPLE_GAP} THEN gap ELSE 0 END AS dt
+        FROM gaps
+    )
+    SELECT COUNT(*) AS samples,
+           (julianday(MAX(timestamp)) - julianday(MIN(timestamp))) * 86400.0 AS duration,
+           SUM(CASE WHEN speed IS NOT NULL THEN speed * dt ELSE 0 END) / 3600.0 AS distance,
+           AVG(speed) AS avg_speed,
+           MAX(speed) AS max_speed,
+           AVG(CASE WHEN rpm > 0 THEN rpm END) AS avg_rpm,
+           MAX(CASE WHEN rpm > 0 THEN rpm END) AS max_rpm,
+           AVG(engine_load) AS avg_load,
+           MAX(engine_load) AS max_load,
+           SUM(CASE WHEN maf > 0 THEN maf * dt ELSE 0 END) AS maf_grams,
+           {_band_sql(SPEED_BANDS, 'speed')},
+           {_band_sql(RPM_BANDS, 'rpm')}
+    FROM samples
+'''
+
+
+def stats_from_sql_row(row: Dict, fuel_type: str = None) -> Dict:
+    """
+    Convierte la fila de TRIP_STATS_SQL al formato de end_trip()
+
+    Args:
+        row: Resultado de TRIP_STATS_SQL como dict
+        fuel_type: Combustible del vehículo
+    """
+    return build_stats(
+        samples=row['samples'],
+        distance=row['distance'],
+        duration=row['duration'],
+        avg_speed=row['avg_speed'],
+        max_speed=row['max_speed'],
+        avg_rpm=row['avg_rpm'],
+        max_rpm=row['max_rpm'],
+        avg_load=row['avg_load'],
+        max_load=row['max_load'],
+        fuel_consumed=fuel_liters(row['maf_grams'], fuel_type),
+        speed_bands={name: row[f'speed_{name}'] for name, _ in SPEED_BANDS},
+        rpm_bands={name: row[f'rpm_{name}'] for name, _ in RPM_BANDS},
+        source='sql'
+    )
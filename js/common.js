@@ -7,6 +7,7 @@
 const SENTINEL_CONFIG = {
     API_URL: 'http://localhost:5000',
     POLL_INTERVAL: 3000,
+    STREAM_MAX_HZ: 5,  // Máximo de eventos por segundo del stream SSE de datos en vivo
     VERSION: '10.0',
     APP_NAME: 'SENTINEL PRO'
 };
@@ -697,6 +698,120 @@ const Navigation = {
     }
 };
 
+// =============================================================================
+// FEED BINARIO DE TELEMETRÍA (WEBSOCKET)
+// =============================================================================
+
+const TelemetryFeed = {
+    /**
+     * Conecta al feed binario /api/obd/ws (keyframe + deltas float32)
+     * Reconecta solo; cada reconexión empieza por un keyframe.
+     * @param {Object} options - {fields: [...], maxHz, onData(data, vehicleId), onOffline()}
+     * @returns {Object|null} Controlador con close(), o null sin soporte WebSocket
+     */
+    connect(options = {}) {
+        if (!window.WebSocket) return null;
+
+        const wsUrl = SENTINEL_CONFIG.API_URL.replace(/^http/, 'ws');
+        const params = new URLSearchParams();
+        if (options.fields) params.set('fields', options.fields.join(','));
+        if (options.maxHz) params.set('max_hz', options.maxHz);
+
+        let socket = null;
+        let closed = false;
+        let fields = [];
+        let schemaId = null;
+        let values = null;
+        let vehicleId = null;
+
+        const open = () => {
+            socket = new WebSocket(`${wsUrl}/api/obd/ws?${params}`);
+            socket.binaryType = 'arraybuffer';
+
+            socket.onmessage = (event) => {
+                if (typeof event.data === 'string') {
+                    const message = JSON.parse(event.data);
+                    if (message.type === 'hello') {
+                        vehicleId = message.vehicle_id;
+                    } else if (message.type === 'schema') {
+                        fields = message.fields;
+                        schemaId = message.schema_id;
+                        values = null;
+                    } else if (message.type === 'offline' && options.onOffline) {
+                        options.onOffline();
+                    }
+                    return;
+                }
+
+                const decoded = this.decodeFrame(new DataView(event.data), fields, schemaId, values);
+                if (decoded === null) {
+                    socket.send('keyframe');  // Delta sin keyframe previo: resincronizar
+                    return;
+                }
+
+                values = decoded;
+                if (options.onData) {
+                    const data = {};
+                    fields.forEach((name, i) => {
+                        data[name] = Number.isNaN(values[i]) ? null : values[i];
+                    });
+                    options.onData(data, vehicleId);
+                }
+            };
+
+            socket.onclose = () => {
+                if (!closed) setTimeout(open, 3000);
+            };
+        };
+
+        open();
+        return {
+            close() {
+                closed = true;
+                if (socket) socket.close();
+            }
+        };
+    },
+
+    /**
+     * Decodifica una trama binaria (formato de backend/telemetry_codec.py)
+     * @param {DataView} view - Trama recibida
+     * @param {Array} fields - Campos del esquema actual
+     * @param {number} schemaId - Id del esquema actual
+     * @param {Array|null} values - Valores previos (necesarios para un delta)
+     * @returns {Array|null} Valores actualizados o null si hay que pedir keyframe
+     */
+    decodeFrame(view, fields, schemaId, values) {
+        const type = view.getUint8(0);
+        if (view.getUint16(1, true) !== schemaId) return null;
+
+        const n = fields.length;
+        if (type === 1) {
+            // Keyframe: cabecera de 15 bytes + float32 de todos los campos
+            const result = new Array(n);
+            for (let i = 0; i < n; i++) {
+                result[i] = view.getFloat32(15 + i * 4, true);
+            }
+            return result;
+        }
+
+        if (type === 2 && values) {
+            // Delta: cabecera de 9 bytes + máscara + float32 de los campos cambiados
+            const result = values.slice();
+            let offset = 9 + Math.ceil(n / 8);
+            for (let i = 0; i < n; i++) {
+                if (view.getUint8(9 + (i >> 3)) & (1 << (i & 7))) {
+                    result[i] = view.getFloat32(offset, true);
+                    offset += 4;
+                }
+            }
+            return result;
+        }
+
+        return null;
+    }
+};
+
 // =============================================================================
 // DEBUGGING
 // =============================================================================
@@ -736,6 +851,7 @@ window.SENTINEL = {
     GPS,
     HealthUtils,
     Navigation,
+    TelemetryFeed,
     Debug
 };
 
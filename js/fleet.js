@@ -263,6 +263,30 @@ document.addEventListener('DOMContentLoaded', async () => {
         `;
     }
 
+    /**
+     * Mostrar telemetría en vivo en la tarjeta del vehículo conectado
+     */
+    function renderLiveTelemetry(data, vehicleId) {
+        const id = vehicleId || localStorage.getItem('activeVehicleId');
+        const body = document.querySelector(`.vehicle-card[data-vehicle-id="${id}"] .vehicle-card-body`);
+        if (!body) return;
+
+        let live = body.querySelector('.vehicle-live');
+        if (!live) {
+            live = document.createElement('div');
+            live.className = 'vehicle-live';
+            body.appendChild(live);
+        }
+
+        const format = (value, decimals) => value === null ? '--' : SENTINEL.Formatter.number(value, decimals);
+        live.innerHTML = `
+            <i class="fas fa-circle"></i>
+            <span>${format(data.RPM, 0)} rpm</span>
+            <span>${format(data.SPEED, 0)} km/h</span>
+            <span>${format(data.COOLANT_TEMP, 0)} °C</span>
+        `;
+    }
+
     /**
      * Aplicar filtros
      */
@@ -820,5 +844,13 @@ document.addEventListener('DOMContentLoaded', async () => {
     await loadFleetStats();
     await loadVehicles();
 
+    // Telemetría del vehículo conectado: feed binario con deltas (poco ancho de banda)
+    SENTINEL.TelemetryFeed.connect({
+        fields: ['RPM', 'SPEED', 'COOLANT_TEMP'],
+        maxHz: 2,
+        onData: renderLiveTelemetry,
+        onOffline: () => document.querySelectorAll('.vehicle-live').forEach(el => el.remove())
+    });
+
     console.log('[FLEET] ✓ Sistema de flotas listo');
 });
@@ -15,6 +15,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // === CONFIGURACIÓN ===
     const API_URL = SENTINEL.CONFIG.API_URL || 'http://localhost:5000';
     const POLL_INTERVAL = SENTINEL.CONFIG.POLL_INTERVAL || 3000;
+    const STREAM_MAX_HZ = SENTINEL.CONFIG.STREAM_MAX_HZ || 5;
+    const STREAM_RETRY_DELAY = 30000;
     
     // Referencias DOM - Configuración Vehículo
     const vehicleBrand = document.getElementById('vehicleBrand');
@@ -82,8 +84,9 @@ document.addEventListener('DOMContentLoaded', () => {
     let lowRpmCount = 0;
     const LOW_RPM_THRESHOLD = 5; // Número de lecturas consecutivas con RPM < 400 para finalizar viaje
     let currentTripId = null;
-    let tripDataBuffer = []; // Buffer para acumular datos antes de enviar a BD
-    const TRIP_DATA_BATCH_SIZE = 10; // Enviar cada 10 puntos de datos
+    // Las muestras del viaje las guarda el servidor; el navegador solo aporta la posición GPS
+    const GPS_REPORT_INTERVAL = 5000; // ms mínimos entre envíos de posición
+    let lastGPSReportTime = 0;
 
     // Estado global del modo de trabajo
     let workMode = 'fleet'; // fleet | new | import
@@ -105,8 +108,6 @@ document.addEventListener('DOMContentLoaded', () => {
     let tripStartTime = null;
     let tripDistance = 0;
     let tripDataPoints = 0;
-    let obdDataBatch = []; // Batch de datos OBD para enviar al servidor
-    const OBD_BATCH_SIZE = 30; // Guardar cada 30 registros
 
     // Control de notificaciones y carga (FIX loop infinito)
     let vehiclesListLoaded = false;
@@ -611,6 +612,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         lastGPSPosition = newPosition;
         gpsDataPoints.push(newPosition);
+        reportTripPosition(newPosition.latitude, newPosition.longitude);
 
         // Log cada 10 posiciones
         if (gpsDataPoints.length % 10 === 0) {
@@ -835,7 +837,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const result = await response.json();
             currentTripId = result.trip_id;
-            tripDataBuffer = [];
+            lastGPSReportTime = 0;
 
             console.log(`[TRIP-DB] ✓ Viaje iniciado en BD (trip_id: ${currentTripId})`);
             return currentTripId;
@@ -847,40 +849,24 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     /**
-     * Guardar datos OBD + GPS en la BD
+     * Enviar la posición GPS al servidor para las muestras del viaje
+     * (las muestras OBD las persiste el propio servidor)
      */
-    async function saveTripDataToDB(dataPoint) {
+    async function reportTripPosition(latitude, longitude) {
         if (!currentTripId) return;
 
-        tripDataBuffer.push(dataPoint);
-
-        // Enviar cuando el buffer alcanza el tamaño de batch
-        if (tripDataBuffer.length >= TRIP_DATA_BATCH_SIZE) {
-            await flushTripDataBuffer();
-        }
-    }
-
-    /**
-     * Enviar buffer de datos a la BD
-     */
-    async function flushTripDataBuffer() {
-        if (!currentTripId || tripDataBuffer.length === 0) return;
+        const now = Date.now();
+        if (now - lastGPSReportTime < GPS_REPORT_INTERVAL) return;
+        lastGPSReportTime = now;
 
         try {
-            const response = await fetch(`${API_URL}/api/trips/${currentTripId}/data`, {
+            await fetch(`${API_URL}/api/trips/${currentTripId}/position`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ data_points: tripDataBuffer })
+                body: JSON.stringify({ latitude, longitude })
             });
-
-            if (response.ok) {
-                const result = await response.json();
-                console.log(`[TRIP-DB] ✓ ${result.points_saved} puntos guardados en BD`);
-                tripDataBuffer = [];
-            }
-
         } catch (error) {
-            console.error('[TRIP-DB] Error guardando datos:', error);
+            console.error('[TRIP-DB] Error enviando posición:', error);
         }
     }
 
@@ -890,9 +876,6 @@ document.addEventListener('DOMContentLoaded', () => {
     async function endTripInDB() {
         if (!currentTripId) return;
 
-        // Enviar datos pendientes
-        await flushTripDataBuffer();
-
         try {
             const stats = {
                 distance_km: totalGPSDistance || trip_data?.distance_km || 0,
@@ -914,7 +897,6 @@ document.addEventListener('DOMContentLoaded', () => {
             console.error('[TRIP-DB] Error finalizando viaje:', error);
         } finally {
             currentTripId = null;
-            tripDataBuffer = [];
         }
     }
 
@@ -1412,7 +1394,7 @@ document.addEventListener('DOMContentLoaded', () => {
             tripStartTime = Date.now();
             tripDistance = 0;
             tripDataPoints = 0;
-            obdDataBatch = [];
+            lastGPSReportTime = 0;
 
             // Actualizar UI
             startTripBtn.style.display = 'none';
@@ -1448,11 +1430,6 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            // Guardar datos pendientes
-            if (obdDataBatch.length > 0) {
-                await saveOBDDataBatch();
-            }
-
             // Calcular duración total
             const durationSeconds = Math.floor((Date.now() - tripStartTime) / 1000);
 
@@ -1485,7 +1462,6 @@ document.addEventListener('DOMContentLoaded', () => {
             tripStartTime = null;
             tripDistance = 0;
             tripDataPoints = 0;
-            obdDataBatch = [];
 
             // Actualizar UI
             startTripBtn.style.display = 'block';
@@ -1584,6 +1560,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
                 lastGPSPosition = newPosition;
                 gpsDataPoints.push(newPosition);
+                reportTripPosition(newPosition.lat, newPosition.lng);
             },
             (error) => {
                 console.error('[TRIP] GPS error:', error);
@@ -1643,84 +1620,31 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     /**
-     * Recolectar datos OBD y añadir al batch
+     * Contar los registros del viaje (el servidor guarda cada muestra en la BD)
      */
     async function collectOBDData() {
         if (!tripActive || !currentTripId) return;
 
         try {
-            const response = await fetch(`${API_URL}/get_live_data`, {
-                method: 'GET',
-                headers: { 'Content-Type': 'application/json' }
-            });
-
-            if (!response.ok) return;
-
-            const data = await response.json();
-
-            // Añadir al batch
-            obdDataBatch.push({
-                timestamp: new Date().toISOString(),
-                rpm: data.RPM || 0,
-                speed: data.SPEED || 0,
-                coolant_temp: data.COOLANT_TEMP || 0,
-                intake_temp: data.INTAKE_TEMP || 0,
-                engine_load: data.ENGINE_LOAD || 0,
-                throttle_pos: data.THROTTLE_POS || 0,
-                fuel_pressure: data.FUEL_PRESSURE || 0,
-                maf: data.MAF || 0,
-                gps_lat: lastGPSPosition ? lastGPSPosition.lat : null,
-                gps_lng: lastGPSPosition ? lastGPSPosition.lng : null
-            });
-
+            await getLiveData();
             tripDataPoints++;
-
-            // Si alcanzamos el tamaño del batch, guardar
-            if (obdDataBatch.length >= OBD_BATCH_SIZE) {
-                await saveOBDDataBatch();
-            }
         } catch (error) {
             console.error('[TRIP] Error collecting OBD data:', error);
         }
     }
 
-    /**
-     * Guardar batch de datos OBD al servidor
-     */
-    async function saveOBDDataBatch() {
-        if (obdDataBatch.length === 0 || !currentTripId) return;
-
-        try {
-            const response = await fetch(`${API_URL}/api/trips/${currentTripId}/data`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    data_points: obdDataBatch
-                })
-            });
-
-            if (!response.ok) {
-                throw new Error('Error al guardar batch de datos');
-            }
-
-            console.log(`[TRIP] Guardados ${obdDataBatch.length} puntos de datos`);
-            obdDataBatch = []; // Limpiar batch
-        } catch (error) {
-            console.error('[TRIP] Error saving OBD data batch:', error);
-        }
-    }
-
     /**
      * Escanear PIDs disponibles del vehículo conectado
      */
-    async function scanAvailablePIDs(vehicleId, vehicleName) {
+    async function scanAvailablePIDs(vehicleId, vehicleName, refresh = false) {
         try {
-            SENTINEL.Toast.info('🔍 Escaneando PIDs disponibles... (30-60 segundos)');
+            SENTINEL.Toast.info('🔍 Escaneando PIDs disponibles... (unos segundos)');
 
+            // El servidor reutiliza el perfil cacheado del vehículo salvo refresh
             const response = await fetch(`${API_URL}/api/obd/scan-available-pids`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ vehicle_id: vehicleId })
+                body: JSON.stringify({ vehicle_id: vehicleId, refresh: refresh })
             });
 
             if (!response.ok) {
@@ -2082,18 +2006,69 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // === STREAM EN VIVO (SSE) ===
+
+    let liveStream = null;
+    let latestStreamData = null;
+
+    /**
+     * Abrir el stream SSE de datos en vivo
+     *
+     * Cada snapshot del servidor actualiza los indicadores al momento; la
+     * lógica de viajes sigue ejecutándose cada POLL_INTERVAL con el último
+     * dato recibido, sin peticiones HTTP. El navegador reconecta solo
+     * (enviando Last-Event-ID); si el servidor rechaza el stream se vuelve
+     * al polling y se reintenta más tarde.
+     */
+    function startLiveStream() {
+        if (!window.EventSource || liveStream) return;
+
+        liveStream = new EventSource(`${API_URL}/api/obd/stream?max_hz=${STREAM_MAX_HZ}`);
+
+        liveStream.onmessage = (event) => {
+            try {
+                latestStreamData = JSON.parse(event.data);
+                if (latestStreamData.offline !== true) {
+                    updateLiveData(latestStreamData);
+                }
+            } catch (error) {
+                console.error('[STREAM] Evento no válido:', error);
+            }
+        };
+
+        liveStream.onerror = () => {
+            if (liveStream && liveStream.readyState === EventSource.CLOSED) {
+                console.warn('[STREAM] Stream no disponible, usando polling');
+                liveStream = null;
+                latestStreamData = null;
+                setTimeout(startLiveStream, STREAM_RETRY_DELAY);
+            }
+        };
+    }
+
+    /**
+     * Último dato en vivo: del stream si está abierto, si no por HTTP
+     */
+    async function getLiveData() {
+        if (liveStream && liveStream.readyState === EventSource.OPEN && latestStreamData) {
+            return latestStreamData;
+        }
+
+        const response = await fetch(`${API_URL}/get_live_data`, {
+            method: 'GET',
+            headers: { 'Content-Type': 'application/json' }
+        });
+
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+
+        return response.json();
+    }
+
     async function fetchLiveData() {
         try {
-            const response = await fetch(`${API_URL}/get_live_data`, {
-                method: 'GET',
-                headers: { 'Content-Type': 'application/json' }
-            });
-            
-            if (!response.ok) {
-                throw new Error(`HTTP ${response.status}`);
-            }
-            
-            const data = await response.json();
+            const data = await getLiveData();
             
             if (data.offline === true) {
                 if (isOBDConnected) {
@@ -2148,25 +2123,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         }
                     }
 
-                    // Guardar datos del viaje actual
-                    if (currentTripId) {
-                        const dataPoint = {
-                            timestamp: new Date().toISOString(),
-                            rpm: data.RPM,
-                            speed: data.SPEED,
-                            coolant_temp: data.COOLANT_TEMP,
-                            intake_temp: data.INTAKE_TEMP,
-                            maf: data.MAF,
-                            engine_load: data.ENGINE_LOAD,
-                            throttle_pos: data.THROTTLE_POS,
-                            fuel_pressure: data.FUEL_PRESSURE || null,
-                            latitude: lastGPSPosition?.latitude || null,
-                            longitude: lastGPSPosition?.longitude || null
-                        };
-
-                        await saveTripDataToDB(dataPoint);
-                    }
-
+                    // Las muestras del viaje las guarda el servidor desde el hilo de adquisición
                 } else if (tripActive && (!rpm || rpm < 400)) {
                     // Contador para evitar paradas momentáneas
                     lowRpmCount++;
@@ -3019,7 +2976,8 @@ document.addEventListener('DOMContentLoaded', () => {
     updateAnalyzeButton();
     loadUploadedCSVs();
 
-    // Polling de datos OBD
+    // Datos OBD: stream SSE para los indicadores + ciclo de viaje cada POLL_INTERVAL
+    startLiveStream();
     fetchLiveData();
     setInterval(fetchLiveData, POLL_INTERVAL);
     